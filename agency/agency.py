@@ -1,24 +1,49 @@
 from __future__ import annotations
 
-from dataclasses import dataclass, field
-from typing import Any, Dict, List, Optional
+import asyncio
+import contextvars
+import inspect
+import uuid
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, field, replace
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    ContextManager,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    cast,
+)
 
+from agency.batch import AskBatch
+from agency.budget import Budget, BudgetExceeded
+from agency.cache import ToolCache
 from agency.minion import Except
+from agency.models import FunctionCall, Stream
+from agency.ratelimit import RateLimits, rate_limits, tool_key
 from agency.schema import parse_val, schema_for
+from agency.session import Session, Sessions
 from agency.tool import (
+    AnyTool,
     ExceptToolId,
     ResultToolId,
-    Tool,
     ToolCall,
     ToolContext,
     ToolResult,
 )
+from agency.trace import Span, Tracer, json_size
+from agency.usage import UsageMeter
 from agency.utils import trunc
 
 
-@dataclass
+@dataclass(slots=True)
 class Frame:
-    tool: Tool
+    tool: AnyTool
     tool_id: str
     args: Dict[str, Any]
     call_id: str
@@ -26,90 +51,642 @@ class Frame:
     result_tool_id: Optional[str] = field(default=None)
     result_call_id: Optional[str] = field(default=None)
     result_args: Optional[Dict[str, Any]] = field(default=None)
+    result_calls: List[FunctionCall] = field(default_factory=list)
+
+    # Span covering this frame from push to pop, when tracing.
+    span: Optional[Span] = field(default=None)
 
     def respond(self, result_tool_id: str, result_call_id: str, result: Dict[str, Any]):
         self.result_tool_id = result_tool_id
         self.result_call_id = result_call_id
         self.result_args = result
+        self.result_calls = []
+
+    def respond_all(self, results: List[FunctionCall]):
+        self.result_tool_id = None
+        self.result_call_id = None
+        self.result_args = None
+        self.result_calls = results
 
 
 class Agency:
-    _stack: List[Frame]
-    _toolbox: Dict[str, Tool]
+    _toolbox: Dict[str, AnyTool]
+    _executor: Optional[Executor]
+    _max_parallel: int
+    _sessions: Sessions
+    _cache: ToolCache
+    _tracer: Optional[Tracer]
+    _limits: RateLimits
+    _early_dispatch: bool
+
+    def __init__(
+        self,
+        tools: List[AnyTool],
+        executor: Optional[Executor] = None,
+        max_parallel: int = 8,
+        sessions: Optional[Sessions] = None,
+        cache: Optional[ToolCache] = None,
+        tracer: Optional[Tracer] = None,
+        limits: Optional[RateLimits] = None,
+        early_dispatch: bool = True,
+    ):
+        """Creates an agency over the given tools.
 
-    def __init__(self, tools: List[Tool]):
-        self._stack = []
+        Args:
+            tools: The tools available to this agency, keyed by their declared ids
+            executor: Executor used by ask_async() to run synchronous tools off the event loop.
+                If None, the event loop's default executor is used.
+            max_parallel: Maximum number of calls from a single batch (see ToolResult.calls)
+                that may run at once.
+            sessions: Session store used to isolate per-conversation tool state. Defaults to
+                an unbounded-lifetime store capped at 1000 sessions.
+            cache: Cache for the results of tools declared cacheable. Shared across sessions.
+            tracer: If given, records spans for every frame, tool invocation and model completion.
+            limits: Per-tool rate limits, keyed by tool_key(tool_id). Calls over the limit wait
+                their turn. Defaults to the process-wide limits in agency.ratelimit.
+            early_dispatch: When streaming, start each tool call a model requests as soon as
+                its arguments are complete, rather than when the model's whole completion is.
+        """
         self._toolbox = {tool.decl.id: tool for tool in tools}
+        self._executor = executor
+        self._max_parallel = max_parallel
+        self._sessions = (
+            sessions if sessions is not None else Sessions(idle_timeout=None)
+        )
+        self._cache = cache if cache is not None else ToolCache()
+        self._tracer = tracer
+        self._limits = limits if limits is not None else rate_limits
+        self._early_dispatch = early_dispatch
 
-    def ask(self, tool_id: str, args: Dict[str, Any]) -> Dict[str, Any]:
+    def ask(
+        self,
+        tool_id: str,
+        args: Dict[str, Any],
+        session: Optional[str] = None,
+        timeout: Optional[float] = None,
+        max_invocations: Optional[int] = None,
+        stream: Optional[Stream] = None,
+        usage: Optional[UsageMeter] = None,
+    ) -> Dict[str, Any]:
         """Execute a tool request, handling nested tool calls via the stack.
 
         The tool stack works as follows:
         - Each tool.dispatch() returns a ToolResponse
         - If response.call_id is None: tool is done, return result to previous tool
         - If response.call_id is set: push that tool onto stack and continue
+        - If response.calls is set: run each call concurrently on its own stack, then pass all
+          of their results back to the calling tool at once
+
+        Each call gets its own stack, so asks never see one another's frames. Tool state that
+        outlives an ask, such as minion histories, is kept in the given session instead.
 
         Args:
             tool_id: ID of the tool to execute
             args: Arguments to pass to the tool
+            session: ID of the session (conversation) this request belongs to. If None, the
+                request gets a fresh session of its own, discarded once it's done.
+            timeout: Seconds allowed for the whole request. Tools see the remaining time
+                through ToolContext.budget, and should bound their own I/O by it.
+            max_invocations: Maximum number of tool invocations, including nested ones
+            stream: If given, completions are streamed, and receive model text and tool calls
+                as they are generated (see early_dispatch). Pass a bare Stream() to stream
+                only for the sake of early dispatch.
+            usage: If given, accumulates the token usage and latency of every completion made
+                for this request. (Usage is also accumulated per session; see Session.usage.)
 
         Returns:
             The final result after all nested tool calls complete
 
         Raises:
             Exception: If tool_id is not found
+            BudgetExceeded: If the request runs out of time or invocations. The stack is
+                unwound, but a synchronous tool already running can't be interrupted.
         """
-        response: Optional[ToolResult] = None
-        self.push_tool(tool_id, args, "")
-        while len(self._stack) > 0:
-            frame = self._stack[-1]
-            args = frame.result_args if frame.result_args else frame.args
-            print(
-                f"--> invoking {frame.tool_id} <- {frame.result_tool_id}({frame.result_call_id})\n{trunc(str(args), 120)}"
-            )
+        session_id = session if session is not None else _anonymous_session()
+        ctx = self._context(session_id, Budget(timeout, max_invocations), stream, usage)
+        stack: List[Frame] = []
+        self.push_tool(stack, tool_id, args, "")
+        try:
+            return self._run(stack, ctx)
+        finally:
+            if session is None:
+                self.end_session(session_id)
 
-            # TODO: Catch any exception and return it to the caller as a
-            # structured error response, focusing on LLM self-repair.
-            response = frame.tool.invoke(
-                ToolCall(
-                    name=frame.tool_id,
-                    args=args,
-                    context=ToolContext(),
-                    result_tool_id=frame.result_tool_id,
-                    result_call_id=frame.result_call_id,
-                )
-            )
+    async def ask_async(
+        self,
+        tool_id: str,
+        args: Dict[str, Any],
+        session: Optional[str] = None,
+        timeout: Optional[float] = None,
+        max_invocations: Optional[int] = None,
+        stream: Optional[Stream] = None,
+        usage: Optional[UsageMeter] = None,
+    ) -> Dict[str, Any]:
+        """Asynchronous equivalent of ask().
 
-            if response.call_tool_id == ResultToolId:
-                # The Tool is done; pop it off the stack and pass the response to the underlying frame.
-                last_frame = self._stack.pop()
-                if len(self._stack) > 0:
-                    self._stack[-1].respond(
-                        last_frame.tool_id, last_frame.call_id, response.args
-                    )
-            elif response.call_tool_id == ExceptToolId:
-                ex = parse_val(response.args, schema_for(Except))
-                raise Exception(ex.message)
-            else:
-                # It wants to call another tool; push it on the stack.
-                self.push_tool(
-                    response.call_tool_id, response.args, response.call_id or ""
-                )
+        Coroutine tools (see AsyncTool) are awaited directly, while synchronous tools are run
+        on the agency's executor so they don't block the event loop. Many asks can thus be in
+        flight on a single loop, each waiting on its own model or network I/O.
 
-        return response.args if response else {}
+        On timeout, all in-flight work is cancelled; synchronous tools running on the executor
+        are abandoned rather than interrupted.
+        """
+        session_id = session if session is not None else _anonymous_session()
+        ctx = self._context(session_id, Budget(timeout, max_invocations), stream, usage)
+        stack: List[Frame] = []
+        self.push_tool(stack, tool_id, args, "")
+        deadline = asyncio.timeout(timeout)
+        try:
+            async with deadline:
+                return await self._run_async(stack, ctx)
+        except TimeoutError:
+            if deadline.expired():
+                raise BudgetExceeded("deadline exceeded")
+            raise
+        finally:
+            if session is None:
+                self.end_session(session_id)
 
-    def push_tool(self, tool_id: str, args: Dict[str, Any], call_id: str):
-        """Push a tool onto the stack by its ID."""
-        self._stack.append(
-            Frame(
-                tool=self.tool_by_id(tool_id),
-                tool_id=tool_id,
-                args=args,
+    def ask_many(
+        self,
+        tool_id: str,
+        args_iter: Iterable[Dict[str, Any]],
+        concurrency: int = 4,
+        timeout: Optional[float] = None,
+        max_invocations: Optional[int] = None,
+    ) -> AskBatch:
+        """Runs many independent asks of the same tool, concurrently.
+
+        Each item runs in its own fresh session, discarded when the item completes, so items
+        never see one another's histories. Iterate over the returned batch to receive each
+        item's AskResult, including its usage, as it completes; the batch's stats summarize
+        progress so far.
+
+        Args:
+            tool_id: ID of the tool to execute for each item
+            args_iter: Arguments for each item; consumed lazily
+            concurrency: Maximum number of items in flight at once
+            timeout: Per-item deadline, as in ask()
+            max_invocations: Per-item invocation limit, as in ask()
+        """
+
+        def ask_item(
+            index: int, args: Dict[str, Any], usage: UsageMeter
+        ) -> Dict[str, Any]:
+            return self.ask(tool_id, args, None, timeout, max_invocations, usage=usage)
+
+        return AskBatch(ask_item, args_iter, concurrency)
+
+    @property
+    def cache(self) -> ToolCache:
+        return self._cache
+
+    def session(self, session_id: str) -> Session:
+        """Gets the session with the given id, creating it if necessary."""
+        return self._sessions.get(session_id)
+
+    def end_session(self, session_id: str):
+        """Discards a session's state, e.g. when its user disconnects."""
+        self._sessions.drop(session_id)
+
+    def push_tool(
+        self,
+        stack: List[Frame],
+        tool_id: str,
+        args: Dict[str, Any],
+        call_id: str,
+        parent: Optional[Span] = None,
+    ):
+        """Push a tool onto the stack by its ID.
+
+        When tracing, the frame's span is nested within the frame below it, or else parent.
+        """
+        frame = Frame(
+            tool=self.tool_by_id(tool_id),
+            tool_id=tool_id,
+            args=args,
+            call_id=call_id,
+        )
+        if self._tracer:
+            frame.span = self._tracer.begin(
+                f"frame {tool_id}",
+                "frame",
+                parent=stack[-1].span if stack else parent,
                 call_id=call_id,
+                args_size=json_size(args),
             )
-        )
+        stack.append(frame)
+
+    def pop_tool(self, stack: List[Frame], **span_args: Any) -> Frame:
+        """Pop the top frame off the stack, closing its span."""
+        frame = stack.pop()
+        if self._tracer and frame.span:
+            self._tracer.end(frame.span, **span_args)
+        return frame
 
-    def tool_by_id(self, tool_id: str) -> Tool:
+    def tool_by_id(self, tool_id: str) -> AnyTool:
         if tool_id in self._toolbox:
             return self._toolbox[tool_id]
         raise Exception(f"no such tool: {tool_id}")
+
+    def _context(
+        self,
+        session_id: str,
+        budget: Budget,
+        stream: Optional[Stream],
+        usage: Optional[UsageMeter],
+    ) -> ToolContext:
+        return ToolContext(
+            session=self._sessions.get(session_id),
+            tracer=self._tracer,
+            budget=budget,
+            stream=stream,
+            usage=usage,
+        )
+
+    def _run(self, stack: List[Frame], ctx: ToolContext) -> Dict[str, Any]:
+        response: Optional[ToolResult] = None
+        try:
+            while len(stack) > 0:
+                frame = stack[-1]
+
+                # TODO: Catch any exception and return it to the caller as a
+                # structured error response, focusing on LLM self-repair.
+                prefetch = self._prefetch(ctx, frame)
+                req = self._tool_call(frame, ctx, prefetch)
+                if ctx.budget:
+                    ctx.budget.charge()
+                try:
+                    with self._invoke_span(frame) as span:
+                        response = self._cached(frame.tool, req)
+                        cached = response is not None
+                        if response is None:
+                            self._limits.acquire(tool_key(frame.tool_id))
+                            response = self._invoke(frame.tool, req)
+                            self._update_cache(frame.tool, req, response)
+                        self._end_invoke_span(span, response, cached)
+
+                    early = prefetch.take(response.call_id) if prefetch else None
+                    if response.calls:
+                        frame.respond_all(
+                            self._run_batch(response.calls, ctx, frame, prefetch)
+                        )
+                    elif early:
+                        # Already started in this scope while the model was streaming; equivalent to
+                        # pushing it.
+                        result = early.result()
+                        frame.respond(result.name, result.id, result.arguments)
+                    else:
+                        self._handle(stack, response)
+                finally:
+                    if prefetch:
+                        prefetch.close()
+        except BaseException:
+            self._unwind(stack)
+            raise
+
+        return response.args if response else {}
+
+    async def _run_async(self, stack: List[Frame], ctx: ToolContext) -> Dict[str, Any]:
+        response: Optional[ToolResult] = None
+        try:
+            while len(stack) > 0:
+                frame = stack[-1]
+                prefetch = self._prefetch_async(ctx, frame)
+                req = self._tool_call(frame, ctx, prefetch)
+                if ctx.budget:
+                    ctx.budget.charge()
+                try:
+                    with self._invoke_span(frame) as span:
+                        response = self._cached(frame.tool, req)
+                        cached = response is not None
+                        if response is None:
+                            await self._limits.acquire_async(tool_key(frame.tool_id))
+                            response = await self._invoke_async(frame.tool, req)
+                            self._update_cache(frame.tool, req, response)
+                        self._end_invoke_span(span, response, cached)
+
+                    early = prefetch.take(response.call_id) if prefetch else None
+                    if response.calls:
+                        frame.respond_all(
+                            await self._run_batch_async(
+                                response.calls, ctx, frame, prefetch
+                            )
+                        )
+                    elif early:
+                        result = await asyncio.wrap_future(early)
+                        frame.respond(result.name, result.id, result.arguments)
+                    else:
+                        self._handle(stack, response)
+                finally:
+                    if prefetch:
+                        prefetch.close()
+        except BaseException:
+            self._unwind(stack)
+            raise
+
+        return response.args if response else {}
+
+    def _unwind(self, stack: List[Frame]):
+        """Pops every remaining frame after a failure."""
+        while stack:
+            self.pop_tool(stack, error=True)
+
+    def _invoke_span(self, frame: Frame) -> ContextManager[Optional[Span]]:
+        if self._tracer is None:
+            return nullcontext()
+        return self._tracer.span(f"invoke {frame.tool_id}", "tool", parent=frame.span)
+
+    def _end_invoke_span(
+        self, span: Optional[Span], response: ToolResult, cached: bool
+    ):
+        if span is not None:
+            span.args["cached"] = cached
+            span.args["result_size"] = json_size(response.args)
+            span.args["next"] = (
+                f"batch({len(response.calls)})"
+                if response.calls
+                else response.call_tool_id
+            )
+
+    def _prefetch(self, ctx: ToolContext, caller: Frame) -> Optional[_Prefetch]:
+        if ctx.stream is None or not self._early_dispatch:
+            return None
+        return _Prefetch(
+            ctx.stream,
+            lambda call, first: self._run_call(
+                call, ctx, caller, scoped=not _shares_scope(call, caller, first)
+            ),
+            self._max_parallel,
+        )
+
+    def _prefetch_async(self, ctx: ToolContext, caller: Frame) -> Optional[_Prefetch]:
+        if ctx.stream is None or not self._early_dispatch:
+            return None
+        return _AsyncPrefetch(
+            ctx.stream,
+            lambda call, first: self._run_call_async(
+                call, ctx, caller, scoped=not _shares_scope(call, caller, first)
+            ),
+            asyncio.get_running_loop(),
+        )
+
+    def _run_call(
+        self, call: FunctionCall, ctx: ToolContext, caller: Frame, scoped: bool = True
+    ) -> FunctionCall:
+        """Runs a single call from caller on its own stack, and in its own scope unless not scoped."""
+        stack: List[Frame] = []
+        self.push_tool(stack, call.name, call.arguments, call.id, caller.span)
+        with self._call_scope(call, ctx) if scoped else nullcontext(ctx) as call_ctx:
+            result = self._run(stack, call_ctx)
+        return FunctionCall(id=call.id, name=call.name, arguments=result)
+
+    async def _run_call_async(
+        self, call: FunctionCall, ctx: ToolContext, caller: Frame, scoped: bool = True
+    ) -> FunctionCall:
+        stack: List[Frame] = []
+        self.push_tool(stack, call.name, call.arguments, call.id, caller.span)
+        with self._call_scope(call, ctx) if scoped else nullcontext(ctx) as call_ctx:
+            result = await self._run_async(stack, call_ctx)
+        return FunctionCall(id=call.id, name=call.name, arguments=result)
+
+    @contextmanager
+    def _call_scope(
+        self, call: FunctionCall, ctx: ToolContext
+    ) -> Iterator[ToolContext]:
+        """Scopes tools' session state to a call, discarding it once the call is done.
+
+        Calls run on their own stack may run concurrently with others (even to the same tool),
+        so mustn't share conversation state with them.
+        """
+        scope = ctx.scope + (call.id or uuid.uuid4().hex,)
+        try:
+            yield replace(ctx, scope=scope)
+        finally:
+            if ctx.session:
+                ctx.session.drop_scope(scope)
+
+    def _run_batch(
+        self,
+        calls: List[FunctionCall],
+        ctx: ToolContext,
+        caller: Frame,
+        prefetch: Optional[_Prefetch] = None,
+    ) -> List[FunctionCall]:
+        """Runs a batch of calls concurrently, each on its own stack, returning their results in order.
+
+        Calls already started by prefetch are waited on rather than run again.
+        """
+
+        def run_call(call: FunctionCall) -> FunctionCall:
+            early = prefetch.take(call.id) if prefetch else None
+            return early.result() if early else self._run_call(call, ctx, caller)
+
+        # Use a pool per batch, so that batches nested within a batch can't starve one another of workers.
+        # If any call fails, don't wait on the rest; they'll stop at their next budget check, if not before.
+        pool = ThreadPoolExecutor(min(len(calls), self._max_parallel))
+        try:
+            return list(pool.map(run_call, calls))
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    async def _run_batch_async(
+        self,
+        calls: List[FunctionCall],
+        ctx: ToolContext,
+        caller: Frame,
+        prefetch: Optional[_Prefetch] = None,
+    ) -> List[FunctionCall]:
+        limit = asyncio.Semaphore(self._max_parallel)
+
+        async def run_call(call: FunctionCall) -> FunctionCall:
+            early = prefetch.take(call.id) if prefetch else None
+            if early:
+                return await asyncio.wrap_future(early)
+            async with limit:
+                return await self._run_call_async(call, ctx, caller)
+
+        return list(await asyncio.gather(*[run_call(call) for call in calls]))
+
+    def _tool_call(
+        self, frame: Frame, ctx: ToolContext, prefetch: Optional[_Prefetch] = None
+    ) -> ToolCall:
+        args = frame.result_args if frame.result_args else frame.args
+        print(
+            f"--> invoking {frame.tool_id} <- {frame.result_tool_id}({frame.result_call_id})\n{trunc(str(args), 120)}"
+        )
+        return ToolCall(
+            name=frame.tool_id,
+            args=args,
+            context=replace(ctx, stream=prefetch) if prefetch else ctx,
+            result_tool_id=frame.result_tool_id,
+            result_call_id=frame.result_call_id,
+            results=frame.result_calls,
+        )
+
+    def _handle(self, stack: List[Frame], response: ToolResult):
+        """Applies a tool's response to the stack, popping or pushing frames as needed."""
+        if response.call_tool_id == ResultToolId:
+            # The Tool is done; pop it off the stack and pass the response to the underlying frame.
+            last_frame = self.pop_tool(stack, result_size=json_size(response.args))
+            if len(stack) > 0:
+                stack[-1].respond(last_frame.tool_id, last_frame.call_id, response.args)
+        elif response.call_tool_id == ExceptToolId:
+            ex = parse_val(response.args, schema_for(Except))
+            raise Exception(ex.message)
+        else:
+            # It wants to call another tool; push it on the stack.
+            self.push_tool(
+                stack, response.call_tool_id, response.args, response.call_id or ""
+            )
+
+    def _cached(self, tool: AnyTool, req: ToolCall) -> Optional[ToolResult]:
+        """Gets a cached result for an initial call to a cacheable tool, if there is one."""
+        if not tool.decl.cacheable or req.result_tool_id or req.results:
+            return None
+        result = self._cache.get(tool.decl.id, req.args)
+        return ToolResult(result) if result is not None else None
+
+    def _update_cache(self, tool: AnyTool, req: ToolCall, response: ToolResult):
+        decl = tool.decl
+        for tool_id in decl.invalidates:
+            self._cache.invalidate(tool_id)
+
+        # Only cache complete, successful results of initial calls.
+        if (
+            decl.cacheable
+            and not req.result_tool_id
+            and response.call_tool_id == ResultToolId
+            and not response.calls
+            and not response.args.get("error")
+        ):
+            self._cache.put(decl.id, req.args, response.args, decl.cache_ttl)
+
+    def _invoke(self, tool: AnyTool, req: ToolCall) -> ToolResult:
+        result = tool.invoke(req)
+        if inspect.isawaitable(result):
+            # Async tools can still be driven from the synchronous loop.
+            return _run_sync(result)
+        return result
+
+    async def _invoke_async(self, tool: AnyTool, req: ToolCall) -> ToolResult:
+        if inspect.iscoroutinefunction(tool.invoke):
+            return await tool.invoke(req)
+        # Run in a copy of the current context, so the tool sees the current span.
+        invoke = cast(Callable[[ToolCall], Any], tool.invoke)
+        loop = asyncio.get_running_loop()
+        ctx = contextvars.copy_context()
+        result = await loop.run_in_executor(
+            self._executor, lambda: ctx.run(invoke, req)
+        )
+        # Tools needn't be declared async to return an awaitable.
+        if inspect.isawaitable(result):
+            return await result
+        return result
+
+
+def _anonymous_session() -> str:
+    return f"anonymous-{uuid.uuid4().hex}"
+
+
+def _run_sync(value: Awaitable[ToolResult]) -> ToolResult:
+    """Drives an awaitable to completion from synchronous code.
+
+    Event loops can't be nested, so if this thread is already running one (as in notebooks),
+    the awaitable is run on a loop in a helper thread instead.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(_awaited(value))
+    ctx = contextvars.copy_context()
+    with ThreadPoolExecutor(1) as pool:
+        return pool.submit(ctx.run, asyncio.run, _awaited(value)).result()
+
+
+async def _awaited(value: Awaitable[ToolResult]) -> ToolResult:
+    return await value
+
+
+def _shares_scope(call: FunctionCall, caller: Frame, first: bool) -> bool:
+    """Whether a call started early should run in its caller's scope, as it would if pushed.
+
+    Only the first call can be, as any later ones make a batch. Nor can a call back to the caller's
+    own tool, whose state the caller is still using until its completion ends.
+    """
+    return first and call.name != caller.tool_id
+
+
+class _Prefetch(Stream):
+    """Forwards a stream, starting each tool call in it as soon as the call is complete.
+
+    Started calls are run to completion in the background, for the agency to collect (with
+    take()) once the tool that made them returns. Any left uncollected are cancelled on close().
+    The run function is told whether each call is the first started, which may turn out to be
+    the only one, and so run just as if pushed onto the caller's stack.
+    """
+
+    _inner: Stream
+    _run: Callable[[FunctionCall, bool], Any]
+    _futures: Dict[str, Future[FunctionCall]]
+    _started: int
+    _max_parallel: int
+    _pool: Optional[ThreadPoolExecutor]
+
+    def __init__(
+        self,
+        inner: Stream,
+        run: Callable[[FunctionCall, bool], Any],
+        max_parallel: int = 8,
+    ):
+        self._inner = inner
+        self._run = run
+        self._futures = {}
+        self._started = 0
+        self._max_parallel = max_parallel
+        self._pool = None
+
+    def text(self, delta: str):
+        self._inner.text(delta)
+
+    def call(self, call: FunctionCall):
+        self._inner.call(call)
+        # Results and exceptions are handled by the stack itself, and unidentified calls can't
+        # be matched to the completion.
+        if call.name in (ResultToolId, ExceptToolId) or not call.id:
+            return
+        if call.id not in self._futures:
+            self._futures[call.id] = self._submit(call, self._started == 0)
+            self._started += 1
+
+    def take(self, call_id: Optional[str]) -> Optional[Future[FunctionCall]]:
+        return self._futures.pop(call_id, None) if call_id else None
+
+    def close(self):
+        for future in self._futures.values():
+            future.cancel()
+        if self._pool:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def _submit(self, call: FunctionCall, first: bool) -> Future[FunctionCall]:
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(self._max_parallel)
+        return self._pool.submit(self._run, call, first)
+
+
+class _AsyncPrefetch(_Prefetch):
+    """A _Prefetch that starts calls on an event loop, from whichever thread the stream runs in."""
+
+    _loop: asyncio.AbstractEventLoop
+
+    def __init__(
+        self,
+        inner: Stream,
+        run: Callable[[FunctionCall, bool], Awaitable[FunctionCall]],
+        loop: asyncio.AbstractEventLoop,
+    ):
+        super().__init__(inner, run)
+        self._loop = loop
+
+    def _submit(self, call: FunctionCall, first: bool) -> Future[FunctionCall]:
+        return asyncio.run_coroutine_threadsafe(self._run(call, first), self._loop)
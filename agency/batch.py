@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Set, Tuple
+
+from agency.models import Usage
+from agency.usage import UsageMeter
+
+
+@dataclass
+class AskResult:
+    """The outcome of one item of a batch; exactly one of result or error is set."""
+
+    index: int
+    args: Dict[str, Any]
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[Exception] = None
+    elapsed: float = 0.0
+    usage: Usage = field(default_factory=lambda: Usage(completions=0))
+
+
+@dataclass
+class BatchStats:
+    """Aggregate statistics for a batch, updated as results are delivered."""
+
+    completed: int = 0
+    failed: int = 0
+    busy_time: float = 0.0
+    usage: Usage = field(default_factory=lambda: Usage(completions=0))
+    start: Optional[float] = None  # When the first item was submitted
+    end: Optional[float] = None
+
+    @property
+    def elapsed(self) -> float:
+        if self.start is None:
+            return 0.0
+        return (self.end or time.monotonic()) - self.start
+
+    @property
+    def throughput(self) -> float:
+        """Items finished per second of wall time."""
+        return (self.completed + self.failed) / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def mean_latency(self) -> float:
+        finished = self.completed + self.failed
+        return self.busy_time / finished if finished else 0.0
+
+
+class AskBatch:
+    """Runs independent asks with bounded concurrency, yielding results as they complete.
+
+    Items are drawn from the args iterable lazily, so it may be arbitrarily long. A failing item
+    yields an AskResult with its error set, rather than aborting the batch.
+    """
+
+    stats: BatchStats
+    _ask: Callable[[int, Dict[str, Any], UsageMeter], Dict[str, Any]]
+    _args: Iterable[Dict[str, Any]]
+    _concurrency: int
+    _lock: threading.Lock
+
+    def __init__(
+        self,
+        ask: Callable[[int, Dict[str, Any], UsageMeter], Dict[str, Any]],
+        args: Iterable[Dict[str, Any]],
+        concurrency: int,
+    ):
+        self.stats = BatchStats()
+        self._ask = ask
+        self._args = args
+        self._concurrency = concurrency
+        self._lock = threading.Lock()
+
+    def __iter__(self) -> Iterator[AskResult]:
+        items = enumerate(self._args)
+        pending: Set[Future[AskResult]] = set()
+        with ThreadPoolExecutor(self._concurrency) as pool:
+            # Keep at most `concurrency` items in flight, topping up as each completes.
+            for item in _take(items, self._concurrency):
+                pending.add(self._submit(pool, item))
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for item in _take(items, len(done)):
+                    pending.add(self._submit(pool, item))
+                for future in done:
+                    yield self._record(future.result())
+        self.stats.end = time.monotonic()
+
+    def _submit(
+        self, pool: ThreadPoolExecutor, item: Tuple[int, Dict[str, Any]]
+    ) -> Future[AskResult]:
+        # Time the batch from its first item, not from when it was created.
+        if self.stats.start is None:
+            self.stats.start = time.monotonic()
+        return pool.submit(self._run, *item)
+
+    def _run(self, index: int, args: Dict[str, Any]) -> AskResult:
+        start = time.monotonic()
+        usage = UsageMeter()
+        try:
+            result = self._ask(index, args, usage)
+            return AskResult(
+                index,
+                args,
+                result,
+                elapsed=time.monotonic() - start,
+                usage=usage.total(),
+            )
+        except Exception as e:
+            return AskResult(
+                index,
+                args,
+                error=e,
+                elapsed=time.monotonic() - start,
+                usage=usage.total(),
+            )
+
+    def _record(self, result: AskResult) -> AskResult:
+        with self._lock:
+            if result.error is None:
+                self.stats.completed += 1
+            else:
+                self.stats.failed += 1
+            self.stats.busy_time += result.elapsed
+            self.stats.usage = self.stats.usage + result.usage
+        return result
+
+
+def _take(
+    items: Iterator[Tuple[int, Dict[str, Any]]], n: int
+) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    for _ in range(n):
+        item = next(items, None)
+        if item is None:
+            return
+        yield item
@@ -0,0 +1,504 @@
+"""Microbenchmarks for the agency's hot paths.
+
+Run all benchmarks (or those whose names contain any of the given filters) with:
+
+    python -m agency.benchmarks.bench [filter ...] [--save [LABEL]] [--compare LABEL]
+
+Results are saved under agency/benchmarks/results/, labelled by git commit unless a label is
+given, so runs on different commits can be compared. Everything runs offline; the storage
+benchmarks use fake embeddings and temporary chroma databases.
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import hashlib
+import io
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, List
+from unittest.mock import patch
+
+from agency.agency import Agency, Frame
+from agency.benchmarks.harness import (
+    Result,
+    compare,
+    load,
+    measure,
+    measure_memory,
+    save,
+)
+from agency.models import FunctionCall, Message, Role, Usage
+from agency.schema import (
+    encode_json,
+    encode_val,
+    parse_val,
+    prop,
+    schema,
+    schema_for,
+)
+from agency.tool import ToolCall, ToolDecl, ToolResult
+from agency.utils import timestamp
+
+Suite = Callable[[], List[Result]]
+_suites: Dict[str, Suite] = {}
+
+
+def suite(fn: Suite) -> Suite:
+    _suites[fn.__name__] = fn
+    return fn
+
+
+# Dispatch.
+
+
+@dataclass
+class RecurseTool:
+    """Calls itself until depth reaches zero, then returns; exercises push/pop per frame."""
+
+    decl: ToolDecl
+
+    def invoke(self, req: ToolCall) -> ToolResult:
+        if req.result_tool_id:
+            return ToolResult(req.args)
+        depth = req.args["depth"]
+        if depth == 0:
+            return ToolResult({"done": True})
+        return ToolResult({"depth": depth - 1}, call_tool_id="recurse", call_id="c")
+
+
+@suite
+def dispatch() -> List[Result]:
+    decl = ToolDecl("recurse", "", schema_for(Leaf), schema_for(Leaf))
+    agency = Agency([RecurseTool(decl)])
+    results = []
+    with _quiet():
+        for depth in (1, 10, 100):
+            # Each level is pushed once and invoked twice (call, then result).
+            results.append(
+                measure(
+                    f"dispatch/frame(depth={depth})",
+                    lambda: agency.ask("recurse", {"depth": depth}),
+                    ops=depth + 1,
+                )
+            )
+    return results
+
+
+# Schema.
+
+
+@schema(slots=True)
+class Leaf:
+    name: str = prop("name")
+    count: int = prop("count")
+    score: float = prop("score")
+    ok: bool = prop("ok")
+
+
+@schema()
+class Branch:
+    label: str = prop("label")
+    leaves: List[Leaf] = prop("leaves")
+
+
+@schema()
+class Tree:
+    title: str = prop("title")
+    branches: List[Branch] = prop("branches")
+    root: Leaf = prop("root")
+
+
+def _leaf(i: int) -> Dict:
+    return {"name": f"leaf{i}", "count": i, "score": i / 3, "ok": i % 2 == 0}
+
+
+def _tree(branches: int, leaves: int) -> Dict:
+    return {
+        "title": "tree",
+        "root": _leaf(0),
+        "branches": [
+            {"label": f"b{b}", "leaves": [_leaf(i) for i in range(leaves)]}
+            for b in range(branches)
+        ],
+    }
+
+
+@suite
+def schemas() -> List[Result]:
+    tree_schema = schema_for(Tree)
+    results = []
+    for branches, leaves in ((1, 10), (10, 100)):
+        payload = _tree(branches, leaves)
+        results.append(
+            measure(
+                f"schema/parse_val(leaves={branches * leaves})",
+                lambda: parse_val(payload, tree_schema),
+                ops=branches * leaves,
+            )
+        )
+        tree = parse_val(payload, tree_schema)
+        results.append(
+            measure(
+                f"schema/encode_val(leaves={branches * leaves})",
+                lambda: encode_val(tree, tree_schema),
+                ops=branches * leaves,
+            )
+        )
+        results.append(
+            measure(
+                f"schema/encode_json(leaves={branches * leaves})",
+                lambda: encode_json(tree, tree_schema),
+                ops=branches * leaves,
+            )
+        )
+    results.append(measure("schema/to_openapi(Tree)", tree_schema.to_openapi))
+    return results
+
+
+# Startup.
+
+
+@suite
+def startup() -> List[Result]:
+    from agency.benchmarks.importtime import profile
+
+    results = []
+    for module in ("agency", "agency.models.openrouter", "agency.tools"):
+        # Each import runs in a fresh interpreter.
+        samples = [
+            next(t.cumulative for t in profile(module) if t.name == module)
+            for _ in range(3)
+        ]
+        results.append(
+            Result(
+                name=f"startup/import({module})",
+                ops=1,
+                mean=statistics.mean(samples),
+                median=statistics.median(samples),
+                min=min(samples),
+                stdev=statistics.stdev(samples),
+            )
+        )
+    return results
+
+
+# Memory.
+
+
+def _session(turns: int) -> List[object]:
+    """The objects a session keeps alive after `turns` tool calls: its minion's history, and
+    each call's ToolCall, ToolResult and Frame (e.g. retained by a trace)."""
+    tool = RecurseTool(ToolDecl("recurse", "", schema_for(Leaf), schema_for(Leaf)))
+    retained: List[object] = [Message(Role.SYSTEM, content="You are a helpful agent.")]
+    for i in range(turns):
+        call = FunctionCall(f"call-{i}", "recurse", {"depth": i})
+        leaf = Leaf(name=f"leaf{i}", count=i, score=i / 3, ok=True)
+        result = FunctionCall(f"call-{i}", "recurse", {"leaf": leaf})
+        frame = Frame(tool, "recurse", call.arguments, call.id)
+        frame.respond("__result__", call.id, result.arguments)
+        retained += [
+            Message(Role.ASSISTANT, function=call, usage=Usage(100, 20, 120, 0.5)),
+            Message(Role.TOOL, function=result),
+            ToolCall("recurse", call.arguments, result_call_id=call.id),
+            ToolResult(result.arguments),
+            frame,
+        ]
+    return retained
+
+
+@suite
+def memory() -> List[Result]:
+    sessions = 100
+    return [
+        measure_memory(
+            f"memory/session(turns={turns})",
+            lambda: [_session(turns) for _ in range(sessions)],
+            ops=sessions,
+        )
+        for turns in (10, 100)
+    ]
+
+
+# OpenRouter message conversion.
+
+
+def _history(turns: int, result_size: int) -> List[Message]:
+    history = [Message(Role.SYSTEM, "system prompt")]
+    for i in range(turns):
+        call = FunctionCall(f"call{i}", "browse-url", {"url": f"https://x/{i}"})
+        history.append(Message(Role.ASSISTANT, function=call))
+        history.append(
+            Message(
+                Role.TOOL,
+                function=FunctionCall(call.id, call.name, {"text": "x" * result_size}),
+            )
+        )
+    return history
+
+
+@suite
+def openrouter() -> List[Result]:
+    from agency.models.openrouter import OpenRouter
+
+    model = OpenRouter("bench")
+    results = []
+    for turns in (10, 100, 500):
+        history = _history(turns, 10_000)
+        results.append(
+            measure(
+                f"openrouter/convert_messages(turns={turns})",
+                lambda: model._convert_messages(history),
+            )
+        )
+    return results
+
+
+# End-to-end asks against a local stand-in for OpenRouter.
+
+
+@suite
+def standin() -> List[Result]:
+    from agency.minion import Minion
+    from agency.models.openrouter import OpenRouter
+    from agency.models.standin import StandIn, lognormal
+
+    results = []
+    with _quiet(), StandIn(latency=lognormal(0.05, seed=0)) as server:
+        decl = ToolDecl("ask", "", schema_for(Leaf), schema_for(Leaf))
+        minion = Minion(
+            decl,
+            OpenRouter("bench", base_url=server.url, api_key="standin"),
+            "{{ name }}",
+            [],
+        )
+        agency = Agency([minion])
+        for concurrency in (1, 16, 64):
+            n = concurrency * 4
+
+            def run():
+                batch = agency.ask_many(
+                    "ask", ({"name": str(i)} for i in range(n)), concurrency
+                )
+                for result in batch:
+                    if result.error:
+                        raise result.error
+
+            results.append(
+                measure(
+                    f"standin/ask_many(concurrency={concurrency})",
+                    run,
+                    ops=n,
+                    repeat=3,
+                    min_time=0,
+                )
+            )
+    return results
+
+
+# Embedding.
+
+
+def _fake_embed(text: str):
+    import numpy
+
+    seed = int.from_bytes(hashlib.md5(text.encode()).digest()[:8], "little")
+    return numpy.random.default_rng(seed).standard_normal(384, dtype=numpy.float32)
+
+
+class _FakeModel:
+    """Stands in for the sentence-transformers model. Each call costs `overhead` seconds, plus
+    `per_text` per text, roughly as a small model's forward pass does on CPU."""
+
+    def __init__(self, overhead: float = 0.0, per_text: float = 0.0):
+        self.overhead = overhead
+        self.per_text = per_text
+
+    def encode(self, texts: List[str], batch_size: int = 32):
+        import numpy
+
+        time.sleep(self.overhead + self.per_text * len(texts))
+        return numpy.stack([_fake_embed(text) for text in texts])
+
+
+@suite
+def embedding() -> List[Result]:
+    from agency.embedcache import EmbeddingCache
+    from agency.embedding import EmbeddingService
+
+    model = _FakeModel(overhead=0.002, per_text=0.0001)
+    service = EmbeddingService(model.encode)
+    texts = [f"query {i}" for i in range(64)]
+
+    def threaded(threads: int):
+        with ThreadPoolExecutor(threads) as pool:
+            list(pool.map(service.embed, texts))
+
+    results = [
+        # What each caller paid before: a forward pass per text.
+        measure(
+            "embedding/encode(per-call)",
+            lambda: [model.encode([text]) for text in texts],
+            ops=len(texts),
+            repeat=3,
+        ),
+        measure(
+            "embedding/embed_texts(n=64)",
+            lambda: service.embed_many(texts),
+            ops=len(texts),
+            repeat=3,
+        ),
+    ]
+    for threads in (1, 16, 64):
+        results.append(
+            measure(
+                f"embedding/embed(threads={threads})",
+                lambda: threaded(threads),
+                ops=len(texts),
+                repeat=3,
+            )
+        )
+
+    # Repeated texts, served from the on-disk cache.
+    cache_dir = tempfile.mkdtemp(prefix="agency-bench-")
+    try:
+        cached = EmbeddingService(model.encode, cache=EmbeddingCache(cache_dir))
+        cached.embed_many(texts)
+        results.append(
+            measure(
+                "embedding/embed_texts(n=64, cached)",
+                lambda: cached.embed_many(texts),
+                ops=len(texts),
+            )
+        )
+    finally:
+        shutil.rmtree(cache_dir)
+    return results
+
+
+# Storage.
+
+
+def _notes_dir(count: int) -> str:
+    root = tempfile.mkdtemp(prefix="agency-bench-")
+    notes = os.path.join(root, "notes")
+    os.makedirs(notes)
+    words = ["alpha", "beta", "gamma", "delta", "river", "stone", "song", "tide"]
+    rng = random.Random(count)
+    for i in range(count):
+        with open(os.path.join(notes, f"note{i}.md"), "w") as file:
+            text = " ".join(rng.choice(words) for _ in range(60))
+            file.write(f"---\ntopic: {rng.choice(words)}\n---\n{text}")
+    return root
+
+
+@suite
+def storage() -> List[Result]:
+    try:
+        import chromadb
+
+        from agency import embedding
+        from agency.tools import docstore, logstore
+    except ImportError as e:
+        print(f"(skipping storage benchmarks: {e})")
+        return []
+
+    results = []
+    with contextlib.ExitStack() as stack:
+        stack.enter_context(_quiet())
+        stack.enter_context(patch.object(embedding, "_model", _FakeModel))
+
+        for count in (100, 1000, 3000):
+            root = _notes_dir(count)
+            stack.callback(shutil.rmtree, root)
+
+            # Cold: every note is embedded and indexed into a fresh database.
+            clients = []
+
+            def fresh_client():
+                db_dir = tempfile.mkdtemp(dir=root)
+                clients.append(chromadb.PersistentClient(db_dir))
+
+            results.append(
+                measure(
+                    f"docstore/load_dir(cold, n={count})",
+                    lambda: docstore.Docstore(clients[-1], root, "notes"),
+                    repeat=3,
+                    min_time=0,
+                    setup=fresh_client,
+                )
+            )
+
+            # Warm: every note is already indexed with a matching hash.
+            client = chromadb.PersistentClient(tempfile.mkdtemp(dir=root))
+            store = docstore.Docstore(client, root, "notes")
+            results.append(
+                measure(
+                    f"docstore/load_dir(warm, n={count})",
+                    lambda: docstore.Docstore(client, root, "notes"),
+                    repeat=3,
+                    min_time=0,
+                )
+            )
+            results.append(
+                measure(
+                    f"docstore/find(n={count})",
+                    lambda: store.find("river stone song", 5),
+                )
+            )
+
+            logs = logstore.LogStore(client, root, f"log{count}")
+            for i in range(count):
+                logs._coll.add(
+                    ids=str(i),
+                    documents=f"entry {i}",
+                    embeddings=_fake_embed(f"entry {i}").tolist(),
+                    metadatas={"when": float(i)},
+                )
+            begin, end = timestamp.fromtimestamp(0), timestamp.fromtimestamp(count / 2)
+            results.append(
+                measure(
+                    f"logstore/query(n={count})",
+                    lambda: logs.query("entry", begin, end),
+                )
+            )
+    return results
+
+
+@contextlib.contextmanager
+def _quiet():
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def main():
+    parser = argparse.ArgumentParser(description=(__doc__ or "").split("\n")[0])
+    parser.add_argument("filters", nargs="*", help="only run matching benchmarks")
+    parser.add_argument("--save", nargs="?", const="", help="save results (label)")
+    parser.add_argument("--compare", help="label or path of results to compare to")
+    args = parser.parse_args()
+
+    results: List[Result] = []
+    for name, run in _suites.items():
+        if args.filters and not any(f in name for f in args.filters):
+            continue
+        for result in run():
+            print(result)
+            results.append(result)
+
+    if args.save is not None:
+        print(f"saved to {save(results, args.save or None)}")
+    if args.compare:
+        print(f"\ncompared to {args.compare}:")
+        print("\n".join(compare(results, load(args.compare))))
+
+
+if __name__ == "__main__":
+    main()
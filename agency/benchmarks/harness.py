@@ -0,0 +1,158 @@
+"""Minimal benchmark harness: timing, memory, result storage and comparison between runs."""
+
+from __future__ import annotations
+
+import json
+import os
+import statistics
+import subprocess
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from typing import Callable, Dict, List, Optional
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+@dataclass
+class Result:
+    """Measurement for one benchmark, per operation: in seconds, or bytes for memory benchmarks."""
+
+    name: str
+    ops: int
+    mean: float
+    median: float
+    min: float
+    stdev: float
+    unit: str = "s"
+
+    def __str__(self) -> str:
+        fmt = lambda v: _fmt(v, self.unit)
+        return f"{self.name:<48} {fmt(self.median):>10} {fmt(self.min):>10} ±{self.stdev / self.median * 100 if self.median else 0:5.1f}%"
+
+
+def measure(
+    name: str,
+    fn: Callable[[], object],
+    ops: int = 1,
+    repeat: int = 5,
+    min_time: float = 0.1,
+    setup: Optional[Callable[[], object]] = None,
+) -> Result:
+    """Times fn(), which performs `ops` operations per call.
+
+    Each of `repeat` samples runs fn() enough times to take at least min_time seconds. If given,
+    setup() runs (untimed) before every call, e.g. to reset cold-start state.
+    """
+    # Calibrate the number of calls per sample.
+    number = 1
+    while True:
+        elapsed = _time(fn, number, setup)
+        if elapsed >= min_time or number >= 1 << 20:
+            break
+        number *= 2 if elapsed == 0 else max(2, int(min_time / elapsed) + 1)
+
+    samples = [_time(fn, number, setup) / (number * ops) for _ in range(repeat)]
+    return Result(
+        name=name,
+        ops=ops,
+        mean=statistics.mean(samples),
+        median=statistics.median(samples),
+        min=min(samples),
+        stdev=statistics.stdev(samples) if len(samples) > 1 else 0.0,
+    )
+
+
+def measure_memory(
+    name: str, build: Callable[[], object], ops: int = 1, repeat: int = 3
+) -> Result:
+    """Measures the memory retained by the result of build(), which creates `ops` objects."""
+    samples = []
+    for _ in range(repeat):
+        tracemalloc.start()
+        try:
+            retained = build()
+            size, _ = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        del retained
+        samples.append(size / ops)
+    return Result(
+        name=name,
+        ops=ops,
+        mean=statistics.mean(samples),
+        median=statistics.median(samples),
+        min=min(samples),
+        stdev=statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        unit="B",
+    )
+
+
+def save(results: List[Result], label: Optional[str] = None) -> str:
+    """Writes results to RESULTS_DIR/<label>.json, labelled by the current git commit by default."""
+    label = label or _git_revision()
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, f"{label}.json")
+    with open(path, "w") as file:
+        json.dump([asdict(r) for r in results], file, indent=2)
+    return path
+
+
+def load(label_or_path: str) -> Dict[str, Result]:
+    path = label_or_path
+    if not os.path.exists(path):
+        path = os.path.join(RESULTS_DIR, f"{label_or_path}.json")
+    with open(path) as file:
+        return {r["name"]: Result(**r) for r in json.load(file)}
+
+
+def compare(results: List[Result], baseline: Dict[str, Result]) -> List[str]:
+    """Formats a comparison of each result's median against the baseline's."""
+    lines = []
+    for r in results:
+        base = baseline.get(r.name)
+        if base is None:
+            lines.append(f"{r.name:<48} {_fmt(r.median, r.unit):>10}   (new)")
+            continue
+        ratio = r.median / base.median if base.median else float("inf")
+        better = "  faster" if r.unit == "s" else "  smaller"
+        flag = "  REGRESSION" if ratio > 1.1 else (better if ratio < 0.9 else "")
+        lines.append(
+            f"{r.name:<48} {_fmt(base.median, r.unit):>10} -> {_fmt(r.median, r.unit):>10} {ratio:6.2f}x{flag}"
+        )
+    return lines
+
+
+def _time(
+    fn: Callable[[], object], number: int, setup: Optional[Callable[[], object]]
+) -> float:
+    total = 0.0
+    for _ in range(number):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        total += time.perf_counter() - start
+    return total
+
+
+def _fmt(value: float, unit: str = "s") -> str:
+    if unit == "B":
+        for suffix, scale in (("MB", 1 << 20), ("KB", 1 << 10)):
+            if value >= scale:
+                return f"{value / scale:.2f}{suffix}"
+        return f"{value:.0f}B"
+
+    for suffix, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if value >= scale:
+            return f"{value / scale:.2f}{suffix}"
+    return f"{value / 1e-9:.0f}ns"
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], text=True
+        ).strip()
+    except Exception:
+        return time.strftime("%Y%m%d-%H%M%S")
@@ -0,0 +1,91 @@
+"""Reports what importing modules costs, and where the time goes, using python -X importtime.
+
+    python -m agency.benchmarks.importtime [module ...] [--top N]
+
+Each module is imported in a fresh interpreter. The report lists the imports with the largest
+cumulative time (including their own imports), which are the candidates for deferring.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import subprocess
+import sys
+from dataclasses import dataclass
+from typing import List
+
+DEFAULT_MODULES = ["agency", "agency.minion", "agency.models.openrouter", "agency.ui"]
+
+
+@dataclass
+class ImportTime:
+    """Time taken by one import, in seconds. Depth is its nesting beneath the imported module."""
+
+    name: str
+    self_time: float
+    cumulative: float
+    depth: int
+
+
+def profile(module: str) -> List[ImportTime]:
+    """Imports module in a fresh interpreter, returning the time taken by every import it makes."""
+    # Keys are read lazily, so importing shouldn't need them; clear them to make sure.
+    env = {
+        k: v
+        for k, v in os.environ.items()
+        if k not in ("OPENROUTER_API_KEY", "TAVILY_API_KEY")
+    }
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        env=env,
+    )
+    if proc.returncode != 0:
+        raise Exception(f"importing {module} failed:\n{proc.stderr[-2000:]}")
+
+    times = []
+    for line in proc.stderr.splitlines():
+        # e.g. "import time:       345 |     207777 |   agency.agency"
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        stripped = name.lstrip()
+        times.append(
+            ImportTime(
+                name=stripped,
+                self_time=int(self_us) / 1e6,
+                cumulative=int(cumulative_us) / 1e6,
+                depth=(len(name) - len(stripped) - 1) // 2,
+            )
+        )
+    return times
+
+
+def report(module: str, top: int = 15) -> str:
+    times = profile(module)
+    total = max((t.cumulative for t in times), default=0.0)
+    lines = [f"import {module}: {total * 1000:.1f}ms"]
+    for t in sorted(times, key=lambda t: t.cumulative, reverse=True)[:top]:
+        lines.append(
+            f"  {t.cumulative * 1000:8.1f}ms {t.self_time * 1000:7.1f}ms  {'  ' * t.depth}{t.name}"
+        )
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=(__doc__ or "").split("\n")[0])
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    parser.add_argument(
+        "--top", type=int, default=15, help="imports to list per module"
+    )
+    args = parser.parse_args()
+
+    print("  cumulative     self  import")
+    for module in args.modules:
+        print(report(module, args.top))
+
+
+if __name__ == "__main__":
+    main()
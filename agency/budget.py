@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import threading
+import time
+from typing import Optional
+
+
+class BudgetExceeded(Exception):
+    """Raised when a request runs past its deadline or invocation limit."""
+
+    pass
+
+
+class Budget:
+    """Wall-time and invocation limits for a single request.
+
+    A budget is shared by every tool invoked on behalf of the request (via ToolContext), so
+    tools can bound their own timeouts by the time that remains.
+    """
+
+    deadline: Optional[float]
+    max_invocations: Optional[int]
+    invocations: int
+    _lock: threading.Lock
+
+    def __init__(
+        self, timeout: Optional[float] = None, max_invocations: Optional[int] = None
+    ):
+        """
+        Args:
+            timeout: Seconds from now until the deadline, or None for no deadline
+            max_invocations: Maximum number of tool invocations, or None for no limit
+        """
+        self.deadline = time.monotonic() + timeout if timeout is not None else None
+        self.max_invocations = max_invocations
+        self.invocations = 0
+        self._lock = threading.Lock()
+
+    def remaining(self) -> Optional[float]:
+        """Seconds until the deadline, or None if there is none."""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    def timeout(self, default: Optional[float]) -> Optional[float]:
+        """The lesser of default and the remaining time, for use as an I/O timeout."""
+        remaining = self.remaining()
+        if remaining is None:
+            return default
+        # Never return zero, which many clients treat as "no timeout" or reject outright.
+        remaining = max(remaining, 0.001)
+        return remaining if default is None else min(default, remaining)
+
+    def charge(self):
+        """Accounts for one tool invocation, raising BudgetExceeded if the budget is spent."""
+        with self._lock:
+            if self.expired():
+                raise BudgetExceeded("deadline exceeded")
+            if (
+                self.max_invocations is not None
+                and self.invocations >= self.max_invocations
+            ):
+                raise BudgetExceeded(
+                    f"exceeded maximum of {self.max_invocations} tool invocations"
+                )
+            self.invocations += 1
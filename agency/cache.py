@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import json
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+
+@dataclass
+class CacheStats:
+    """Hit/miss counters for a single tool's cache entries."""
+
+    hits: int = 0
+    misses: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class ToolCache:
+    """A size-bounded LRU cache of tool results, keyed on tool id and canonicalized args.
+
+    Only tools whose ToolDecl is marked cacheable are cached; each may specify its own TTL.
+    Cached results are returned as-is, so callers must not mutate them.
+    """
+
+    _entries: OrderedDict[Tuple[str, str], Tuple[Dict[str, Any], Optional[float]]]
+    _stats: Dict[str, CacheStats]
+    _max_entries: int
+    _lock: threading.Lock
+
+    def __init__(self, max_entries: int = 1024):
+        self._entries = OrderedDict()
+        self._stats = {}
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+
+    def get(self, tool_id: str, args: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Gets the cached result for a call, or None if absent or expired."""
+        key = (tool_id, _canonical(args))
+        with self._lock:
+            stats = self._stats.setdefault(tool_id, CacheStats())
+            entry = self._entries.get(key)
+            if entry is not None:
+                result, expires = entry
+                if expires is None or expires > time.monotonic():
+                    self._entries.move_to_end(key)
+                    stats.hits += 1
+                    return result
+                del self._entries[key]
+            stats.misses += 1
+            return None
+
+    def put(
+        self,
+        tool_id: str,
+        args: Dict[str, Any],
+        result: Dict[str, Any],
+        ttl: Optional[float] = None,
+    ):
+        """Caches a call's result, optionally expiring it after ttl seconds."""
+        key = (tool_id, _canonical(args))
+        expires = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            self._entries[key] = (result, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, tool_id: str):
+        """Drops all cached results for the given tool."""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == tool_id]:
+                del self._entries[key]
+
+    def stats(self) -> Dict[str, CacheStats]:
+        """Gets hit/miss counters, by tool id."""
+        with self._lock:
+            return {id: CacheStats(s.hits, s.misses) for id, s in self._stats.items()}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def _canonical(args: Dict[str, Any]) -> str:
+    return json.dumps(args, sort_keys=True, separators=(",", ":"), default=str)
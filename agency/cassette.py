@@ -0,0 +1,223 @@
+"""Record/replay of model completions and tool results.
+
+In record mode, a Cassette wraps models and tools, passing requests through and capturing each
+response. In replay mode, the same wrappers serve the recorded responses back without touching
+the network, which makes recorded sessions repeatable offline (e.g., as performance tests).
+
+Cassettes are gzipped JSON lines. Requests are stored only as digests; responses to identical
+requests are replayed in the order they were recorded.
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import threading
+import time
+from collections import defaultdict, deque
+from dataclasses import asdict
+from typing import Any, Deque, Dict, List, Literal, Optional, Tuple
+
+from agency.models import (
+    Function,
+    FunctionCall,
+    Message,
+    Model,
+    Stream,
+    Usage,
+    message_from_dict,
+    message_to_dict,
+)
+from agency.tool import Tool, ToolCall, ToolDecl, ToolResult
+
+Mode = Literal["record", "replay"]
+
+
+class CassetteMiss(Exception):
+    """Raised during replay when a request was never recorded (or its recordings are used up)."""
+
+    pass
+
+
+class Cassette:
+    """A recording of model and tool responses.
+
+    Usage:
+        with Cassette("session.jsonl.gz", "record") as cassette:
+            model = cassette.model(OpenRouter("..."))
+            search = cassette.tool(Search(api_key))
+            ...
+    """
+
+    path: str
+    mode: Mode
+    latency: float
+    latency_scale: float
+    _entries: List[Dict[str, Any]]
+    _replay: Dict[Tuple[str, str, str], Deque[Dict[str, Any]]]
+    _lock: threading.Lock
+
+    def __init__(
+        self, path: str, mode: Mode, latency: float = 0.0, latency_scale: float = 0.0
+    ):
+        """
+        Args:
+            path: The cassette file
+            mode: "record" to capture responses (saved on save() or exit), or "replay" to serve them
+            latency: Fixed delay, in seconds, added to each replayed response
+            latency_scale: Multiple of each response's recorded latency to add on replay;
+                1.0 reproduces the original timing
+        """
+        self.path = path
+        self.mode = mode
+        self.latency = latency
+        self.latency_scale = latency_scale
+        self._entries = []
+        self._replay = defaultdict(deque)
+        self._lock = threading.Lock()
+        if mode == "replay":
+            self._load()
+
+    def __enter__(self) -> Cassette:
+        return self
+
+    def __exit__(self, *exc):
+        if self.mode == "record":
+            self.save()
+
+    def model(self, model: Model, name: str = "") -> Model:
+        """Wraps a model. Give distinct names to distinct models on the same cassette."""
+        return CassetteModel(self, model, name or type(model).__name__)
+
+    def tool(self, tool: Tool) -> Tool:
+        """Wraps a (synchronous) tool whose results should be recorded."""
+        return CassetteTool(self, tool)
+
+    def save(self):
+        with self._lock:
+            entries = list(self._entries)
+        with gzip.open(self.path, "wt", encoding="utf-8") as file:
+            for entry in entries:
+                file.write(json.dumps(entry, separators=(",", ":"), default=str))
+                file.write("\n")
+
+    def record(self, kind: str, key: str, request: Any, response: Any, elapsed: float):
+        entry = {
+            "kind": kind,
+            "key": key,
+            "request": _digest(request),
+            "response": response,
+            "elapsed": round(elapsed, 6),
+        }
+        with self._lock:
+            self._entries.append(entry)
+
+    def play(self, kind: str, key: str, request: Any) -> Any:
+        """Gets the next recorded response to a request, after any simulated latency."""
+        with self._lock:
+            queue = self._replay.get((kind, key, _digest(request)))
+            if not queue:
+                raise CassetteMiss(f"no recorded {kind} response for {key}")
+            entry = queue.popleft()
+        delay = self.latency + self.latency_scale * entry["elapsed"]
+        if delay > 0:
+            time.sleep(delay)
+        return entry["response"]
+
+    def _load(self):
+        with gzip.open(self.path, "rt", encoding="utf-8") as file:
+            for line in file:
+                entry = json.loads(line)
+                self._replay[(entry["kind"], entry["key"], entry["request"])].append(
+                    entry
+                )
+
+
+class CassetteModel(Model):
+    _cassette: Cassette
+    _model: Model
+    _name: str
+
+    def __init__(self, cassette: Cassette, model: Model, name: str):
+        self._cassette = cassette
+        self._model = model
+        self._name = name
+
+    def complete(
+        self,
+        messages: List[Message],
+        functions: Optional[List[Function]] = None,
+        stream: Optional[Stream] = None,
+        timeout: Optional[float] = None,
+    ) -> Message:
+        request = {
+            "messages": [message_to_dict(msg) for msg in messages],
+            "functions": [asdict(f) for f in functions or []],
+        }
+        if self._cassette.mode == "replay":
+            response = self._cassette.play("model", self._name, request)
+            completion = message_from_dict(response)
+            if "usage" in response:
+                completion.usage = Usage(**response["usage"])
+            if stream is not None:
+                stream.replay(completion)
+            return completion
+
+        start = time.monotonic()
+        completion = self._model.complete(messages, functions, stream, timeout)
+        response = message_to_dict(completion)
+        if completion.usage:
+            response["usage"] = asdict(completion.usage)
+        self._cassette.record(
+            "model", self._name, request, response, time.monotonic() - start
+        )
+        return completion
+
+    def settings(self) -> Dict[str, Any]:
+        return self._model.settings()
+
+
+class CassetteTool(Tool):
+    decl: ToolDecl
+    _cassette: Cassette
+    _tool: Tool
+
+    def __init__(self, cassette: Cassette, tool: Tool):
+        self.decl = tool.decl
+        self._cassette = cassette
+        self._tool = tool
+
+    def invoke(self, req: ToolCall) -> ToolResult:
+        request = {
+            "args": req.args,
+            "result_tool_id": req.result_tool_id,
+            "result_call_id": req.result_call_id,
+            "results": [asdict(r) for r in req.results],
+        }
+        if self._cassette.mode == "replay":
+            response = self._cassette.play("tool", self.decl.id, request)
+            return ToolResult(
+                args=response["args"],
+                call_tool_id=response["call_tool_id"],
+                call_id=response["call_id"],
+                calls=[FunctionCall(**call) for call in response["calls"]],
+            )
+
+        start = time.monotonic()
+        result = self._tool.invoke(req)
+        response = {
+            "args": result.args,
+            "call_tool_id": result.call_tool_id,
+            "call_id": result.call_id,
+            "calls": [asdict(call) for call in result.calls],
+        }
+        self._cassette.record(
+            "tool", self.decl.id, request, response, time.monotonic() - start
+        )
+        return result
+
+
+def _digest(request: Any) -> str:
+    canonical = json.dumps(request, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()[:32]
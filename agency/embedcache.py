@@ -0,0 +1,189 @@
+"""A persistent, size-bounded cache of text embeddings.
+
+Vectors are keyed on a hash of the model name and text, and stored in a memory-mapped float32
+array, so the cache can be far larger than what's worth holding in memory, and reopening it
+costs next to nothing. Alongside the vectors are a memory-mapped array of each slot's key, and a
+small file recording the vectors' type and least-recently-used order, written by flush(). A
+cache whose files don't match the type and shape it's opened with is discarded.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+from collections import OrderedDict
+from hashlib import md5
+from typing import Any, Dict, List, Optional
+
+import numpy
+from numpy.lib.format import open_memmap
+
+from agency.cache import CacheStats
+
+_KEY_SIZE = 16  # md5 digest
+_DTYPE = numpy.float32
+
+
+class EmbeddingCache:
+    """An LRU cache of embeddings, persisted to a directory.
+
+    Each slot's key is written after its vector, and cleared before it's reused, so a crash
+    between flushes loses recent entries (and their recency) but never returns a wrong vector.
+    Only one process may open a cache directory at a time. Cached vectors are returned as
+    copies, so callers may mutate them.
+    """
+
+    dir: str
+    dim: int
+    max_entries: int
+    _vectors: numpy.memmap
+    _keys: numpy.memmap
+    _entries: OrderedDict[bytes, int]
+    _free: List[int]
+    _stats: CacheStats
+    _dirty: bool
+    _lock: threading.Lock
+
+    def __init__(self, dir: str, dim: int = 384, max_entries: int = 50_000):
+        """
+        Args:
+            dir: Directory to keep the cache in; created if need be
+            dim: Dimension of the cached embeddings
+            max_entries: Maximum embeddings to keep, evicting the least recently used
+        """
+        self.dir = dir
+        self.dim = dim
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._stats = CacheStats()
+        self._dirty = False
+        self._lock = threading.Lock()
+        os.makedirs(dir, exist_ok=True)
+        self._open()
+
+    def get(self, model: str, text: str) -> Optional[numpy.ndarray]:
+        """Gets the cached embedding of text by model, or None if absent."""
+        key = _key(model, text)
+        with self._lock:
+            slot = self._entries.get(key)
+            if slot is None:
+                self._stats.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats.hits += 1
+            self._dirty = True
+            return numpy.array(self._vectors[slot])
+
+    def put(self, model: str, text: str, vec: numpy.ndarray):
+        """Caches the embedding of text by model, evicting the least recently used if full."""
+        if vec.shape != (self.dim,):
+            raise ValueError(f"expected a {self.dim}-vector; got shape {vec.shape}")
+        key = _key(model, text)
+        with self._lock:
+            slot = self._entries.get(key)
+            if slot is None:
+                slot = self._free.pop() if self._free else self._evict()
+            self._keys[slot] = 0
+            self._vectors[slot] = vec
+            self._keys[slot] = numpy.frombuffer(key, dtype=numpy.uint8)
+            self._entries[key] = slot
+            self._entries.move_to_end(key)
+            self._dirty = True
+
+    def flush(self):
+        """Writes cached vectors and recency to disk, if changed since the last flush."""
+        with self._lock:
+            if not self._dirty:
+                return
+            self._vectors.flush()
+            self._keys.flush()
+            tmp = self._path("order.json.tmp")
+            with open(tmp, "w") as file:
+                json.dump(
+                    {
+                        "dtype": numpy.dtype(_DTYPE).name,
+                        "dim": self.dim,
+                        "order": list(self._entries.values()),
+                    },
+                    file,
+                )
+            os.replace(tmp, self._path("order.json"))
+            self._dirty = False
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(self._stats.hits, self._stats.misses)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _open(self):
+        vectors_path, keys_path = self._path("vectors.npy"), self._path("keys.npy")
+        try:
+            self._vectors = open_memmap(vectors_path, mode="r+")
+            self._keys = open_memmap(keys_path, mode="r+")
+        except FileNotFoundError:
+            self._create(vectors_path, keys_path)
+            return
+
+        meta = self._load_meta()
+        shape, dtype = (self.max_entries, self.dim), numpy.dtype(_DTYPE)
+        if (
+            self._vectors.shape != shape
+            or self._vectors.dtype != dtype
+            or self._keys.shape != (self.max_entries, _KEY_SIZE)
+            or meta.get("dtype", dtype.name) != dtype.name
+            or meta.get("dim", self.dim) != self.dim
+        ):
+            print(
+                f"--> embedding cache {self.dir} doesn't hold {dtype} {shape} vectors; recreating"
+            )
+            self._create(vectors_path, keys_path)
+            return
+
+        # Slots with keys are valid; order them by the last flush, then any written since.
+        valid = set(numpy.flatnonzero(self._keys.any(axis=1)).tolist())
+        order = [slot for slot in meta.get("order", []) if slot in valid]
+        order += sorted(valid.difference(order))
+        for slot in order:
+            self._entries[self._keys[slot].tobytes()] = slot
+        self._free = sorted(set(range(self.max_entries)) - valid, reverse=True)
+
+    def _load_meta(self) -> Dict[str, Any]:
+        """Reads what the last flush recorded, if anything."""
+        try:
+            with open(self._path("order.json")) as file:
+                meta = json.load(file)
+        except (FileNotFoundError, ValueError):
+            return {}
+        return meta if isinstance(meta, dict) else {}
+
+    def _create(self, vectors_path: str, keys_path: str):
+        self._vectors = open_memmap(
+            vectors_path,
+            mode="w+",
+            dtype=_DTYPE,
+            shape=(self.max_entries, self.dim),
+        )
+        self._keys = open_memmap(
+            keys_path, mode="w+", dtype=numpy.uint8, shape=(self.max_entries, _KEY_SIZE)
+        )
+        self._entries.clear()
+        self._free = list(range(self.max_entries - 1, -1, -1))
+        # Any order left by a cache of another type would otherwise discard this one on reopening.
+        try:
+            os.remove(self._path("order.json"))
+        except FileNotFoundError:
+            pass
+
+    def _evict(self) -> int:
+        _, slot = self._entries.popitem(last=False)
+        return slot
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.dir, name)
+
+
+def _key(model: str, text: str) -> bytes:
+    return md5(f"{model}\0{text}".encode(), usedforsecurity=False).digest()
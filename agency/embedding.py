@@ -1,9 +1,265 @@
-from sentence_transformers import SentenceTransformer
-from torch import Tensor
+"""Text embeddings, computed locally with a sentence-transformers model.
 
-_embed_model = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
+Embedding requests from all threads (and tasks) go through a shared EmbeddingService, which
+coalesces those that arrive together into batched forward passes. On CPU, a batch of 32 texts
+costs little more than one, so concurrent lookups, and bulk loads via embed_texts(), run at the
+model's batch throughput rather than paying per-call overhead for each text.
 
+With enable_cache(), embeddings are also kept on disk, so repeated queries and rebuilt
+collections don't recompute them.
+"""
 
-def embed_text(text: str) -> Tensor:
+from __future__ import annotations
+
+import asyncio
+import atexit
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Callable, List, Optional, Sequence, Tuple
+
+if TYPE_CHECKING:
+    from numpy import ndarray
+
+    from agency.embedcache import EmbeddingCache
+
+_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+_MODEL_DIM = 384
+
+# Loaded on first use; importing sentence-transformers (and torch) alone takes seconds.
+_embed_model: Optional[Any] = None
+_lock = threading.Lock()
+
+# Encodes a batch of texts as an array with one row per text.
+Encoder = Callable[[List[str]], "ndarray"]
+
+
+@dataclass
+class EmbeddingStats:
+    """Counters for an EmbeddingService. Requests are calls; texts are what they embedded."""
+
+    requests: int = 0
+    texts: int = 0
+    batches: int = 0
+
+    @property
+    def mean_batch(self) -> float:
+        return self.texts / self.batches if self.batches else 0.0
+
+
+class EmbeddingService:
+    """Coalesces concurrent embedding requests into batched encoder calls.
+
+    Requests are queued for a single worker thread, which encodes everything queued (up to
+    max_batch texts) in one call. Under load, requests arriving while a batch is encoding thus
+    form the next batch, and a lone request is encoded immediately. For bursty callers whose
+    requests arrive just apart, max_wait holds the worker for others to join a batch, at the
+    cost of that much latency per batch. Large requests are split into batches of max_batch.
+
+    The worker starts with the first request; the encoder is only ever called from it, so it
+    needn't be thread-safe. If the service has a cache, texts found in it aren't queued at all,
+    and those encoded are added to it. Encoder errors fail only their batch, but should the
+    worker itself die (e.g. of SystemExit), pending requests fail, as do any made after.
+    """
+
+    max_batch: int
+    max_wait: float
+    model: str
+    cache: Optional[EmbeddingCache]
+    _encode: Encoder
+    _queue: queue.SimpleQueue[Tuple[str, Future]]
+    _worker: Optional[threading.Thread]
+    _closed: bool
+    _stats: EmbeddingStats
+    _lock: threading.Lock
+
+    def __init__(
+        self,
+        encode: Optional[Encoder] = None,
+        max_batch: int = 64,
+        max_wait: float = 0.0,
+        model: str = _MODEL_NAME,
+        cache: Optional[EmbeddingCache] = None,
+    ):
+        """
+        Args:
+            encode: Encodes a batch of texts. Defaults to the local sentence-transformers model.
+            max_batch: Maximum texts per encoder call
+            max_wait: Seconds to wait for more requests to join a batch, once one arrives
+            model: Name of the encoder's model, which keys its embeddings in the cache
+            cache: Cache of embeddings to check before encoding, and add to after
+        """
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.model = model
+        self.cache = cache
+        self._encode = encode or _encode_with_model
+        self._queue = queue.SimpleQueue()
+        self._worker = None
+        self._closed = False
+        self._stats = EmbeddingStats()
+        self._lock = threading.Lock()
+
+    def embed(self, text: str) -> ndarray:
+        """Embeds one text, batched with any others requested meanwhile."""
+        return self.submit([text])[0].result()
+
+    def embed_many(self, texts: Sequence[str]) -> ndarray:
+        """Embeds many texts, returning an array with one row per text."""
+        import numpy
+
+        futures = self.submit(texts)
+        if not futures:
+            return numpy.empty((0, 0), dtype=numpy.float32)
+        return numpy.stack([future.result() for future in futures])
+
+    async def embed_async(self, text: str) -> ndarray:
+        """Embeds one text without blocking the event loop."""
+        return await asyncio.wrap_future(self.submit([text])[0])
+
+    def submit(self, texts: Sequence[str]) -> List[Future]:
+        """Queues texts for embedding, returning a future for each one's embedding."""
+        cache = self.cache
+        futures: List[Future] = []
+        for text in texts:
+            future: Future = Future()
+            vec = cache.get(self.model, text) if cache is not None else None
+            if vec is not None:
+                future.set_result(vec)
+            else:
+                self._ensure_worker()
+                with self._lock:
+                    if self._closed:
+                        raise RuntimeError("embedding service has stopped")
+                    self._queue.put((text, future))
+            futures.append(future)
+        with self._lock:
+            self._stats.requests += 1
+        return futures
+
+    def stats(self) -> EmbeddingStats:
+        with self._lock:
+            return EmbeddingStats(**vars(self._stats))
+
+    def _ensure_worker(self):
+        if self._worker is None:
+            with self._lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(
+                        target=self._run, name="agency-embedding", daemon=True
+                    )
+                    self._worker.start()
+
+    def _run(self):
+        batch: List[Tuple[str, Future]] = []
+        try:
+            while True:
+                batch = [self._queue.get()]
+                deadline = time.monotonic() + self.max_wait
+                while len(batch) < self.max_batch:
+                    try:
+                        # Take whatever's already queued, then wait out the window for more.
+                        remaining = deadline - time.monotonic()
+                        if remaining > 0:
+                            batch.append(self._queue.get(timeout=remaining))
+                        else:
+                            batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                self._encode_batch(batch)
+        finally:
+            # Only something other than an encoder error gets here. Nothing will serve requests
+            # now, so fail those waiting rather than leave their callers hanging.
+            with self._lock:
+                self._closed = True
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            error = RuntimeError("embedding service has stopped")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(error)
+
+    def _encode_batch(self, batch: List[Tuple[str, Future]]):
+        # Skip requests whose callers have given up.
+        batch = [(text, f) for text, f in batch if f.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        try:
+            vecs = self._encode([text for text, _ in batch])
+            if len(vecs) != len(batch):
+                raise Exception(f"encoded {len(vecs)} of {len(batch)} texts")
+        except Exception as e:
+            # Fail the batch, but keep the worker alive for later requests.
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        with self._lock:
+            self._stats.texts += len(batch)
+            self._stats.batches += 1
+        # Cache before resolving, so callers repeating a request find it.
+        if self.cache is not None:
+            try:
+                for (text, _), vec in zip(batch, vecs):
+                    self.cache.put(self.model, text, vec)
+            except Exception as e:
+                print(f"--> couldn't cache embeddings: {e}")
+        for (_, future), vec in zip(batch, vecs):
+            future.set_result(vec)
+
+
+def embed_text(text: str) -> ndarray:
     """Simple embedder that uses the HF sentence-transformers model locally."""
-    return _embed_model.encode(text)
+    return embedding_service.embed(text)
+
+
+def embed_texts(texts: Sequence[str]) -> ndarray:
+    """Embeds many texts in batches, returning an array with one row per text."""
+    return embedding_service.embed_many(texts)
+
+
+def enable_cache(dir: str, max_entries: int = 50_000) -> EmbeddingCache:
+    """Keeps embed_text() and embed_texts() results in a cache on disk, flushed at exit.
+
+    Args:
+        dir: Directory to keep the cache in
+        max_entries: Maximum embeddings to keep, evicting the least recently used
+
+    Returns:
+        The cache, e.g. to flush() it periodically, or check its stats()
+    """
+    from agency.embedcache import EmbeddingCache
+
+    cache = EmbeddingCache(dir, dim=_MODEL_DIM, max_entries=max_entries)
+    atexit.register(cache.flush)
+    embedding_service.cache = cache
+    return cache
+
+
+def warm_up():
+    """Loads the embedding model, if it isn't already, so the first embed_text() needn't wait."""
+    _model()
+
+
+def _model() -> Any:
+    global _embed_model
+    if _embed_model is None:
+        with _lock:
+            if _embed_model is None:
+                from sentence_transformers import SentenceTransformer
+
+                _embed_model = SentenceTransformer(_MODEL_NAME)
+    return _embed_model
+
+
+def _encode_with_model(texts: List[str]) -> ndarray:
+    return _model().encode(texts, batch_size=len(texts))
+
+
+# The process-wide service used by embed_text() and embed_texts().
+embedding_service = EmbeddingService()
@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from agency.models import FunctionCall, Message, Role
+from agency.utils import trunc
+
+
+@dataclass
+class HistoryPolicy:
+    """Limits on the size of a minion's history, and how to stay within them.
+
+    When a history's estimated size exceeds token_budget, the oldest tool results are
+    replaced (oldest first) with a short preview, or with the output of summarize() if given,
+    until it fits. System messages and the most recent keep_recent messages are never altered.
+    """
+
+    token_budget: int = 32_000
+    keep_recent: int = 8
+    preview_chars: int = 400
+    summarize: Optional[Callable[[FunctionCall], Dict[str, Any]]] = None
+
+
+@dataclass
+class Compaction:
+    """The outcome of compacting a history."""
+
+    tokens_before: int
+    tokens_after: int
+    elided: int
+
+    @property
+    def saved(self) -> int:
+        return self.tokens_before - self.tokens_after
+
+
+class History:
+    """A minion's conversation, with a running estimate of its size in tokens."""
+
+    messages: List[Message]
+    tokens: int
+    saved_tokens: int
+    _sizes: List[int]
+    _compacted: List[bool]  # Whether compaction has already handled each message
+
+    def __init__(self, messages: Iterable[Message] = ()):
+        self.messages = []
+        self.tokens = 0
+        self.saved_tokens = 0
+        self._sizes = []
+        self._compacted = []
+        self.extend(messages)
+
+    def append(self, msg: Message):
+        size = estimate_tokens(msg)
+        self.messages.append(msg)
+        self._sizes.append(size)
+        self._compacted.append(False)
+        self.tokens += size
+
+    def extend(self, msgs: Iterable[Message]):
+        for msg in msgs:
+            self.append(msg)
+
+    def __len__(self) -> int:
+        return len(self.messages)
+
+    def compact(self, policy: HistoryPolicy) -> Optional[Compaction]:
+        """Elides old tool results until the history fits the policy's budget.
+
+        Returns None if the history already fit.
+        """
+        if self.tokens <= policy.token_budget:
+            return None
+
+        before = self.tokens
+        elided = 0
+        for i in range(len(self.messages) - policy.keep_recent):
+            if self.tokens <= policy.token_budget:
+                break
+            msg = self.messages[i]
+            if msg.role != Role.TOOL or msg.function is None or self._compacted[i]:
+                continue
+
+            # Elide each result only once; summaries may be costly, and are no use summarized.
+            self._compacted[i] = True
+            replacement = Message(
+                role=Role.TOOL, function=_elide(msg.function, policy), calls=msg.calls
+            )
+            size = estimate_tokens(replacement)
+            if size >= self._sizes[i]:
+                continue
+
+            # Replace rather than mutate, as models may cache per-message conversions.
+            self.messages[i] = replacement
+            self.tokens += size - self._sizes[i]
+            self._sizes[i] = size
+            elided += 1
+
+        self.saved_tokens += before - self.tokens
+        return Compaction(before, self.tokens, elided)
+
+
+def estimate_tokens(msg: Message) -> int:
+    """Roughly estimates a message's size in tokens, at ~4 characters per token."""
+    chars = len(msg.content or "")
+    for call in [msg.function] if msg.function else msg.calls:
+        chars += len(call.name) + len(json.dumps(call.arguments, default=str))
+    return chars // 4 + 4
+
+
+def _elide(call: FunctionCall, policy: HistoryPolicy) -> FunctionCall:
+    if policy.summarize:
+        summary = policy.summarize(call)
+    else:
+        text = json.dumps(call.arguments, default=str)
+        summary = {
+            "elided": f"older result of {call.name} shortened to save space; call it again if needed",
+            "preview": trunc(text, policy.preview_chars),
+        }
+    return FunctionCall(id=call.id, name=call.name, arguments=summary)
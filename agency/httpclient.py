@@ -0,0 +1,186 @@
+"""Shared HTTP client for model and tool APIs.
+
+Requests go through a pooled requests.Session, so connections are kept alive and reused across
+calls (and threads) rather than re-established, with their TCP and TLS handshakes, every time.
+Transient failures (connection errors, timeouts, 429 and 5xx responses) are retried with
+jittered exponential backoff, honouring any Retry-After the server sends.
+"""
+
+from __future__ import annotations
+
+import random
+import threading
+import time
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+@dataclass
+class HttpStats:
+    requests: int = 0
+    retries: int = 0
+    failures: int = 0
+
+
+class HttpClient:
+    """A pooled, retrying HTTP client. Safe to share across threads."""
+
+    connect_timeout: float
+    read_timeout: float
+    retries: int
+    backoff: float
+    max_backoff: float
+    _session: requests.Session
+    _stats: HttpStats
+    _lock: threading.Lock
+
+    def __init__(
+        self,
+        connect_timeout: float = 10.0,
+        read_timeout: float = 120.0,
+        retries: int = 3,
+        backoff: float = 0.5,
+        max_backoff: float = 30.0,
+        pool_size: int = 32,
+    ):
+        """
+        Args:
+            connect_timeout: Seconds allowed to establish a connection
+            read_timeout: Seconds allowed between bytes received from the server
+            retries: Number of times to retry a request after a transient failure
+            backoff: Base delay before the first retry, doubled for each one after
+            max_backoff: Upper bound on the delay between retries
+            pool_size: Maximum connections kept alive per host
+        """
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+        self._stats = HttpStats()
+        self._lock = threading.Lock()
+
+    def post(
+        self,
+        url: str,
+        json: Any = None,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Optional[float] = None,
+        stream: bool = False,
+    ) -> requests.Response:
+        return self.request(
+            "POST", url, json=json, headers=headers, timeout=timeout, stream=stream
+        )
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        json: Any = None,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Optional[float] = None,
+        stream: bool = False,
+    ) -> requests.Response:
+        """Makes a request, retrying transient failures.
+
+        Args:
+            timeout: Seconds allowed for the request as a whole, including retries. If None,
+                each attempt is bounded only by the client's connect and read timeouts.
+
+        Returns:
+            The first non-retryable response, or the last response once retries are used up.
+            Error statuses are returned rather than raised, as APIs report errors in the body.
+
+        Raises:
+            requests.RequestException: If the last attempt failed to get a response at all.
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        attempt = 0
+        while True:
+            try:
+                rsp = self._session.request(
+                    method,
+                    url,
+                    json=json,
+                    headers=headers,
+                    timeout=self._timeouts(deadline),
+                    stream=stream,
+                )
+            except (requests.ConnectionError, requests.Timeout):
+                delay = self._delay(attempt, None)
+                if not self._should_retry(attempt, delay, deadline):
+                    self._count(failures=1)
+                    raise
+            else:
+                if rsp.status_code not in RETRY_STATUSES:
+                    self._count()
+                    return rsp
+                delay = self._delay(attempt, _retry_after(rsp))
+                if not self._should_retry(attempt, delay, deadline):
+                    self._count(failures=1)
+                    return rsp
+                rsp.close()
+
+            attempt += 1
+            self._count(retries=1)
+            time.sleep(delay)
+
+    def stats(self) -> HttpStats:
+        with self._lock:
+            return HttpStats(**vars(self._stats))
+
+    def close(self):
+        self._session.close()
+
+    def _timeouts(self, deadline: Optional[float]) -> Tuple[float, float]:
+        if deadline is None:
+            return (self.connect_timeout, self.read_timeout)
+        remaining = max(0.001, deadline - time.monotonic())
+        return (min(self.connect_timeout, remaining), min(self.read_timeout, remaining))
+
+    def _delay(self, attempt: int, retry_after: Optional[float]) -> float:
+        # "Full jitter" spreads out clients that failed together, so they don't retry together.
+        delay = random.uniform(0, min(self.max_backoff, self.backoff * 2**attempt))
+        return max(delay, retry_after) if retry_after is not None else delay
+
+    def _should_retry(
+        self, attempt: int, delay: float, deadline: Optional[float]
+    ) -> bool:
+        if attempt >= self.retries:
+            return False
+        return deadline is None or time.monotonic() + delay < deadline
+
+    def _count(self, retries: int = 0, failures: int = 0):
+        with self._lock:
+            self._stats.requests += 1 if not retries else 0
+            self._stats.retries += retries
+            self._stats.failures += failures
+
+
+def _retry_after(rsp: requests.Response) -> Optional[float]:
+    """Parses a Retry-After header, given either in seconds or as an HTTP date."""
+    value = rsp.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+# Client shared by default across all models and tools in the process.
+http_client = HttpClient()
@@ -1,4 +1,19 @@
+"""API keys, read from the environment when first used rather than on import, so that modules
+needing them can be imported (e.g., by tests) without them set."""
+
 import os
 
-TAVILY_API_KEY = os.environ["TAVILY_API_KEY"]
-OPENROUTER_API_KEY = os.environ["OPENROUTER_API_KEY"]
+# Declared for type checkers; the values come from __getattr__.
+TAVILY_API_KEY: str
+OPENROUTER_API_KEY: str
+
+_KEYS = ("TAVILY_API_KEY", "OPENROUTER_API_KEY")
+
+
+def __getattr__(name: str) -> str:
+    if name not in _KEYS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    try:
+        return os.environ[name]
+    except KeyError:
+        raise KeyError(f"{name} must be set in the environment") from None
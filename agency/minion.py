@@ -1,13 +1,18 @@
+import time
 import traceback
 from dataclasses import dataclass
-from typing import List
+from typing import TYPE_CHECKING, List, Optional, Tuple
 
-from jinja2 import Environment
-from jinja2.environment import Template
-
-from agency.models import Function, FunctionCall, Message, Model, Role
+from agency.history import History, HistoryPolicy
+from agency.models import Function, FunctionCall, Message, Model, Role, Usage
 from agency.schema import prop, schema, schema_for
+from agency.session import Session
 from agency.tool import ExceptToolId, ResultToolId, Tool, ToolCall, ToolDecl, ToolResult
+from agency.trace import json_size, traced
+from agency.usage import UsageMeter
+
+if TYPE_CHECKING:
+    from jinja2.environment import Template
 
 prompt_suffix = """
 Remember to call the __result__ tool rather than returning text directly.
@@ -20,6 +25,9 @@ class Except:
     message: str = prop(desc="error message")
 
 
+_PSEUDO_TOOLS = (ResultToolId, ExceptToolId)
+
+
 @dataclass
 class MinionDecl(ToolDecl):
     """Extension of a tool declaration to be used with minions, giving them a jinja template and list of available
@@ -30,17 +38,42 @@ class MinionDecl(ToolDecl):
 
 
 class Minion(Tool):
+    """A tool backed by a language model, which may in turn call other tools.
+
+    A minion's conversation history is stored in the session it's invoked on behalf of, so a
+    single minion can serve many concurrent sessions. Requests without a session share a
+    default one owned by the minion. Calls running concurrently within a session, such as those
+    in a batch, each have their own history, in the call's scope.
+
+    If given a HistoryPolicy, the minion compacts its history before each completion to keep
+    the prompt within the policy's token budget.
+
+    The usage of each completion is recorded against the minion (see usage()), and against the
+    request and session it was made for.
+    """
+
     decl: ToolDecl
     _model: Model
-    _template: Template
+    _template: "Template"
     _tools: List[Function]
-    _history: List[Message]
+    _session: Session
+    _policy: Optional[HistoryPolicy]
+    _usage: UsageMeter
 
     def __init__(
-        self, decl: ToolDecl, model: Model, template: str, tools: List[ToolDecl]
+        self,
+        decl: ToolDecl,
+        model: Model,
+        template: str,
+        tools: List[ToolDecl],
+        history_policy: Optional[HistoryPolicy] = None,
     ):
         self.decl = decl
         self._model = model
+        self._policy = history_policy
+        # Imported here, as it's slow to import and only needed by minions.
+        from jinja2 import Environment
+
         self._template = Environment().from_string(template)
         self._tools = [decl.to_func() for decl in tools]
 
@@ -61,42 +94,105 @@ class Minion(Tool):
             )
         )
 
+        self._session = Session("")
+        self._usage = UsageMeter()
+
+    def history(
+        self, session: Optional[Session] = None, scope: Tuple[str, ...] = ()
+    ) -> History:
+        """Gets this minion's conversation history within the given (or default) session and
+        scope."""
+        return (session or self._session).state(self, self._new_history, scope)
+
+    def usage(self) -> Usage:
+        """Gets the total usage of this minion's completions, across all sessions."""
+        return self._usage.total()
+
+    def _new_history(self) -> History:
         # Initialize history with the system message.
-        self._history = [
-            Message(
-                Role.SYSTEM,
-                "Always use the __result__ tool to respond; never respond with raw text.",
-            )
-        ]
+        return History(
+            [
+                Message(
+                    Role.SYSTEM,
+                    "Always use the __result__ tool to respond; never respond with raw text.",
+                )
+            ]
+        )
 
     def invoke(self, req: ToolCall) -> ToolResult:
+        ctx = req.context
+        history = self.history(ctx.session, ctx.scope) if ctx else self.history()
+        tracer = req.context.tracer if req.context else None
+        stream = req.context.stream if req.context else None
         try:
-            message: Message
-            if not req.result_tool_id:
+            messages: List[Message]
+            if req.results:
+                # Getting the responses from a batch of parallel tool invocations.
+                messages = [
+                    Message(role=Role.TOOL, function=result) for result in req.results
+                ]
+            elif not req.result_tool_id:
                 # Initial request to this tool.
                 prompt = self._template.render(req.args) + prompt_suffix
-                message = Message(role=Role.USER, content=prompt)
+                messages = [Message(role=Role.USER, content=prompt)]
             else:
                 # Getting a response from a tool invocation.
                 if not req.result_call_id:
                     raise Exception("expected call_id for tool request")
-                message = Message(
-                    role=Role.TOOL,
-                    function=FunctionCall(
-                        name=req.result_tool_id,
-                        id=req.result_call_id,
-                        arguments=req.args,
-                    ),
+                messages = [
+                    Message(
+                        role=Role.TOOL,
+                        function=FunctionCall(
+                            name=req.result_tool_id,
+                            id=req.result_call_id,
+                            arguments=req.args,
+                        ),
+                    )
+                ]
+
+            # Append to history, compact it if necessary, and complete with the underlying model.
+            history.extend(messages)
+            compaction = history.compact(self._policy) if self._policy else None
+            if compaction:
+                print(
+                    f"--- compacted {self.decl.id} history: {compaction.tokens_before} -> {compaction.tokens_after} tokens ({compaction.elided} results elided)"
                 )
-
-            # Append to history and complete with the underlying model.
-            self._history.append(message)
-            completion = self._model.complete(self._history, self._tools)
-            self._history.append(completion)
+            with traced(
+                tracer,
+                "complete",
+                "model",
+                messages=len(history),
+                prompt_tokens_est=history.tokens,
+                compacted_tokens=compaction.saved if compaction else 0,
+            ) as span:
+                start = time.monotonic()
+                completion = self._model.complete(
+                    history.messages, self._tools, stream, timeout=req.timeout(None)
+                )
+                if completion.usage is None:
+                    completion.usage = Usage(latency=time.monotonic() - start)
+                if span:
+                    span.args["completion_size"] = json_size(completion)
+                    span.args["prompt_tokens"] = completion.usage.prompt_tokens
+                    span.args["completion_tokens"] = completion.usage.completion_tokens
+                    span.args["latency"] = round(completion.usage.latency, 6)
+            history.append(completion)
+            self._usage.add(completion.usage)
+            if req.context:
+                req.context.record_usage(completion.usage)
 
             # Handle any tool calls requested by the model.
-            if completion.function:
-                func = completion.function
+            func = completion.function
+            if completion.calls:
+                calls = [c for c in completion.calls if c.name not in _PSEUDO_TOOLS]
+                if calls:
+                    history.extend(_misplaced_responses(completion.calls))
+                    return ToolResult(args={}, calls=calls)
+                # Nothing but pseudo-tool calls; take the first as the response, and answer the
+                # rest, as every call in the turn needs a response.
+                func = completion.calls[0]
+                history.extend(_misplaced_responses(completion.calls[1:]))
+            if func:
                 return ToolResult(
                     args=func.arguments,
                     call_tool_id=func.name,
@@ -110,7 +206,29 @@ class Minion(Tool):
 
         except Exception as e:
             # Catch exceptions, log them, and send them to the model in hopes it will sort itself.
-            print(">>>", self._history)
+            print(">>>", history.messages)
             msg = f"""exception calling {self.decl.id}: {e}
                      {"\n".join(traceback.format_exception(e))}"""
             return ToolResult({"error": msg})
+
+
+def _misplaced_responses(calls: List[FunctionCall]) -> List[Message]:
+    """Answers pseudo-tool calls made alongside other calls with an error, for the model to correct.
+
+    __result__ and __except__ end the minion's turn, so mustn't be called before the model has
+    seen the results of its other calls, nor more than once.
+    """
+    return [
+        Message(
+            role=Role.TOOL,
+            function=FunctionCall(
+                name=call.name,
+                id=call.id,
+                arguments={
+                    "error": f"{call.name} must be called on its own, after the results of any other tool calls are in"
+                },
+            ),
+        )
+        for call in calls
+        if call.name in _PSEUDO_TOOLS
+    ]
@@ -1,4 +1,14 @@
-from .model import Function, FunctionCall, Message, Model, Role
+from .model import (
+    Function,
+    FunctionCall,
+    Message,
+    Model,
+    Role,
+    Stream,
+    Usage,
+    message_from_dict,
+    message_to_dict,
+)
 from .openapi import OpenAPISchema
 
 __all__ = [
@@ -8,4 +18,8 @@ __all__ = [
     "Message",
     "OpenAPISchema",
     "Role",
+    "Stream",
+    "Usage",
+    "message_from_dict",
+    "message_to_dict",
 ]
@@ -0,0 +1,212 @@
+"""A persistent cache of model completions."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Optional
+
+from agency.models.model import (
+    Function,
+    Message,
+    Model,
+    Stream,
+    Usage,
+    message_from_dict,
+    message_to_dict,
+)
+
+
+@dataclass
+class CompletionCacheStats:
+    """Counters for a CachedModel. Skipped requests were non-deterministic, so never looked up."""
+
+    hits: int = 0
+    misses: int = 0
+    skipped: int = 0
+    evictions: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class CachedModel(Model):
+    """Wraps a model, serving repeated requests from an on-disk cache.
+
+    Entries are content-addressed: each is stored under a hash of the model's settings, the
+    messages and the functions, so identical requests hit regardless of where they came from,
+    and a cache directory can be shared between processes and runs. When the cache grows past
+    max_bytes, the least-recently used entries are removed.
+
+    Only requests made with deterministic sampling settings (see Model.settings()) are cached;
+    others pass through uncached, unless cache_sampled is set. A hit's usage counts no tokens,
+    as none were spent, and only the time taken to read it.
+    """
+
+    _model: Model
+    _path: str
+    _max_bytes: int
+    _cache_sampled: bool
+    _index: OrderedDict[str, int]
+    _bytes: int
+    _stats: CompletionCacheStats
+    _lock: threading.Lock
+
+    def __init__(
+        self,
+        model: Model,
+        path: str,
+        max_bytes: int = 256 << 20,
+        cache_sampled: bool = False,
+    ):
+        """
+        Args:
+            model: The model whose completions are cached
+            path: Directory holding the cache; created if necessary
+            max_bytes: Approximate bound on the total size of cached entries
+            cache_sampled: Cache completions even when sampling is non-deterministic
+        """
+        self._model = model
+        self._path = path
+        self._max_bytes = max_bytes
+        self._cache_sampled = cache_sampled
+        self._index = OrderedDict()
+        self._bytes = 0
+        self._stats = CompletionCacheStats()
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+        self._load_index()
+
+    def complete(
+        self,
+        messages: List[Message],
+        functions: Optional[List[Function]] = None,
+        stream: Optional[Stream] = None,
+        timeout: Optional[float] = None,
+    ) -> Message:
+        settings = self._model.settings()
+        if not self._cache_sampled and not _deterministic(settings):
+            with self._lock:
+                self._stats.skipped += 1
+            return self._model.complete(messages, functions, stream, timeout)
+
+        key = request_key(settings, messages, functions)
+        start = time.monotonic()
+        cached = self._get(key)
+        if cached is not None:
+            cached.usage = Usage(latency=time.monotonic() - start)
+            if stream is not None:
+                stream.replay(cached)
+            return cached
+
+        completion = self._model.complete(messages, functions, stream, timeout)
+        self._put(key, completion)
+        return completion
+
+    def settings(self) -> Dict[str, Any]:
+        return self._model.settings()
+
+    def stats(self) -> CompletionCacheStats:
+        with self._lock:
+            return CompletionCacheStats(**vars(self._stats))
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._index):
+                self._remove(key)
+
+    def _get(self, key: str) -> Optional[Message]:
+        with self._lock:
+            if key not in self._index:
+                self._stats.misses += 1
+                return None
+            try:
+                with open(self._file(key)) as file:
+                    msg = message_from_dict(json.load(file))
+            except (OSError, ValueError, KeyError):
+                # Removed by another process, or partially written; treat as a miss.
+                self._remove(key)
+                self._stats.misses += 1
+                return None
+            self._index.move_to_end(key)
+            self._stats.hits += 1
+
+        # Bump the file's mtime, so recency survives a reload.
+        try:
+            os.utime(self._file(key))
+        except OSError:
+            pass
+        return msg
+
+    def _put(self, key: str, completion: Message):
+        data = json.dumps(message_to_dict(completion), separators=(",", ":"))
+        path = self._file(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Write atomically, so concurrent readers never see a partial entry.
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "w") as file:
+            file.write(data)
+        os.replace(tmp, path)
+
+        with self._lock:
+            if key in self._index:
+                self._bytes -= self._index.pop(key)
+            self._index[key] = len(data)
+            self._bytes += len(data)
+            while self._bytes > self._max_bytes and len(self._index) > 1:
+                self._remove(next(iter(self._index)))
+                self._stats.evictions += 1
+
+    def _remove(self, key: str):
+        """Removes an entry. Callers must hold the lock."""
+        self._bytes -= self._index.pop(key, 0)
+        try:
+            os.remove(self._file(key))
+        except OSError:
+            pass
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self._path, key[:2], f"{key}.json")
+
+    def _load_index(self):
+        entries = []
+        for dirpath, _, filenames in os.walk(self._path):
+            for name in filenames:
+                if not name.endswith(".json"):
+                    continue
+                st = os.stat(os.path.join(dirpath, name))
+                entries.append((st.st_mtime, name[: -len(".json")], st.st_size))
+        for _, key, size in sorted(entries):
+            self._index[key] = size
+            self._bytes += size
+
+
+def request_key(
+    settings: Dict[str, Any],
+    messages: List[Message],
+    functions: Optional[List[Function]],
+) -> str:
+    """Hashes a request canonically, so that equal requests have equal keys."""
+    request = {
+        "settings": settings,
+        "messages": [message_to_dict(msg) for msg in messages],
+        "functions": [asdict(f) for f in functions or []],
+    }
+    canonical = json.dumps(request, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def _deterministic(settings: Dict[str, Any]) -> bool:
+    if "models" in settings:
+        return all(_deterministic(s) for s in settings["models"])
+    # An unset temperature means the provider's default, which typically samples.
+    return settings.get("temperature") == 0 or settings.get("seed") is not None
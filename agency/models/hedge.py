@@ -0,0 +1,272 @@
+"""Hedged and fallback completions, to keep occasional slow or failed requests off the critical path."""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional
+
+from agency.models.model import Function, Message, Model, Stream, Usage
+
+
+@dataclass
+class HedgeStats:
+    """Counters for a HedgedModel. A hedge "wins" when the hedged request answers first.
+
+    Losers are requests still in flight when another answered. Their usage isn't part of the
+    completion returned, so is tallied here, as the cost of hedging.
+    """
+
+    requests: int = 0
+    hedged: int = 0
+    hedge_wins: int = 0
+    fallbacks: int = 0
+    failures: int = 0
+    losers: int = 0
+    loser_usage: Usage = field(default_factory=lambda: Usage(completions=0))
+
+    @property
+    def hedge_rate(self) -> float:
+        return self.hedged / self.requests if self.requests else 0.0
+
+    @property
+    def win_rate(self) -> float:
+        return self.hedge_wins / self.hedged if self.hedged else 0.0
+
+
+class HedgedModel(Model):
+    """Completes with the first of several models, hedging against slow responses.
+
+    Each completion is sent to the first model. If it hasn't answered within the hedge delay,
+    the same request is also sent to the next model, and whichever answers first is used. If a
+    request fails, the next model is tried straight away. Models are thus a fallback order,
+    e.g. a preferred model followed by faster or more available alternatives.
+
+    By default the hedge delay tracks a percentile of each model's recent latency, so only the
+    slowest few percent of requests are hedged. Until enough latencies have been observed, no
+    hedges are sent (unless hedge_after is given).
+
+    The hedge delay runs from when a request starts, not from when it's queued for one of the
+    max_parallel workers. Losing requests can't be cancelled mid-flight; they run to completion
+    in the background and their results are discarded, though their usage is counted in
+    stats(). Streamed completions are never hedged, as two models would write to the same
+    stream, but still fall back on failure.
+
+    Call close() (or use the model as a context manager) to stop its workers when done.
+    """
+
+    _models: List[Model]
+    _hedge_after: Optional[float]
+    _percentile: float
+    _min_samples: int
+    _max_hedges: int
+    _latencies: List[Deque[float]]
+    _pool: ThreadPoolExecutor
+    _stats: HedgeStats
+    _lock: threading.Lock
+
+    def __init__(
+        self,
+        models: List[Model],
+        hedge_after: Optional[float] = None,
+        percentile: float = 95,
+        min_samples: int = 20,
+        window: int = 200,
+        max_hedges: int = 1,
+        max_parallel: int = 16,
+    ):
+        """
+        Args:
+            models: Models to try, in order of preference
+            hedge_after: Fixed hedge delay in seconds, instead of one based on observed latency
+            percentile: Percentile of a model's recent latencies after which it's hedged
+            min_samples: Latencies to observe from a model before hedging it
+            window: Number of recent latencies kept per model
+            max_hedges: Maximum hedges per completion (not counting fallbacks after failure)
+            max_parallel: Maximum requests in flight across all completions
+        """
+        if not models:
+            raise ValueError("HedgedModel requires at least one model")
+        self._models = list(models)
+        self._hedge_after = hedge_after
+        self._percentile = percentile
+        self._min_samples = min_samples
+        self._max_hedges = max_hedges
+        self._latencies = [deque(maxlen=window) for _ in models]
+        self._pool = ThreadPoolExecutor(max_parallel)
+        self._stats = HedgeStats()
+        self._lock = threading.Lock()
+
+    def complete(
+        self,
+        messages: List[Message],
+        functions: Optional[List[Function]] = None,
+        stream: Optional[Stream] = None,
+        timeout: Optional[float] = None,
+    ) -> Message:
+        if stream is not None:
+            return self._fallback(messages, functions, stream, timeout)
+
+        # Losing requests outlive this call, so mustn't see later changes to the caller's list.
+        messages = list(messages)
+        pending: Dict[Future[Message], int] = {}
+        launched = 0
+        last_start: Future[float] = Future()
+        hedges = 0
+        error: Optional[Exception] = None
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        def launch():
+            nonlocal launched, last_start
+            last_start = Future()
+            future = self._pool.submit(
+                self._timed, launched, messages, functions, deadline, last_start
+            )
+            pending[future] = launched
+            launched += 1
+
+        launch()
+        while pending:
+            hedge_in = None
+            waiting: List[Future[Any]] = list(pending)
+            if hedges < self._max_hedges and launched < len(self._models):
+                delay = self.hedge_delay(launched - 1)
+                if delay is not None and last_start.done():
+                    hedge_in = max(0.0, last_start.result() + delay - time.monotonic())
+                elif delay is not None:
+                    # Still waiting for a worker; the delay runs from when it gets one.
+                    waiting.append(last_start)
+
+            done, _ = wait(waiting, timeout=hedge_in, return_when=FIRST_COMPLETED)
+            if not done:
+                hedges += 1
+                launch()
+                continue
+
+            for future in done:
+                if future not in pending:
+                    continue  # Just started
+                index = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    print(f"--> hedged model {index} failed: {e}")
+                    error = e
+                    continue
+                self._count(hedged=hedges > 0, hedge_won=index > 0 and hedges > 0)
+                for loser in pending:
+                    loser.add_done_callback(self._lost)
+                return result
+
+            # Everything in flight failed; fall back to the next model, if any.
+            if not pending and launched < len(self._models):
+                self._count(fallback=True)
+                launch()
+
+        self._count(failed=True)
+        assert error is not None
+        raise error
+
+    def settings(self) -> Dict[str, Any]:
+        return {"models": [model.settings() for model in self._models]}
+
+    def hedge_delay(self, index: int) -> Optional[float]:
+        """Gets how long to wait for the model at index before hedging, or None to never hedge."""
+        if self._hedge_after is not None:
+            return self._hedge_after
+        with self._lock:
+            latencies = sorted(self._latencies[index])
+        if len(latencies) < self._min_samples:
+            return None
+        rank = int(len(latencies) * self._percentile / 100)
+        return latencies[min(rank, len(latencies) - 1)]
+
+    def stats(self) -> HedgeStats:
+        with self._lock:
+            return HedgeStats(**vars(self._stats))
+
+    def close(self):
+        """Stops taking requests. Any still running, such as losers, finish in the background."""
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def __enter__(self) -> HedgedModel:
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _fallback(
+        self,
+        messages: List[Message],
+        functions: Optional[List[Function]],
+        stream: Stream,
+        timeout: Optional[float],
+    ) -> Message:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for index, model in enumerate(self._models):
+            remaining = _remaining(deadline)
+            try:
+                result = model.complete(messages, functions, stream, remaining)
+            except Exception as e:
+                print(f"--> hedged model {index} failed: {e}")
+                if index == len(self._models) - 1:
+                    self._count(failed=True)
+                    raise
+                self._count(fallback=True)
+                continue
+            self._count()
+            return result
+        raise AssertionError("unreachable")
+
+    def _timed(
+        self,
+        index: int,
+        messages: List[Message],
+        functions: Optional[List[Function]],
+        deadline: Optional[float],
+        started: Future[float],
+    ) -> Message:
+        start = time.monotonic()
+        started.set_result(start)
+        timeout = _remaining(deadline)
+        result = self._models[index].complete(messages, functions, timeout=timeout)
+        with self._lock:
+            self._latencies[index].append(time.monotonic() - start)
+        return result
+
+    def _lost(self, future: Future[Message]):
+        usage = None
+        if not future.cancelled() and future.exception() is None:
+            usage = future.result().usage
+        with self._lock:
+            self._stats.losers += 1
+            if usage is not None:
+                self._stats.loser_usage = self._stats.loser_usage + usage
+
+    def _count(
+        self,
+        hedged: bool = False,
+        hedge_won: bool = False,
+        fallback: bool = False,
+        failed: bool = False,
+    ):
+        with self._lock:
+            stats = self._stats
+            if fallback:
+                # Counted per fallback; the request itself is counted once it finishes.
+                stats.fallbacks += 1
+                return
+            stats.requests += 1
+            stats.hedged += hedged
+            stats.hedge_wins += hedge_won
+            stats.failures += failed
+
+
+def _remaining(deadline: Optional[float]) -> Optional[float]:
+    """Gets the seconds left until deadline, if any, as a (nonzero) timeout."""
+    if deadline is None:
+        return None
+    return max(deadline - time.monotonic(), 0.001)
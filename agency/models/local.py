@@ -0,0 +1,224 @@
+"""A Model backed by a small quantized model running locally on CPU, via llama.cpp.
+
+Requires llama-cpp-python (pip install llama-cpp-python), which is imported only when a
+LocalModel is first used, and a GGUF model file. Small instruction-tuned models (e.g., Qwen2.5
+1.5B or Llama 3.2 1B at Q4) are good candidates for cheap routing and summarizing minions.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from agency.models.model import (
+    Function,
+    FunctionCall,
+    Message,
+    Model,
+    Role,
+    Stream,
+    Usage,
+)
+
+_call_instructions = """You can call the following functions:
+
+{functions}
+
+Respond with only a JSON object of the form {{"name": "<function name>", "arguments": {{...}}}}, calling exactly one of them."""
+
+
+class LocalModel(Model):
+    """Completes locally with llama.cpp, with the same function-calling contract as remote models.
+
+    When functions are given, generation is constrained by a grammar compiled from their
+    parameter schemas, so the model can only produce a well-formed call to one of them. Each
+    completion then yields exactly one FunctionCall; parallel calls aren't supported.
+
+    The model is loaded on first use, and completions are serialized, as a llama.cpp context
+    can't be shared between threads.
+    """
+
+    _model_path: str
+    _n_ctx: int
+    _n_threads: Optional[int]
+    _temperature: float
+    _max_tokens: int
+    _seed: int
+    _llm: Any
+    _grammars: Dict[str, Any]
+    _lock: threading.Lock
+
+    def __init__(
+        self,
+        model_path: str,
+        n_ctx: int = 4096,
+        n_threads: Optional[int] = None,
+        temperature: float = 0.0,
+        max_tokens: int = 512,
+        seed: int = 0,
+    ):
+        """
+        Args:
+            model_path: Path to a GGUF model file
+            n_ctx: Context window, in tokens
+            n_threads: CPU threads to use; defaults to llama.cpp's choice
+            temperature: Sampling temperature; zero for greedy (deterministic) decoding
+            max_tokens: Maximum tokens to generate per completion
+            seed: Sampling seed
+        """
+        self._model_path = model_path
+        self._n_ctx = n_ctx
+        self._n_threads = n_threads
+        self._temperature = temperature
+        self._max_tokens = max_tokens
+        self._seed = seed
+        self._llm = None
+        self._grammars = {}
+        self._lock = threading.Lock()
+
+    def complete(
+        self,
+        messages: List[Message],
+        functions: Optional[List[Function]] = None,
+        stream: Optional[Stream] = None,
+        timeout: Optional[float] = None,
+    ) -> Message:
+        chat = _to_chat(messages, functions)
+        with self._lock:
+            llm = self._load()
+            grammar = self._grammar(functions) if functions else None
+            start = time.monotonic()
+            rsp = llm.create_chat_completion(
+                messages=chat,
+                grammar=grammar,
+                temperature=self._temperature,
+                max_tokens=self._max_tokens,
+                seed=self._seed,
+            )
+            latency = time.monotonic() - start
+
+        text = rsp["choices"][0]["message"].get("content") or ""
+        msg = (
+            Message(role=Role.ASSISTANT, function=_parse_call(text))
+            if functions
+            else Message(role=Role.ASSISTANT, content=text)
+        )
+        usage = rsp.get("usage", {})
+        msg.usage = Usage(
+            prompt_tokens=usage.get("prompt_tokens", 0),
+            completion_tokens=usage.get("completion_tokens", 0),
+            total_tokens=usage.get("total_tokens", 0),
+            latency=latency,
+        )
+
+        # Calls are only usable once complete, so there's nothing to gain by streaming tokens.
+        if stream is not None:
+            stream.replay(msg)
+        return msg
+
+    def settings(self) -> Dict[str, Any]:
+        return {
+            "model": os.path.basename(self._model_path),
+            "temperature": self._temperature,
+            "seed": self._seed,
+            "max_tokens": self._max_tokens,
+        }
+
+    def _load(self) -> Any:
+        if self._llm is None:
+            try:
+                from llama_cpp import Llama
+            except ImportError as e:
+                raise ImportError(
+                    "LocalModel requires llama-cpp-python (pip install llama-cpp-python)"
+                ) from e
+            self._llm = Llama(
+                model_path=self._model_path,
+                n_ctx=self._n_ctx,
+                n_threads=self._n_threads,
+                seed=self._seed,
+                verbose=False,
+            )
+        return self._llm
+
+    def _grammar(self, functions: List[Function]) -> Any:
+        """Gets the grammar constraining output to a call of one of functions, compiling it once per set."""
+        schema = json.dumps(call_schema(functions), sort_keys=True)
+        if schema not in self._grammars:
+            from llama_cpp import LlamaGrammar
+
+            self._grammars[schema] = LlamaGrammar.from_json_schema(
+                schema, verbose=False
+            )
+        return self._grammars[schema]
+
+
+def call_schema(functions: List[Function]) -> Dict[str, Any]:
+    """Builds a JSON schema matching a call to any one of the given functions."""
+    return {
+        "oneOf": [
+            {
+                "type": "object",
+                "properties": {
+                    "name": {"const": f.name},
+                    "arguments": f.parameters,
+                },
+                "required": ["name", "arguments"],
+            }
+            for f in functions
+        ]
+    }
+
+
+def _to_chat(
+    messages: List[Message], functions: Optional[List[Function]]
+) -> List[Dict[str, str]]:
+    """Converts messages to plain chat messages.
+
+    Small models' chat templates rarely support tool calls, so calls and their results are
+    rendered as JSON text, and the available functions are described in the system prompt.
+    """
+    chat: List[Dict[str, str]] = []
+    for msg in messages:
+        if msg.role == Role.TOOL and msg.function:
+            call = msg.function
+            chat.append(
+                {
+                    "role": "user",
+                    "content": f"Result of {call.name}: {json.dumps(call.arguments)}",
+                }
+            )
+            continue
+
+        lines = [msg.content] if msg.content else []
+        calls = [msg.function] if msg.function else msg.calls
+        lines += [json.dumps({"name": c.name, "arguments": c.arguments}) for c in calls]
+        chat.append({"role": msg.role.value, "content": "\n".join(lines)})
+
+    if functions:
+        described = "\n".join(
+            f"- {f.name}: {f.description}\n  parameters: {json.dumps(f.parameters)}"
+            for f in functions
+        )
+        instructions = _call_instructions.format(functions=described)
+        if chat and chat[0]["role"] == "system":
+            chat[0] = {
+                "role": "system",
+                "content": f"{chat[0]['content']}\n\n{instructions}",
+            }
+        else:
+            chat.insert(0, {"role": "system", "content": instructions})
+    return chat
+
+
+def _parse_call(text: str) -> FunctionCall:
+    try:
+        call = json.loads(text)
+        name, args = call["name"], call["arguments"]
+    except (ValueError, KeyError, TypeError) as e:
+        raise Exception(f"local model produced an invalid call: {text!r}") from e
+    return FunctionCall(id=f"call-{uuid.uuid4().hex[:12]}", name=name, arguments=args)
@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from enum import Enum
 from typing import Any, Dict, List, Optional
 
@@ -16,7 +16,7 @@ class Role(Enum):
     TOOL = "tool"
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class FunctionCall:
     """A function call requested by the LLM."""
 
@@ -25,7 +25,28 @@ class FunctionCall:
     arguments: Dict[str, Any]
 
 
-@dataclass
+@dataclass(slots=True)
+class Usage:
+    """Resources used by one or more completions. Latency is the total time spent waiting on them."""
+
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    total_tokens: int = 0
+    latency: float = 0.0
+    completions: int = 1
+
+    def __add__(self, other: Usage) -> Usage:
+        return Usage(
+            prompt_tokens=self.prompt_tokens + other.prompt_tokens,
+            completion_tokens=self.completion_tokens + other.completion_tokens,
+            total_tokens=self.total_tokens + other.total_tokens,
+            latency=self.latency + other.latency,
+            completions=self.completions + other.completions,
+        )
+
+
+# Slotted to keep long histories compact. Messages are weakly referenced by model caches.
+@dataclass(slots=True, weakref_slot=True)
 class Message:
     """A message in the LLM conversation."""
 
@@ -33,6 +54,40 @@ class Message:
     content: Optional[str] = None
     function: Optional[FunctionCall] = None
 
+    # Set instead of `function` when the model requests several calls in one turn.
+    calls: List[FunctionCall] = field(default_factory=list)
+
+    # What it cost to generate, for completions. Not part of the message's content.
+    usage: Optional[Usage] = field(default=None, compare=False)
+
+
+def message_to_dict(msg: Message) -> Dict[str, Any]:
+    """Converts a message to a JSON-ready dict, omitting empty fields.
+
+    Usage is omitted too, so that equal messages convert equally."""
+    d: Dict[str, Any] = {"role": msg.role.value}
+    if msg.content is not None:
+        d["content"] = msg.content
+    if msg.function is not None:
+        d["function"] = _call_to_dict(msg.function)
+    if msg.calls:
+        d["calls"] = [_call_to_dict(call) for call in msg.calls]
+    return d
+
+
+def message_from_dict(d: Dict[str, Any]) -> Message:
+    """Inverse of message_to_dict()."""
+    return Message(
+        role=Role(d["role"]),
+        content=d.get("content"),
+        function=FunctionCall(**d["function"]) if "function" in d else None,
+        calls=[FunctionCall(**call) for call in d.get("calls", [])],
+    )
+
+
+def _call_to_dict(call: FunctionCall) -> Dict[str, Any]:
+    return {"id": call.id, "name": call.name, "arguments": call.arguments}
+
 
 @dataclass
 class Function:
@@ -43,6 +98,27 @@ class Function:
     parameters: OpenAPISchema
 
 
+class Stream:
+    """Receives a completion incrementally, as the model produces it.
+
+    Text arrives in arbitrary fragments. Each function call is delivered once its arguments
+    are complete, which may be well before the completion as a whole is.
+    """
+
+    def text(self, delta: str) -> None:
+        pass
+
+    def call(self, call: FunctionCall) -> None:
+        pass
+
+    def replay(self, msg: Message):
+        """Delivers an already-complete message, e.g. one served from a cache or recording."""
+        if msg.content:
+            self.text(msg.content)
+        for call in [msg.function] if msg.function else msg.calls:
+            self.call(call)
+
+
 class Model:
     """Interface for language model implementations."""
 
@@ -50,15 +126,29 @@ class Model:
         self,
         messages: List[Message],
         functions: Optional[List[Function]] = None,
+        stream: Optional[Stream] = None,
+        timeout: Optional[float] = None,
     ) -> Message:
         """Get a completion from the language model.
 
         Args:
             messages: The conversation history
             functions: Available functions the LLM can call
-            function_result: Result from previous function call
+            stream: If given, receives the completion incrementally. Models that can't stream
+                may ignore it.
+            timeout: If given, the most seconds to spend on the request, after which it should
+                raise. Models that can't be interrupted may ignore it.
 
         Returns:
-            The model's response, either content or a function call
+            The model's response, either content or a function call, with its usage if known
         """
         raise NotImplementedError
+
+    def settings(self) -> Dict[str, Any]:
+        """Describes whatever, besides messages and functions, determines this model's completions:
+        its identity, and any sampling settings. Used to key caches of completions.
+
+        Completions are only taken to be deterministic given a "temperature" of zero, or a
+        "seed". Without either, a model is assumed to sample.
+        """
+        return {"model": type(self).__name__}
@@ -1,64 +1,163 @@
 from __future__ import annotations
 
 import json
+import time
+import weakref
 from typing import (
     Any,
+    Callable,
     Dict,
+    Generic,
+    Iterable,
     List,
     Literal,
     NotRequired,
     Optional,
+    Sequence,
+    Tuple,
     TypedDict,
+    TypeVar,
     Union,
     cast,
 )
 
-import requests
-
-from agency.keys import OPENROUTER_API_KEY
-from agency.models import Function, FunctionCall, Message, Model, Role
+from agency import fastjson, keys
+from agency.httpclient import HttpClient, http_client
+from agency.models import Function, FunctionCall, Message, Model, Role, Stream, Usage
 from agency.models.openapi import OpenAPISchema
+from agency.ratelimit import RateLimits, model_key, rate_limits
 
 
 class OpenRouter(Model):
-    """OpenRouter implementation of the LLM interface."""
+    """OpenRouter implementation of the LLM interface.
 
-    _model_id: str
+    Converted messages and functions are cached for the lifetime of the objects they were
+    converted from, so each turn of a long conversation only converts what's new. Messages
+    and functions must therefore not be mutated once they've been sent to the model.
+    """
 
-    def __init__(self, model_id: str = "openai/gpt-3.5-turbo"):
+    _model_id: str
+    _base_url: str
+    _api_key: Optional[str]
+    _fallbacks: List[str]
+    _temperature: Optional[float]
+    _seed: Optional[int]
+    _limits: RateLimits
+    _http: HttpClient
+    _converted_messages: _ConversionCache[Message, ORMessage]
+    _converted_functions: _ConversionCache[Function, ORToolDesc]
+
+    def __init__(
+        self,
+        model_id: str = "openai/gpt-3.5-turbo",
+        limits: Optional[RateLimits] = None,
+        http: Optional[HttpClient] = None,
+        fallbacks: Sequence[str] = (),
+        temperature: Optional[float] = None,
+        seed: Optional[int] = None,
+        base_url: str = "https://openrouter.ai/api/v1",
+        api_key: Optional[str] = None,
+    ):
+        """
+        Args:
+            model_id: The OpenRouter model to use
+            limits: Rate limits to observe, keyed by model_key(model_id). Defaults to the
+                process-wide limits in agency.ratelimit.
+            http: Client used to reach the API. Defaults to the process-wide client in
+                agency.httpclient, which keeps connections alive and retries transient failures.
+            fallbacks: Models for OpenRouter to try, in order, if model_id is unavailable or
+                fails. (For client-side fallback and hedging, see HedgedModel.)
+            temperature: Sampling temperature, or None for the model's default
+            seed: Sampling seed, for models that support reproducible sampling
+            base_url: The API's base URL, e.g. that of a StandIn server for testing
+            api_key: The API key. Defaults to OPENROUTER_API_KEY, read when first needed.
+        """
         self._model_id = model_id
+        self._base_url = base_url.rstrip("/")
+        self._api_key = api_key
+        self._fallbacks = list(fallbacks)
+        self._temperature = temperature
+        self._seed = seed
+        self._limits = limits if limits is not None else rate_limits
+        self._http = http if http is not None else http_client
+        self._converted_messages = _ConversionCache()
+        self._converted_functions = _ConversionCache()
 
     def complete(
         self,
         messages: List[Message],
         functions: Optional[List[Function]] = None,
+        stream: Optional[Stream] = None,
+        timeout: Optional[float] = None,
     ) -> Message:
-        """Complete a conversation using the OpenRouter API."""
+        """Complete a conversation using the OpenRouter API.
+
+        If stream is given, the completion is requested as server-sent events, and text and
+        tool calls are passed to the stream as they arrive.
+
+        The completion's usage gives the token counts reported by OpenRouter (zero if none were
+        reported), and the time spent waiting on the request, excluding any rate-limit delay.
+        The timeout bounds the request, including any retries, but not the rate-limit delay.
+        """
         # Convert messages and functions to OpenRouter format
         or_messages = self._convert_messages(messages)
         or_functions = self._convert_functions(functions)
 
-        # Build and send request
+        # Build and send request, waiting our turn if the model is rate-limited.
         request = self._build_request(or_messages, or_functions)
-        rsp = requests.post(
-            url="https://openrouter.ai/api/v1/chat/completions",
+        limit = self._limits.get(model_key(self._model_id))
+        estimate = (
+            _estimate_tokens(or_messages) if limit and limit.tokens_per_min else 0
+        )
+        if limit:
+            limit.acquire(estimate)
+        if stream is not None:
+            request["stream"] = True
+            request["usage"] = {"include": True}
+        start = time.monotonic()
+        rsp = self._http.post(
+            url=f"{self._base_url}/chat/completions",
             headers={
-                "Authorization": f"Bearer {OPENROUTER_API_KEY}",
+                "Authorization": f"Bearer {self._api_key or keys.OPENROUTER_API_KEY}",
                 "HTTP-Referer": "j15r.com",
                 "X-Title": "agency",
             },
             json=request,
-        ).json()
+            timeout=timeout,
+            stream=stream is not None,
+        )
+
+        # Handle response. Errors come back as plain JSON, even when streaming.
+        with rsp:
+            content_type = rsp.headers.get("content-type", "")
+            if stream is not None and content_type.startswith("text/event-stream"):
+                msg = self._handle_stream(rsp.iter_lines(), stream)
+            else:
+                msg = self._handle_response(rsp.json())
+
+        # Charge the limit for whatever the estimate missed, including completion tokens.
+        usage = msg.usage = msg.usage or Usage()
+        usage.latency = time.monotonic() - start
+        if limit and usage.total_tokens > estimate:
+            limit.debit(usage.total_tokens - estimate)
+        return msg
 
-        # Handle response
-        return self._handle_response(rsp)
+    def settings(self) -> Dict[str, Any]:
+        settings: Dict[str, Any] = {"model": self._model_id}
+        if self._fallbacks:
+            settings["fallbacks"] = self._fallbacks
+        if self._temperature is not None:
+            settings["temperature"] = self._temperature
+        if self._seed is not None:
+            settings["seed"] = self._seed
+        return settings
 
     def _convert_message(self, msg: Message) -> ORMessage:
         """Convert a single Message to OpenRouter format."""
         if msg.role == Role.TOOL and msg.function:
             return ORMessage(
                 role="tool",
-                content=json.dumps(msg.function.arguments),
+                content=fastjson.dumps(msg.function.arguments),
                 tool_call_id=msg.function.id,
                 name=msg.function.name,
             )
@@ -71,21 +170,25 @@ class OpenRouter(Model):
         or_message = ORMessage(role=msg.role.value, content=content)
 
         # Add tool_calls for assistant messages with function calls
-        if msg.role == Role.ASSISTANT and msg.function:
-            tool_call = ORToolCall(
-                id=msg.function.id,
-                type="function",
-                function=ORFunctionCall(
-                    name=msg.function.name, arguments=json.dumps(msg.function.arguments)
-                ),
-            )
-            or_message["tool_calls"] = [tool_call]
+        calls = msg.calls or ([msg.function] if msg.function else [])
+        if msg.role == Role.ASSISTANT and calls:
+            or_message["tool_calls"] = [
+                ORToolCall(
+                    id=call.id,
+                    type="function",
+                    function=ORFunctionCall(
+                        name=call.name, arguments=fastjson.dumps(call.arguments)
+                    ),
+                )
+                for call in calls
+            ]
 
         return or_message
 
     def _convert_messages(self, messages: List[Message]) -> List[ORMessage]:
         """Convert agency Messages to OpenRouter format."""
-        return [self._convert_message(msg) for msg in messages]
+        cache = self._converted_messages
+        return [cache.get(msg, self._convert_message) for msg in messages]
 
     def _convert_functions(
         self, functions: Optional[List[Function]]
@@ -94,15 +197,8 @@ class OpenRouter(Model):
         if not functions:
             return None
 
-        return [
-            ORToolDesc(
-                type="function",
-                function=ORFunctionDesc(
-                    name=f.name, description=f.description, parameters=f.parameters
-                ),
-            )
-            for f in functions
-        ]
+        cache = self._converted_functions
+        return [cache.get(f, _convert_function) for f in functions]
 
     def _build_request(
         self, messages: List[ORMessage], functions: Optional[List[ORToolDesc]]
@@ -114,6 +210,13 @@ class OpenRouter(Model):
         )
         if functions:
             request["tools"] = functions
+        if self._temperature is not None:
+            request["temperature"] = self._temperature
+        if self._seed is not None:
+            request["seed"] = self._seed
+        if self._fallbacks:
+            request["models"] = [self._model_id] + self._fallbacks
+            request["route"] = "fallback"
         return request
 
     def _handle_response(self, rsp: Dict) -> Message:
@@ -130,31 +233,173 @@ class OpenRouter(Model):
             raise Exception("OpenRouter provided no message")
 
         completion: ORMessage = choice["message"]
-        content = completion["content"]
-
-        # Create base message
-        msg = Message(role=Role.ASSISTANT)
-        if content:
-            if not isinstance(content, str):
-                raise ValueError(
-                    f"Expected string content in response, got {type(content)}"
-                )
-            msg.content = content
-
-        # Add function call if present
-        if "tool_calls" in completion:
-            tool_calls = completion["tool_calls"]
-            if len(tool_calls) > 1:
-                raise Exception(f"Expected at most 1 tool call, got {len(tool_calls)}")
-
-            tool_call = tool_calls[0]
-            msg.function = FunctionCall(
+        calls = [
+            FunctionCall(
                 id=tool_call["id"],
                 name=tool_call["function"]["name"],
                 arguments=json.loads(tool_call["function"]["arguments"]),
             )
+            for tool_call in completion.get("tool_calls", [])
+        ]
+        return _message(completion.get("content"), calls, response.get("usage"))
 
-        return msg
+    def _handle_stream(
+        self, lines: Iterable[Union[str, bytes]], stream: Stream
+    ) -> Message:
+        """Process a streamed OpenRouter response, passing text and calls to stream as they complete."""
+        content: List[str] = []
+        calls = _CallAssembler(stream)
+        usage: Optional[ORResponseUsage] = None
+        for line in lines:
+            # Server-sent events are always UTF-8, whatever the response's declared encoding.
+            if isinstance(line, bytes):
+                line = line.decode("utf-8")
+            # Skip event separators and comments (OpenRouter sends ": OPENROUTER PROCESSING").
+            if not line or not line.startswith("data:"):
+                continue
+            data = line[len("data:") :].strip()
+            if data == "[DONE]":
+                break
+
+            chunk = json.loads(data)
+            if "error" in chunk:
+                raise Exception(f"OpenRouter API error: {chunk['error']}")
+            usage = chunk.get("usage") or usage  # Sent with the final chunk.
+            choices = cast(ORResponse, chunk).get("choices", [])
+            if len(choices) == 0 or "delta" not in choices[0]:
+                continue
+
+            delta = choices[0]["delta"]
+            text = delta.get("content")
+            if text:
+                content.append(text)
+                stream.text(text)
+            for tool_call in delta.get("tool_calls", []):
+                calls.add(tool_call)
+
+        return _message("".join(content), calls.finish(), usage)
+
+
+def _message(
+    content: Any, calls: List[FunctionCall], usage: Optional[ORResponseUsage] = None
+) -> Message:
+    """Builds an assistant Message from a completion's content, tool calls and usage."""
+    msg = Message(role=Role.ASSISTANT)
+    if usage:
+        msg.usage = Usage(
+            prompt_tokens=usage.get("prompt_tokens", 0),
+            completion_tokens=usage.get("completion_tokens", 0),
+            total_tokens=usage.get("total_tokens", 0),
+        )
+    if content:
+        if not isinstance(content, str):
+            raise ValueError(
+                f"Expected string content in response, got {type(content)}"
+            )
+        msg.content = content
+
+    # A single call goes in msg.function; parallel calls in msg.calls.
+    if len(calls) == 1:
+        msg.function = calls[0]
+    elif calls:
+        msg.calls = calls
+    return msg
+
+
+class _CallAssembler:
+    """Assembles tool calls from streamed fragments.
+
+    Each call's id and name arrive with its first fragment, and its arguments are spread
+    across the rest. Calls are streamed one after another, so a call is complete as soon as
+    the next one starts.
+    """
+
+    _stream: Stream
+    _calls: List[FunctionCall]
+    _index: Optional[int]
+    _id: str
+    _name: str
+    _args: List[str]
+
+    def __init__(self, stream: Stream):
+        self._stream = stream
+        self._calls = []
+        self._index = None
+        self._id = ""
+        self._name = ""
+        self._args = []
+
+    def add(self, fragment: ORToolCallDelta):
+        index = fragment.get("index", self._index if self._index is not None else 0)
+        if index != self._index:
+            self._complete()
+            self._index = index
+        self._id = fragment.get("id") or self._id
+        func = fragment.get("function", {})
+        self._name = func.get("name") or self._name
+        self._args.append(func.get("arguments") or "")
+
+    def finish(self) -> List[FunctionCall]:
+        self._complete()
+        return self._calls
+
+    def _complete(self):
+        if self._index is None:
+            return
+        args = "".join(self._args)
+        call = FunctionCall(
+            id=self._id, name=self._name, arguments=json.loads(args) if args else {}
+        )
+        self._calls.append(call)
+        self._stream.call(call)
+        self._index, self._id, self._name, self._args = None, "", "", []
+
+
+def _convert_function(f: Function) -> ORToolDesc:
+    return ORToolDesc(
+        type="function",
+        function=ORFunctionDesc(
+            name=f.name, description=f.description, parameters=f.parameters
+        ),
+    )
+
+
+K = TypeVar("K")
+V = TypeVar("V")
+
+
+class _ConversionCache(Generic[K, V]):
+    """Caches conversions of objects by identity, for as long as the objects live."""
+
+    _entries: Dict[int, Tuple[weakref.ref, V]]
+
+    def __init__(self):
+        self._entries = {}
+
+    def get(self, obj: K, convert: Callable[[K], V]) -> V:
+        key = id(obj)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0]() is obj:
+            return entry[1]
+
+        value = convert(obj)
+        ref = weakref.ref(obj, lambda _: self._entries.pop(key, None))
+        self._entries[key] = (ref, value)
+        return value
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def _estimate_tokens(messages: List[ORMessage]) -> int:
+    """Roughly estimates prompt tokens, at ~4 characters per token."""
+    chars = 0
+    for msg in messages:
+        content = msg.get("content")
+        chars += len(content) if isinstance(content, str) else 0
+        for call in msg.get("tool_calls", []):
+            chars += len(call["function"]["arguments"])
+    return chars // 4
 
 
 # OpenRouter API types:
@@ -199,6 +444,13 @@ class ORRequest(TypedDict):
     route: NotRequired[Literal["fallback"]]
     provider_preferences: NotRequired[ORProviderPreferences]
 
+    # Asks for token usage in the final chunk of a streamed response.
+    usage: NotRequired[ORUsageOptions]
+
+
+class ORUsageOptions(TypedDict):
+    include: bool
+
 
 class ORResponseFormat(TypedDict):
     type: Literal["json_object"]
@@ -238,9 +490,23 @@ class ORToolCall(TypedDict):
 
 
 class ORDelta(TypedDict):
-    content: str
+    content: NotRequired[Optional[str]]
     role: NotRequired[str]
-    tool_calls: NotRequired[List[ORToolCall]]
+    tool_calls: NotRequired[List[ORToolCallDelta]]
+
+
+# Fragment of a tool call in a streamed delta. Only the first fragment of each call has its id
+# and name; arguments are split across fragments.
+class ORToolCallDelta(TypedDict):
+    index: NotRequired[int]
+    id: NotRequired[str]
+    type: NotRequired[Literal["function"]]
+    function: NotRequired[ORFunctionCallDelta]
+
+
+class ORFunctionCallDelta(TypedDict):
+    name: NotRequired[str]
+    arguments: NotRequired[str]
 
 
 class ORFunctionCall(TypedDict):
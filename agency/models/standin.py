@@ -0,0 +1,382 @@
+"""A local stand-in for the OpenRouter chat completions API, for load and failure testing.
+
+The server speaks enough of /api/v1/chat/completions for OpenRouter (the Model) to use it:
+plain and streamed (server-sent event) responses, tool calls and usage. Responses follow a
+script, arrive after a configurable latency, and can be made to fail with 429s and 5xxs at
+given rates. Point a model at it with OpenRouter(base_url=standin.url).
+
+Run standalone with e.g.:
+
+    python -m agency.models.standin --port 8000 --latency 0.5 --jitter 0.3 --error 429=0.05
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from agency.models.model import FunctionCall, Message, Role
+from agency.tool import ResultToolId
+
+Responder = Callable[[Dict[str, Any]], Message]
+Latency = Callable[[], float]
+
+
+class Script:
+    """Scripted completions, one per assistant turn.
+
+    The step used for a request is the number of assistant messages already in it, so every
+    conversation follows the script from the start, however many run at once. Conversations
+    that outlast the script repeat its last step.
+    """
+
+    steps: List[Message]
+
+    def __init__(self, steps: List[Message]):
+        if not steps:
+            raise ValueError("Script requires at least one step")
+        self.steps = steps
+
+    def __call__(self, request: Dict[str, Any]) -> Message:
+        turn = sum(1 for m in request.get("messages", []) if m["role"] == "assistant")
+        return self.steps[min(turn, len(self.steps) - 1)]
+
+
+def default_responder(request: Dict[str, Any]) -> Message:
+    """Returns an empty result when the caller offers a __result__ tool, or else "ok"."""
+    tools = [t["function"]["name"] for t in request.get("tools", [])]
+    if ResultToolId in tools:
+        return Message(Role.ASSISTANT, function=FunctionCall("", ResultToolId, {}))
+    return Message(Role.ASSISTANT, content="ok")
+
+
+def lognormal(median: float, sigma: float = 0.5, seed: Optional[int] = None) -> Latency:
+    """A latency distribution with the long right tail typical of model APIs."""
+    rng = random.Random(seed)
+    return lambda: rng.lognormvariate(math.log(median), sigma) if median > 0 else 0.0
+
+
+@dataclass
+class StandInStats:
+    requests: int = 0
+    streamed: int = 0
+    errors: int = 0
+    in_flight: int = 0
+    max_in_flight: int = 0
+
+
+class StandIn:
+    """A stand-in OpenRouter server, running on a background thread.
+
+    Usage:
+        with StandIn(Script([...]), latency=lognormal(0.5)) as server:
+            model = OpenRouter("any", base_url=server.url)
+            ...
+    """
+
+    url: str
+    _responder: Responder
+    _latency: Latency
+    _errors: Dict[int, float]
+    _retry_after: Optional[float]
+    _chunk_delay: float
+    _rng: random.Random
+    _server: ThreadingHTTPServer
+    _thread: Optional[threading.Thread]
+    _stats: StandInStats
+    _lock: threading.Lock
+
+    def __init__(
+        self,
+        responder: Responder = default_responder,
+        latency: Optional[Latency] = None,
+        errors: Optional[Dict[int, float]] = None,
+        retry_after: Optional[float] = 1.0,
+        chunk_delay: float = 0.0,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        seed: Optional[int] = None,
+    ):
+        """
+        Args:
+            responder: Produces the completion for each request, e.g. a Script
+            latency: Draws the delay before each response (or before its first chunk)
+            errors: Probability of failing a request with each HTTP status, e.g. {429: 0.05}
+            retry_after: Retry-After sent with 429s, in seconds, or None to send none
+            chunk_delay: Delay between streamed chunks, in seconds
+            host: Address to listen on
+            port: Port to listen on; 0 picks a free one
+            seed: Seed for error injection
+        """
+        self._responder = responder
+        self._latency = latency or (lambda: 0.0)
+        self._errors = errors or {}
+        self._retry_after = retry_after
+        self._chunk_delay = chunk_delay
+        self._rng = random.Random(seed)
+        self._stats = StandInStats()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self.url = f"http://{host}:{self._server.server_address[1]}/api/v1"
+
+    def start(self) -> StandIn:
+        """Starts serving on a background thread."""
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        """Serves on the calling thread, until stopped."""
+        self._server.serve_forever(poll_interval=0.05)
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self) -> StandIn:
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def stats(self) -> StandInStats:
+        with self._lock:
+            return StandInStats(**vars(self._stats))
+
+    def _handler(self) -> type:
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                standin._serve(self)
+
+            def log_message(self, format: str, *args: Any):
+                pass
+
+        return Handler
+
+    def _serve(self, handler: BaseHTTPRequestHandler):
+        length = int(handler.headers.get("content-length", 0))
+        body = handler.rfile.read(length)
+        if not handler.path.endswith("/chat/completions"):
+            _send_json(handler, 404, {"error": {"code": 404, "message": "not found"}})
+            return
+
+        with self._lock:
+            stats = self._stats
+            stats.requests += 1
+            stats.in_flight += 1
+            stats.max_in_flight = max(stats.max_in_flight, stats.in_flight)
+            status = self._injected_error()
+            if status:
+                stats.errors += 1
+        try:
+            time.sleep(max(0.0, self._latency()))
+            if status:
+                headers = {}
+                if status == 429 and self._retry_after is not None:
+                    headers["Retry-After"] = str(self._retry_after)
+                error = {"error": {"code": status, "message": "injected error"}}
+                _send_json(handler, status, error, headers)
+                return
+
+            request = json.loads(body)
+            completion = self._responder(request)
+            if request.get("stream"):
+                with self._lock:
+                    self._stats.streamed += 1
+                self._stream(handler, request, completion)
+            else:
+                _send_json(handler, 200, _response(request, completion))
+        finally:
+            with self._lock:
+                self._stats.in_flight -= 1
+
+    def _injected_error(self) -> int:
+        roll = self._rng.random()
+        for status, rate in self._errors.items():
+            if roll < rate:
+                return status
+            roll -= rate
+        return 0
+
+    def _stream(
+        self,
+        handler: BaseHTTPRequestHandler,
+        request: Dict[str, Any],
+        completion: Message,
+    ):
+        handler.send_response(200)
+        handler.send_header("Content-Type", "text/event-stream")
+        handler.send_header("Transfer-Encoding", "chunked")
+        handler.end_headers()
+        _write_chunk(handler, b": OPENROUTER PROCESSING\n\n")
+        for i, chunk in enumerate(_chunks(request, completion)):
+            if i and self._chunk_delay:
+                time.sleep(self._chunk_delay)
+            _write_chunk(handler, f"data: {json.dumps(chunk)}\n\n".encode())
+        _write_chunk(handler, b"data: [DONE]\n\n")
+        _write_chunk(handler, b"")
+
+
+def _calls(completion: Message) -> List[FunctionCall]:
+    calls = [completion.function] if completion.function else completion.calls
+    # Give scripted calls fresh ids, as real models do.
+    return [
+        FunctionCall(
+            call.id or f"call-{uuid.uuid4().hex[:12]}", call.name, call.arguments
+        )
+        for call in calls
+    ]
+
+
+def _or_tool_call(call: FunctionCall) -> Dict[str, Any]:
+    return {
+        "id": call.id,
+        "type": "function",
+        "function": {"name": call.name, "arguments": json.dumps(call.arguments)},
+    }
+
+
+def _usage(request: Dict[str, Any], completion: Message) -> Dict[str, int]:
+    prompt = len(json.dumps(request.get("messages", []))) // 4
+    output = len(completion.content or "") // 4 + sum(
+        len(json.dumps(c.arguments)) // 4 for c in _calls(completion)
+    )
+    return {
+        "prompt_tokens": prompt,
+        "completion_tokens": output,
+        "total_tokens": prompt + output,
+    }
+
+
+def _response(request: Dict[str, Any], completion: Message) -> Dict[str, Any]:
+    message: Dict[str, Any] = {"role": "assistant", "content": completion.content}
+    calls = _calls(completion)
+    if calls:
+        message["tool_calls"] = [_or_tool_call(call) for call in calls]
+    return {
+        "id": f"gen-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": request.get("model", ""),
+        "choices": [
+            {"message": message, "finish_reason": "tool_calls" if calls else "stop"}
+        ],
+        "usage": _usage(request, completion),
+    }
+
+
+def _chunks(request: Dict[str, Any], completion: Message) -> Iterator[Dict[str, Any]]:
+    """Splits a completion into streamed deltas: text a few words at a time, and each call's
+    arguments in several fragments, as real models do."""
+
+    def chunk(delta: Dict[str, Any], **extra: Any) -> Dict[str, Any]:
+        return {
+            "object": "chat.completion.chunk",
+            "model": request.get("model", ""),
+            "choices": [{"delta": delta, **extra}],
+        }
+
+    yield chunk({"role": "assistant", "content": ""})
+    words = (completion.content or "").split(" ")
+    for i in range(0, len(words), 4):
+        text = " ".join(words[i : i + 4])
+        if text:
+            yield chunk({"content": text + (" " if i + 4 < len(words) else "")})
+
+    calls = _calls(completion)
+    for index, call in enumerate(calls):
+        args = json.dumps(call.arguments)
+        step = max(1, len(args) // 3)
+        head = {"name": call.name, "arguments": args[:step]}
+        yield chunk(
+            {
+                "tool_calls": [
+                    {
+                        "index": index,
+                        "id": call.id,
+                        "type": "function",
+                        "function": head,
+                    }
+                ]
+            }
+        )
+        for i in range(step, len(args), step):
+            yield chunk(
+                {
+                    "tool_calls": [
+                        {"index": index, "function": {"arguments": args[i : i + step]}}
+                    ]
+                }
+            )
+
+    finish = chunk({}, finish_reason="tool_calls" if calls else "stop")
+    finish["usage"] = _usage(request, completion)
+    yield finish
+
+
+def _send_json(
+    handler: BaseHTTPRequestHandler,
+    status: int,
+    body: Dict[str, Any],
+    headers: Optional[Dict[str, str]] = None,
+):
+    data = json.dumps(body).encode()
+    handler.send_response(status)
+    handler.send_header("Content-Type", "application/json")
+    handler.send_header("Content-Length", str(len(data)))
+    for name, value in (headers or {}).items():
+        handler.send_header(name, value)
+    handler.end_headers()
+    handler.wfile.write(data)
+
+
+def _write_chunk(handler: BaseHTTPRequestHandler, data: bytes):
+    handler.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+    handler.wfile.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=(__doc__ or "").split("\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.0, help="median seconds")
+    parser.add_argument("--jitter", type=float, default=0.5, help="lognormal sigma")
+    parser.add_argument("--chunk-delay", type=float, default=0.0)
+    parser.add_argument(
+        "--error", action="append", default=[], help="STATUS=RATE, e.g. 429=0.05"
+    )
+    args = parser.parse_args()
+
+    errors = {int(s): float(r) for s, r in (e.split("=") for e in args.error)}
+    server = StandIn(
+        latency=lognormal(args.latency, args.jitter),
+        errors=errors,
+        chunk_delay=args.chunk_delay,
+        host=args.host,
+        port=args.port,
+    )
+    print(f"serving on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
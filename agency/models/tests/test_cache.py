@@ -0,0 +1,94 @@
+from typing import Any, Dict, List, Optional
+
+from agency.models import Function, FunctionCall, Message, Model, Role, Stream
+from agency.models.cache import CachedModel
+
+
+class CountingModel(Model):
+    """Answers with the number of completions it's made."""
+
+    def __init__(self, temperature: Optional[float] = 0.0):
+        self.calls = 0
+        self.temperature = temperature
+
+    def complete(
+        self,
+        messages: List[Message],
+        functions: Optional[List[Function]] = None,
+        stream: Optional[Stream] = None,
+        timeout: Optional[float] = None,
+    ) -> Message:
+        self.calls += 1
+        return Message(
+            role=Role.ASSISTANT,
+            content=f"answer {self.calls}",
+            function=FunctionCall("c", "f", {"x": [1, 2]}),
+        )
+
+    def settings(self) -> Dict[str, Any]:
+        settings: Dict[str, Any] = {"model": "counting"}
+        if self.temperature is not None:
+            settings["temperature"] = self.temperature
+        return settings
+
+
+def _prompt(text: str) -> List[Message]:
+    return [Message(role=Role.USER, content=text)]
+
+
+def test_cache_hit(tmp_path):
+    inner = CountingModel()
+    model = CachedModel(inner, str(tmp_path))
+
+    first = model.complete(_prompt("q"))
+    second = model.complete(_prompt("q"))
+    assert second == first
+    assert inner.calls == 1
+    assert second.usage is not None
+    assert (second.usage.completions, second.usage.total_tokens) == (1, 0)
+    model.complete(_prompt("other"))
+    assert inner.calls == 2
+
+    # Entries persist across instances.
+    reloaded = CachedModel(inner, str(tmp_path))
+    assert reloaded.complete(_prompt("q")) == first
+    assert inner.calls == 2
+
+    stats = model.stats()
+    assert (stats.hits, stats.misses) == (1, 2)
+
+
+def test_cache_skips_sampled(tmp_path):
+    inner = CountingModel(temperature=0.7)
+    model = CachedModel(inner, str(tmp_path))
+
+    model.complete(_prompt("q"))
+    model.complete(_prompt("q"))
+    assert inner.calls == 2
+    assert model.stats().skipped == 2
+
+    model = CachedModel(inner, str(tmp_path), cache_sampled=True)
+    model.complete(_prompt("q"))
+    model.complete(_prompt("q"))
+    assert inner.calls == 3
+
+    # Without a temperature, the provider's default sampling applies.
+    model = CachedModel(CountingModel(temperature=None), str(tmp_path))
+    model.complete(_prompt("q"))
+    assert model.stats().skipped == 1
+
+
+def test_cache_eviction(tmp_path):
+    inner = CountingModel()
+    model = CachedModel(inner, str(tmp_path), max_bytes=300)
+
+    for i in range(10):
+        model.complete(_prompt(f"q{i}"))
+    assert model.stats().evictions > 0
+
+    # The most recent entry survives; the oldest doesn't.
+    calls = inner.calls
+    model.complete(_prompt("q9"))
+    assert inner.calls == calls
+    model.complete(_prompt("q0"))
+    assert inner.calls == calls + 1
@@ -0,0 +1,122 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+import pytest
+
+from agency.models import Function, Message, Model, Role, Stream, Usage
+from agency.models.hedge import HedgedModel
+
+
+class SlowModel(Model):
+    """Answers with its name after a delay, or fails if told to. Records the prompt length it
+    saw once done."""
+
+    def __init__(self, name: str, delay: float = 0.0, fail: bool = False):
+        self.name = name
+        self.delay = delay
+        self.fail = fail
+        self.calls = 0
+        self.seen: List[int] = []
+
+    def complete(
+        self,
+        messages: List[Message],
+        functions: Optional[List[Function]] = None,
+        stream: Optional[Stream] = None,
+        timeout: Optional[float] = None,
+    ) -> Message:
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.fail:
+            raise Exception(f"{self.name} failed")
+        self.seen.append(len(messages))
+        return Message(
+            role=Role.ASSISTANT, content=self.name, usage=Usage(total_tokens=10)
+        )
+
+
+_prompt = [Message(role=Role.USER, content="hi")]
+
+
+def test_no_hedge_when_fast():
+    primary, secondary = SlowModel("primary"), SlowModel("secondary")
+    model = HedgedModel([primary, secondary], hedge_after=0.5)
+
+    assert model.complete(_prompt).content == "primary"
+    assert secondary.calls == 0
+    assert model.stats().hedged == 0
+
+
+def test_hedge_wins():
+    primary, secondary = SlowModel("primary", 1.0), SlowModel("secondary", 0.05)
+    model = HedgedModel([primary, secondary], hedge_after=0.1)
+
+    start = time.monotonic()
+    assert model.complete(_prompt).content == "secondary"
+    assert time.monotonic() - start < 0.5
+
+    stats = model.stats()
+    assert stats.requests == 1 and stats.hedged == 1 and stats.hedge_wins == 1
+
+
+def test_hedge_losers():
+    primary, secondary = SlowModel("primary", 0.3), SlowModel("secondary", 0.05)
+    model = HedgedModel([primary, secondary], hedge_after=0.1)
+
+    # The loser carries on with the prompt as it was, whatever the caller does with it.
+    prompt = list(_prompt)
+    assert model.complete(prompt).content == "secondary"
+    prompt.append(Message(role=Role.ASSISTANT, content="secondary"))
+
+    deadline = time.monotonic() + 2
+    while model.stats().losers == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    stats = model.stats()
+    assert primary.seen == [1]
+    assert stats.losers == 1
+    assert stats.loser_usage.total_tokens == 10
+
+
+def test_hedge_delay_ignores_queueing():
+    primary, secondary = SlowModel("primary", 0.2), SlowModel("secondary")
+    model = HedgedModel([primary, secondary], hedge_after=0.3, max_parallel=1)
+
+    # With one worker, the second request queues behind the first, but isn't hedged for it.
+    with ThreadPoolExecutor(2) as pool:
+        results = list(pool.map(lambda _: model.complete(_prompt).content, range(2)))
+    assert results == ["primary", "primary"]
+    assert model.stats().hedged == 0
+
+
+def test_close():
+    with HedgedModel([SlowModel("primary")]) as model:
+        assert model.complete(_prompt).content == "primary"
+    with pytest.raises(RuntimeError):
+        model.complete(_prompt)
+
+
+def test_hedge_delay_tracks_latency():
+    primary = SlowModel("primary", 0.01)
+    model = HedgedModel([primary, SlowModel("secondary")], min_samples=5)
+
+    # No hedging until enough latencies have been seen.
+    assert model.hedge_delay(0) is None
+    for _ in range(5):
+        model.complete(_prompt)
+    delay = model.hedge_delay(0)
+    assert delay is not None and 0.01 <= delay < 0.5
+
+
+def test_fallback_on_failure():
+    primary, secondary = SlowModel("primary", fail=True), SlowModel("secondary")
+    model = HedgedModel([primary, secondary])
+
+    assert model.complete(_prompt).content == "secondary"
+    assert model.complete(_prompt, stream=Stream()).content == "secondary"
+    assert model.stats().fallbacks == 2
+
+    model = HedgedModel([primary, SlowModel("other", fail=True)])
+    with pytest.raises(Exception, match="other failed"):
+        model.complete(_prompt)
+    assert model.stats().failures == 1
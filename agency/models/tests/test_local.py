@@ -0,0 +1,80 @@
+import json
+from typing import Any, Dict, List
+
+import pytest
+
+from agency.models import Function, FunctionCall, Message, Role
+from agency.models.local import LocalModel, _to_chat, call_schema
+
+_functions = [
+    Function("search", "Searches the web", {"type": "object", "properties": {}}),
+    Function("__result__", "Returns a result", {"type": "object", "properties": {}}),
+]
+
+
+class FakeLlama:
+    """Stands in for llama_cpp.Llama, returning canned output."""
+
+    def __init__(self, output: str):
+        self.output = output
+        self.requests: List[Dict[str, Any]] = []
+
+    def create_chat_completion(self, **kwargs) -> Dict[str, Any]:
+        self.requests.append(kwargs)
+        return {
+            "choices": [{"message": {"role": "assistant", "content": self.output}}],
+            "usage": {"prompt_tokens": 30, "completion_tokens": 8, "total_tokens": 38},
+        }
+
+
+def _model(output: str) -> LocalModel:
+    model = LocalModel("/models/tiny.gguf")
+    model._llm = FakeLlama(output)
+    model._grammar = lambda functions: "grammar"
+    return model
+
+
+def test_function_call():
+    model = _model('{"name": "search", "arguments": {"q": "x"}}')
+    completion = model.complete([Message(Role.USER, "find x")], _functions)
+
+    assert completion.function is not None
+    assert completion.function.name == "search"
+    assert completion.function.arguments == {"q": "x"}
+    assert completion.usage is not None and completion.usage.total_tokens == 38
+    assert model._llm.requests[0]["grammar"] == "grammar"
+
+    with pytest.raises(Exception, match="invalid call"):
+        _model("not json").complete([Message(Role.USER, "x")], _functions)
+
+
+def test_plain_completion():
+    model = _model("hello")
+    completion = model.complete([Message(Role.USER, "hi")])
+    assert completion.content == "hello"
+    assert model._llm.requests[0]["grammar"] is None
+
+
+def test_chat_conversion():
+    call = FunctionCall("c1", "search", {"q": "x"})
+    chat = _to_chat(
+        [
+            Message(Role.SYSTEM, "be brief"),
+            Message(Role.ASSISTANT, function=call),
+            Message(Role.TOOL, function=FunctionCall("c1", "search", {"hits": 2})),
+            Message(Role.ASSISTANT, "searching again", function=call),
+        ],
+        _functions,
+    )
+
+    assert chat[0]["role"] == "system"
+    assert chat[0]["content"].startswith("be brief")
+    assert "- search: Searches the web" in chat[0]["content"]
+    assert json.loads(chat[1]["content"]) == {"name": "search", "arguments": {"q": "x"}}
+    assert chat[2] == {"role": "user", "content": 'Result of search: {"hits": 2}'}
+    text, call_json = chat[3]["content"].split("\n")
+    assert text == "searching again"
+    assert json.loads(call_json)["name"] == "search"
+
+    names = [s["properties"]["name"]["const"] for s in call_schema(_functions)["oneOf"]]
+    assert names == ["search", "__result__"]
@@ -1,18 +1,20 @@
+import json
+from typing import List
 from unittest.mock import patch
 
 import pytest
 
-from agency.models import Function, FunctionCall, Message, Role
+from agency.models import Function, FunctionCall, Message, Role, Stream
 from agency.models.openrouter import OpenRouter
 
 
 @pytest.fixture
 def llm():
-    return OpenRouter("test-model")
+    return OpenRouter("test-model", api_key="test")
 
 
 def test_complete_content(llm):
-    with patch("requests.post") as mock_post:
+    with patch("requests.Session.request") as mock_post:
         mock_post.return_value.json.return_value = {
             "choices": [{"message": {"content": '{"result": "test response"}'}}]
         }
@@ -33,7 +35,7 @@ def test_complete_content(llm):
 
 
 def test_complete_tool_call(llm):
-    with patch("requests.post") as mock_post:
+    with patch("requests.Session.request") as mock_post:
         mock_post.return_value.json.return_value = {
             "choices": [
                 {
@@ -75,8 +77,8 @@ def test_complete_tool_call(llm):
         assert call_args["tools"][0]["function"]["name"] == "test_function"
 
 
-def test_multiple_tool_calls_raises(llm):
-    with patch("requests.post") as mock_post:
+def test_multiple_tool_calls(llm):
+    with patch("requests.Session.request") as mock_post:
         mock_post.return_value.json.return_value = {
             "choices": [
                 {
@@ -97,16 +99,184 @@ def test_multiple_tool_calls_raises(llm):
         }
 
         messages = [Message(role=Role.USER, content="test prompt")]
-        with pytest.raises(Exception) as exc:
-            llm.complete(messages)
-        assert "Expected at most 1 tool call" in str(exc.value)
+        response = llm.complete(messages)
+
+        assert response.function is None
+        assert response.calls == [
+            FunctionCall(id="call-1", name="func1", arguments={}),
+            FunctionCall(id="call-2", name="func2", arguments={}),
+        ]
+
+        # Parallel calls must round-trip back into a single assistant message.
+        converted = llm._convert_message(response)
+        assert [c["id"] for c in converted["tool_calls"]] == ["call-1", "call-2"]
 
 
 def test_api_error_raises(llm):
-    with patch("requests.post") as mock_post:
+    with patch("requests.Session.request") as mock_post:
         mock_post.return_value.json.return_value = {"error": "API Error Message"}
 
         messages = [Message(role=Role.USER, content="test prompt")]
         with pytest.raises(Exception) as exc:
             llm.complete(messages)
         assert "OpenRouter API error" in str(exc.value)
+
+
+def test_timeout(llm):
+    with patch("requests.Session.request") as mock_post:
+        mock_post.return_value.json.return_value = {
+            "choices": [{"message": {"content": "ok"}}]
+        }
+
+        llm.complete([Message(role=Role.USER, content="test prompt")], timeout=0.5)
+        connect, read = mock_post.call_args.kwargs["timeout"]
+        assert 0 < connect <= 0.5 and 0 < read <= 0.5
+
+
+def test_conversion_cache(llm):
+    history = [Message(role=Role.USER, content=f"message {i}") for i in range(3)]
+    functions = [
+        Function(
+            name="test_function",
+            description="A test function",
+            parameters={"type": "object", "properties": {}},
+        )
+    ]
+
+    first = llm._convert_messages(history)
+    history.append(Message(role=Role.USER, content="message 3"))
+    second = llm._convert_messages(history)
+
+    # Previously-converted messages are reused; only the new one is converted.
+    assert all(a is b for a, b in zip(first, second))
+    assert second[3]["content"] == "message 3"
+    assert llm._convert_functions(functions)[0] is llm._convert_functions(functions)[0]
+
+    # Entries go away with their messages.
+    del history, first, second
+    assert len(llm._converted_messages) == 0
+
+
+class RecordingStream(Stream):
+    def __init__(self):
+        self.events: List = []
+
+    def text(self, delta: str):
+        self.events.append(delta)
+
+    def call(self, call: FunctionCall):
+        self.events.append(call)
+
+
+def sse(*chunks) -> List[str]:
+    lines = [": OPENROUTER PROCESSING", ""]
+    for chunk in chunks:
+        lines += [f"data: {json.dumps(chunk)}", ""]
+    return lines + ["data: [DONE]", ""]
+
+
+def delta(**fields):
+    return {"choices": [{"delta": fields}]}
+
+
+def test_stream(llm):
+    with patch("requests.Session.request") as mock_post:
+        rsp = mock_post.return_value
+        rsp.headers = {"content-type": "text/event-stream"}
+        rsp.iter_lines.return_value = sse(
+            delta(role="assistant", content="Look"),
+            delta(content="ing..."),
+            delta(
+                tool_calls=[
+                    {
+                        "index": 0,
+                        "id": "call-1",
+                        "function": {"name": "f", "arguments": '{"x"'},
+                    }
+                ]
+            ),
+            delta(tool_calls=[{"index": 0, "function": {"arguments": ": 1}"}}]),
+            delta(
+                tool_calls=[
+                    {
+                        "index": 1,
+                        "id": "call-2",
+                        "function": {"name": "g", "arguments": "{}"},
+                    }
+                ]
+            ),
+            {
+                "choices": [{"delta": {}, "finish_reason": "tool_calls"}],
+                "usage": {
+                    "prompt_tokens": 9,
+                    "completion_tokens": 4,
+                    "total_tokens": 13,
+                },
+            },
+        )
+
+        stream = RecordingStream()
+        result = llm.complete([Message(role=Role.USER, content="go")], stream=stream)
+
+        assert mock_post.call_args.kwargs["json"]["stream"] is True
+        assert mock_post.call_args.kwargs["stream"] is True
+        assert result.content == "Looking..."
+        assert result.calls == [
+            FunctionCall(id="call-1", name="f", arguments={"x": 1}),
+            FunctionCall(id="call-2", name="g", arguments={}),
+        ]
+
+        assert result.usage and result.usage.total_tokens == 13
+
+        # The first call is delivered as soon as the second starts.
+        assert stream.events == ["Look", "ing...", result.calls[0], result.calls[1]]
+
+
+def test_stream_bytes(llm):
+    """Test that undecoded lines are read as UTF-8, as requests only decodes with a charset."""
+    with patch("requests.Session.request") as mock_post:
+        rsp = mock_post.return_value
+        rsp.headers = {"content-type": "text/event-stream"}
+        chunk = json.dumps(delta(content="café ☕"), ensure_ascii=False)
+        rsp.iter_lines.return_value = [f"data: {chunk}".encode(), b"", b"data: [DONE]"]
+
+        result = llm.complete([Message(role=Role.USER, content="go")], stream=Stream())
+        assert result.content == "café ☕"
+
+
+def test_stream_error_response(llm):
+    with patch("requests.Session.request") as mock_post:
+        rsp = mock_post.return_value
+        rsp.headers = {"content-type": "application/json"}
+        rsp.json.return_value = {"error": "API Error Message"}
+
+        with pytest.raises(Exception) as exc:
+            llm.complete([Message(role=Role.USER, content="go")], stream=Stream())
+        assert "OpenRouter API error" in str(exc.value)
+
+
+def test_fallbacks():
+    llm = OpenRouter("primary", fallbacks=["secondary", "tertiary"])
+    request = llm._build_request([], None)
+    assert request.get("models") == ["primary", "secondary", "tertiary"]
+    assert request.get("route") == "fallback"
+    assert "models" not in OpenRouter("primary")._build_request([], None)
+
+
+def test_sampling_settings():
+    llm = OpenRouter("m", temperature=0.2, seed=7)
+    request = llm._build_request([], None)
+    assert (request.get("temperature"), request.get("seed")) == (0.2, 7)
+    assert llm.settings() == {"model": "m", "temperature": 0.2, "seed": 7}
+
+
+def test_usage(llm):
+    with patch("requests.Session.request") as mock_post:
+        mock_post.return_value.json.return_value = {
+            "choices": [{"message": {"content": "hi"}}],
+            "usage": {"prompt_tokens": 5, "completion_tokens": 1, "total_tokens": 6},
+        }
+        usage = llm.complete([Message(role=Role.USER, content="test")]).usage
+        assert usage is not None
+        assert (usage.prompt_tokens, usage.completion_tokens) == (5, 1)
+        assert usage.latency >= 0
@@ -0,0 +1,75 @@
+import pytest
+
+from agency.agency import Agency
+from agency.httpclient import HttpClient
+from agency.minion import Minion
+from agency.models import FunctionCall, Message, Role, Stream
+from agency.models.openrouter import OpenRouter
+from agency.models.standin import Script, StandIn
+from agency.schema import Schema, Type
+from agency.tool import ToolDecl, ToolResult
+
+_str_schema = Schema(typ=Type.String, desc="test string param")
+
+_script = Script(
+    [
+        Message(Role.ASSISTANT, function=FunctionCall("", "lookup", {"q": "x" * 40})),
+        Message(
+            Role.ASSISTANT,
+            content="Found it, with more words than fit in one chunk.",
+            function=FunctionCall("", "__result__", {"answer": "found"}),
+        ),
+    ]
+)
+
+
+class LookupTool:
+    decl = ToolDecl("lookup", "Looks things up", _str_schema, _str_schema)
+
+    def invoke(self, req) -> ToolResult:
+        return ToolResult({"found": req.args["q"]})
+
+
+def _agency(model: OpenRouter) -> Agency:
+    minion = Minion(
+        ToolDecl("ask", "Asks", _str_schema, _str_schema),
+        model,
+        "{{ question }}",
+        [LookupTool.decl],
+    )
+    return Agency([minion, LookupTool()])
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_scripted_session(streaming: bool):
+    with StandIn(_script) as server:
+        agency = _agency(OpenRouter("standin", base_url=server.url, api_key="standin"))
+        result = agency.ask(
+            "ask", {"question": "q"}, stream=Stream() if streaming else None
+        )
+
+        assert result == {"answer": "found"}
+        stats = server.stats()
+        assert stats.requests == 2
+        assert stats.streamed == (2 if streaming else 0)
+
+
+def test_injected_errors():
+    http = HttpClient(retries=2, backoff=0.01)
+    with StandIn(errors={503: 1.0}) as server:
+        model = OpenRouter("standin", base_url=server.url, api_key="standin", http=http)
+        with pytest.raises(Exception, match="injected error"):
+            model.complete([Message(Role.USER, "hi")])
+        assert server.stats().errors == 3
+        assert http.stats().retries == 2
+
+    with StandIn(errors={429: 0.5}, retry_after=0.01, seed=1) as server:
+        model = OpenRouter(
+            "standin",
+            base_url=server.url,
+            api_key="standin",
+            http=HttpClient(retries=8, backoff=0.01),
+        )
+        for _ in range(5):
+            assert model.complete([Message(Role.USER, "hi")]).content == "ok"
+        assert server.stats().errors > 0
@@ -0,0 +1,192 @@
+"""Shared rate limits for models and tools.
+
+Limits are token buckets keyed by resource (see model_key() and tool_key()). Callers over the
+limit queue rather than fail: each acquisition reserves capacity immediately, possibly driving
+the bucket into debt, and then waits until the debt is repaid. Waiters are thus served in the
+order they arrived.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+
+def model_key(model_id: str) -> str:
+    return f"model:{model_id}"
+
+
+def tool_key(tool_id: str) -> str:
+    return f"tool:{tool_id}"
+
+
+class TokenBucket:
+    """A bucket holding up to capacity units, refilled continuously at rate units per second."""
+
+    rate: float
+    capacity: float
+    _level: float
+    _updated: float
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._level = capacity
+        self._updated = time.monotonic()
+
+    def reserve(self, amount: float) -> float:
+        """Takes amount units from the bucket, returning how long the caller must wait for them.
+        Not thread-safe; callers must synchronize."""
+        now = time.monotonic()
+        self._level = min(
+            self.capacity, self._level + (now - self._updated) * self.rate
+        )
+        self._updated = now
+        self._level -= amount
+        return max(0.0, -self._level / self.rate)
+
+
+@dataclass
+class LimitStats:
+    """Metrics for one rate limit; queue depth shows where callers are backing up."""
+
+    acquired: int = 0
+    delayed: int = 0
+    queue_depth: int = 0
+    max_queue_depth: int = 0
+    total_wait: float = 0.0
+
+
+class RateLimit:
+    """A requests/sec limit and/or a tokens/min limit on a single resource."""
+
+    requests_per_sec: Optional[float]
+    tokens_per_min: Optional[float]
+    _requests: Optional[TokenBucket]
+    _tokens: Optional[TokenBucket]
+    _stats: LimitStats
+    _lock: threading.Lock
+
+    def __init__(
+        self,
+        requests_per_sec: Optional[float] = None,
+        tokens_per_min: Optional[float] = None,
+        burst: Optional[float] = None,
+    ):
+        """
+        Args:
+            requests_per_sec: Sustained request rate, or None for no request limit
+            tokens_per_min: Sustained token rate, or None for no token limit
+            burst: Number of requests that may be made at once before the rate applies;
+                defaults to one second's worth (and at least one)
+        """
+        self.requests_per_sec = requests_per_sec
+        self.tokens_per_min = tokens_per_min
+        self._requests = None
+        self._tokens = None
+        if requests_per_sec:
+            self._requests = TokenBucket(
+                requests_per_sec, burst or max(1.0, requests_per_sec)
+            )
+        if tokens_per_min:
+            self._tokens = TokenBucket(tokens_per_min / 60, tokens_per_min)
+        self._stats = LimitStats()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: int = 0) -> float:
+        """Blocks until a request using the given number of tokens may proceed, returning the time waited."""
+        wait = self._reserve(tokens)
+        if wait > 0:
+            try:
+                time.sleep(wait)
+            finally:
+                self._release()
+        return wait
+
+    async def acquire_async(self, tokens: int = 0) -> float:
+        """Equivalent of acquire() that yields to the event loop while waiting."""
+        wait = self._reserve(tokens)
+        if wait > 0:
+            try:
+                await asyncio.sleep(wait)
+            finally:
+                self._release()
+        return wait
+
+    def debit(self, tokens: int):
+        """Charges tokens used after the fact (e.g., completion tokens), delaying later callers."""
+        if self._tokens is not None:
+            with self._lock:
+                self._tokens.reserve(tokens)
+
+    def stats(self) -> LimitStats:
+        with self._lock:
+            return LimitStats(**vars(self._stats))
+
+    def _reserve(self, tokens: int) -> float:
+        with self._lock:
+            wait = 0.0
+            if self._requests is not None:
+                wait = max(wait, self._requests.reserve(1))
+            if self._tokens is not None and tokens > 0:
+                wait = max(wait, self._tokens.reserve(tokens))
+
+            stats = self._stats
+            stats.acquired += 1
+            if wait > 0:
+                stats.delayed += 1
+                stats.total_wait += wait
+                stats.queue_depth += 1
+                stats.max_queue_depth = max(stats.max_queue_depth, stats.queue_depth)
+            return wait
+
+    def _release(self):
+        with self._lock:
+            self._stats.queue_depth -= 1
+
+
+class RateLimits:
+    """A registry of rate limits by resource key. Resources without a configured limit are unlimited."""
+
+    _limits: Dict[str, RateLimit]
+    _lock: threading.Lock
+
+    def __init__(self):
+        self._limits = {}
+        self._lock = threading.Lock()
+
+    def configure(
+        self,
+        key: str,
+        requests_per_sec: Optional[float] = None,
+        tokens_per_min: Optional[float] = None,
+        burst: Optional[float] = None,
+    ) -> RateLimit:
+        """Sets (or replaces) the limit for a resource."""
+        limit = RateLimit(requests_per_sec, tokens_per_min, burst)
+        with self._lock:
+            self._limits[key] = limit
+        return limit
+
+    def get(self, key: str) -> Optional[RateLimit]:
+        return self._limits.get(key)
+
+    def acquire(self, key: str, tokens: int = 0) -> float:
+        limit = self._limits.get(key)
+        return limit.acquire(tokens) if limit else 0.0
+
+    async def acquire_async(self, key: str, tokens: int = 0) -> float:
+        limit = self._limits.get(key)
+        return await limit.acquire_async(tokens) if limit else 0.0
+
+    def stats(self) -> Dict[str, LimitStats]:
+        with self._lock:
+            limits = dict(self._limits)
+        return {key: limit.stats() for key, limit in limits.items()}
+
+
+# Limits shared by default across all agencies and models in the process.
+rate_limits = RateLimits()
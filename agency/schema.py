@@ -5,25 +5,31 @@ from enum import Enum
 from inspect import isclass
 from typing import Any, Callable, Dict, Iterable, List, Optional, cast, get_type_hints
 
+from agency import fastjson
 from agency.models import OpenAPISchema
 from agency.utils import timestamp
 
 SCHEMA_KEY = "_schema"
 
 
-def schema(cls_desc: str = ""):
+def schema(cls_desc: str = "", slots: bool = False):
     """A class decorator that can be used on a dataclass, giving it an OpenAPI schema (accessible via schema_for(cls),
     and allowing it to be parsed with tools.parse_val(). This effectively extends @dataclass.
+
+    Pass slots=True for a slotted dataclass, which is smaller and faster to access, for types with
+    many live instances. As with @dataclass(slots=True), this replaces the decorated class.
     """
 
     def decorator(_cls) -> type:
         # Schema objects are also dataclasses.
         # This cast is correct, but I can't seem to make the typechecker happy.
-        cls: type = dataclass(_cls)  # pyright: ignore
-        assert is_dataclass(_cls)
+        cls: type = dataclass(_cls, slots=slots)  # pyright: ignore
+        assert isinstance(cls, type) and is_dataclass(cls)
 
-        # Precache schema for this class.
-        _ensure_schema(cls, cls_desc)
+        # Precache schema, parser and encoder for this class.
+        cls_schema = _ensure_schema(cls, cls_desc)
+        compile_parser(cls_schema)
+        compile_encoder(cls_schema)
         return cls
 
     return decorator
@@ -214,6 +220,14 @@ class Schema:
     # Object dataclass to instantiate.
     cls: Optional[type] = None
 
+    # Compiled parser and encoder, cached on first use (see compile_parser, compile_encoder).
+    _parser: Optional[Callable[[Any], Any]] = field(
+        default=None, init=False, repr=False, compare=False
+    )
+    _encoder: Optional[Callable[[Any], Any]] = field(
+        default=None, init=False, repr=False, compare=False
+    )
+
     # TODO: This is very Gemini-specific at the moment.
     # Should be easy to generalize to other function-calling model APIs.
     def to_openapi(self) -> OpenAPISchema:
@@ -252,46 +266,202 @@ class Schema:
         return d
 
 
+class SchemaError(Exception):
+    """Raised when a value doesn't match its schema. path locates the offending value."""
+
+    message: str
+    path: List[str | int]
+
+    def __init__(self, message: str, path: Optional[List[str | int]] = None):
+        super().__init__(message)
+        self.message = message
+        self.path = path or []
+
+    def __str__(self) -> str:
+        return f"{json_path(self.path)}: {self.message}"
+
+
+def json_path(path: List[str | int]) -> str:
+    """Formats a path as e.g. $.results[2].url"""
+    return "$" + "".join(f"[{p}]" if isinstance(p, int) else f".{p}" for p in path)
+
+
 # `schema` is only optional to avoid making every call-site messy.
 def parse_val(val: Any, schema: Optional[Schema]) -> Any:
+    """Parses a JSON-like value into the type described by schema.
+
+    Raises:
+        SchemaError: If the value doesn't match the schema
+    """
     if schema is None:
         raise Exception(f"Need a value type to parse {val}")
+    parse = schema._parser or compile_parser(schema)
+    try:
+        return parse(val)
+    except (TypeError, ValueError, AttributeError) as e:
+        raise _mismatch(schema, val, []) from e
+
+
+def compile_parser(schema: Schema) -> Callable[[Any], Any]:
+    """Gets a parser specialized to a schema, compiling and caching it if necessary.
 
+    Parsers are closures over their child parsers and, for objects, a precomputed field
+    table, so parsing never re-examines the schema. They do no bookkeeping on the happy path:
+    when parsing fails, the failing value is located afterwards, to raise a SchemaError with
+    its path.
+    """
+    if schema._parser is None:
+        schema._parser = _compile(schema)
+    return schema._parser
+
+
+def _compile(schema: Schema) -> Callable[[Any], Any]:
     match schema.typ:
-        # Simple types.
+        # Simple types. These may raise TypeError or ValueError, which the enclosing parser
+        # turns into a SchemaError.
         case Type.String:
-            return val
+            return _identity
         case Type.Real:
-            return float(val)
+            return float
         case Type.Integer:
-            return _loose_int(val)
+            return _loose_int
         case Type.Boolean:
-            return bool(val)
+            return bool
         case Type.DateTime:
-            return timestamp.fromisoformat(val)
+            return timestamp.fromisoformat
 
-        # Arrays.
         case Type.Array:
-            return [parse_val(item, schema.item_schema) for item in val]
+            return _compile_array(schema)
 
-        # Objects.
         case Type.Object:
             if schema.item_schema is not None:
                 # TODO: Validate item type.
-                return dict(val.items())
-            if schema.prop_schemae is None or schema.cls is None:
-                raise Exception(
-                    f"Need property schemae to parse object {val} : {schema}"
-                )
+                return _parse_dict
+            return _compile_object(schema)
+
+    raise Exception(f"unsupported schema type {schema.typ}")
+
+
+def _compile_array(schema: Schema) -> Callable[[Any], Any]:
+    item_schema = schema.item_schema
+    if item_schema is None:
+
+        def parse_untyped(val: Any) -> Any:
+            if val:
+                raise Exception(f"Need a value type to parse {val[0]}")
+            return []
+
+        return parse_untyped
+
+    parse_item = compile_parser(item_schema)
+
+    def parse_array(val: Any) -> Any:
+        try:
+            return [parse_item(item) for item in val]
+        except (SchemaError, TypeError, ValueError, AttributeError):
+            if not isinstance(val, list):
+                raise SchemaError(f"expected array, got {_preview(val)}")
+            for i, item in enumerate(val):
+                _check(parse_item, item_schema, item, i)
+            raise
+
+    return parse_array
+
+
+def _compile_object(schema: Schema) -> Callable[[Any], Any]:
+    if schema.prop_schemae is None or schema.cls is None:
+        raise Exception(f"Need property schemae to parse object : {schema}")
+    prop_schemae = schema.prop_schemae
+    parsers = {name: compile_parser(p) for name, p in prop_schemae.items()}
+    cls = schema.cls
+
+    def parse_object(val: Any) -> Any:
+        try:
+            ctor_args = {k: parsers[k](v) for k, v in val.items()}
+        except (SchemaError, KeyError, TypeError, ValueError, AttributeError):
+            if not isinstance(val, dict):
+                raise SchemaError(f"expected object, got {_preview(val)}")
+            for k, v in val.items():
+                if k not in parsers:
+                    raise SchemaError(f"unexpected property {k!r} for {cls.__name__}")
+                _check(parsers[k], prop_schemae[k], v, k)
+            raise
+
+        try:
+            return cls(**ctor_args)
+        except TypeError as e:
+            # Most likely missing required properties.
+            raise SchemaError(f"invalid {cls.__name__}: {e}") from e
+
+    return _generate_object(cls, parsers, parse_object)
+
+
+def _generate_object(
+    cls: type,
+    parsers: Dict[str, Callable[[Any], Any]],
+    parse_object: Callable[[Any], Any],
+) -> Callable[[Any], Any]:
+    """Generates a parser for the common case of an object with every property present.
+
+    It calls the constructor directly with each property parsed in place, avoiding the
+    intermediate arguments dict. Any other object, or any error, is handed to parse_object,
+    which handles missing properties and locates errors.
+    """
+    env: Dict[str, Any] = {
+        "cls": cls,
+        "keys": frozenset(parsers),
+        "parse_object": parse_object,
+    }
+    args = []
+    for i, (name, parse) in enumerate(parsers.items()):
+        if parse is _loose_int:
+            # Only floats given as strings need _loose_int; parse_object handles those.
+            parse = int
+        if parse is _identity:
+            args.append(f"{name}=val[{name!r}]")
+        else:
+            env[f"p{i}"] = parse
+            args.append(f"{name}=p{i}(val[{name!r}])")
+
+    source = f"""
+def parse(val):
+    try:
+        if val.keys() == keys:
+            return cls({", ".join(args)})
+    except Exception:
+        pass
+    return parse_object(val)
+"""
+    exec(source, env)
+    return env["parse"]
+
+
+def _check(parse: Callable[[Any], Any], schema: Schema, val: Any, key: str | int):
+    """Parses a child value, raising any error with the child's key prepended to its path."""
+    try:
+        parse(val)
+    except SchemaError as e:
+        e.path.insert(0, key)
+        raise
+    except (TypeError, ValueError, AttributeError) as e:
+        raise _mismatch(schema, val, [key]) from e
+
+
+def _mismatch(schema: Schema, val: Any, path: List[str | int]) -> SchemaError:
+    return SchemaError(f"expected {schema.typ.name.lower()}, got {_preview(val)}", path)
 
-            # Parse ctor args and instantiate the dataclass.
-            ctor_args = {
-                k: parse_val(v, schema.prop_schemae[k]) for (k, v) in val.items()
-            }
 
-            # TODO: Validate signature
-            # sig = inspect.signature(schema.cls)
-            return schema.cls(**ctor_args)
+def _preview(val: Any) -> str:
+    text = repr(val)
+    return text if len(text) <= 60 else text[:57] + "..."
+
+
+def _identity(val: Any) -> Any:
+    return val
+
+
+def _parse_dict(val: Any) -> Any:
+    return dict(val.items())
 
 
 def _loose_int(val: Any) -> int:
@@ -300,3 +470,108 @@ def _loose_int(val: Any) -> int:
         return int(val)
     except:
         return int(float(val))
+
+
+def encode_val(val: Any, schema: Schema) -> Any:
+    """Encodes a value of the type described by schema as JSON-ready data; the inverse of parse_val.
+
+    Objects become dicts, timestamps ISO 8601 strings and enums their values. Objects may also
+    be given as dicts, whose properties are encoded by their schemae.
+
+    Raises:
+        SchemaError: If the value doesn't match the schema
+    """
+    return (schema._encoder or compile_encoder(schema))(val)
+
+
+def encode_json(val: Any, schema: Schema) -> bytes:
+    """Encodes a value of the type described by schema as serialized JSON."""
+    return fastjson.dumpb(encode_val(val, schema))
+
+
+def compile_encoder(schema: Schema) -> Callable[[Any], Any]:
+    """Gets an encoder specialized to a schema, compiling and caching it if necessary."""
+    if schema._encoder is None:
+        schema._encoder = _compile_encoder(schema)
+    return schema._encoder
+
+
+def _compile_encoder(schema: Schema) -> Callable[[Any], Any]:
+    match schema.typ:
+        case Type.String:
+            return _encode_enum if schema.enum is not None else _identity
+        case Type.Real | Type.Integer | Type.Boolean:
+            return _identity
+        case Type.DateTime:
+            return _encode_datetime
+
+        case Type.Array:
+            if schema.item_schema is None:
+                return _encode_list
+            encode_item = compile_encoder(schema.item_schema)
+            if encode_item is _identity:
+                return _encode_list
+
+            def encode_array(val: Any) -> Any:
+                return None if val is None else [encode_item(item) for item in val]
+
+            return encode_array
+
+        case Type.Object:
+            if schema.item_schema is not None:
+                return _encode_dict
+            return _compile_object_encoder(schema)
+
+    raise Exception(f"unsupported schema type {schema.typ}")
+
+
+def _compile_object_encoder(schema: Schema) -> Callable[[Any], Any]:
+    if schema.prop_schemae is None or schema.cls is None:
+        raise Exception(f"Need property schemae to encode object : {schema}")
+    cls = schema.cls
+    encoders = {name: compile_encoder(p) for name, p in schema.prop_schemae.items()}
+
+    def encode_object(val: Any) -> Any:
+        if val is None:
+            return None
+        if isinstance(val, dict):
+            return {k: encoders[k](v) if k in encoders else v for k, v in val.items()}
+        if not isinstance(val, cls):
+            raise SchemaError(f"expected {cls.__name__}, got {_preview(val)}")
+        return {name: encode(getattr(val, name)) for name, encode in encoders.items()}
+
+    # Generate the common case: an instance of exactly cls, encoded with straight-line
+    # attribute reads.
+    env: Dict[str, Any] = {"cls": cls, "encode_object": encode_object}
+    items = []
+    for i, (name, encode) in enumerate(encoders.items()):
+        if encode is _identity:
+            items.append(f"{name!r}: val.{name}")
+        else:
+            env[f"e{i}"] = encode
+            items.append(f"{name!r}: e{i}(val.{name})")
+
+    source = f"""
+def encode(val):
+    if type(val) is cls:
+        return {{{", ".join(items)}}}
+    return encode_object(val)
+"""
+    exec(source, env)
+    return env["encode"]
+
+
+def _encode_enum(val: Any) -> Any:
+    return val.value if isinstance(val, Enum) else val
+
+
+def _encode_datetime(val: Any) -> Any:
+    return None if val is None else val.isoformat()
+
+
+def _encode_list(val: Any) -> Any:
+    return None if val is None else list(val)
+
+
+def _encode_dict(val: Any) -> Any:
+    return None if val is None else dict(val)
@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from agency.usage import UsageMeter
+
+
+class Session:
+    """Per-conversation state, shared by all tools invoked on behalf of one session.
+
+    Tools that keep conversational state (e.g., Minion histories) store it here, keyed by
+    something unique to the tool, rather than on the tool instance itself. That lets a single
+    set of tools serve many independent conversations.
+
+    State may also be scoped to a call running concurrently with others in the session (see
+    ToolContext.scope), so that parallel calls to the same tool don't share it.
+    """
+
+    id: str
+    last_used: float
+    usage: UsageMeter
+    _state: Dict[Tuple[Tuple[str, ...], Hashable], Any]
+    _lock: threading.Lock
+
+    def __init__(self, id: str):
+        self.id = id
+        self.last_used = time.monotonic()
+        self.usage = UsageMeter()
+        self._state = {}
+        self._lock = threading.Lock()
+
+    def state(
+        self, key: Hashable, factory: Callable[[], Any], scope: Tuple[str, ...] = ()
+    ) -> Any:
+        """Gets the state stored under key within scope, creating it with factory() if it doesn't
+        yet exist."""
+        with self._lock:
+            if (scope, key) not in self._state:
+                self._state[(scope, key)] = factory()
+            return self._state[(scope, key)]
+
+    def drop_scope(self, scope: Tuple[str, ...]):
+        """Discards all state within scope, and scopes nested within it."""
+        with self._lock:
+            for key in [key for key in self._state if key[0][: len(scope)] == scope]:
+                del self._state[key]
+
+    def touch(self):
+        self.last_used = time.monotonic()
+
+
+class Sessions:
+    """A bounded set of live sessions, evicted when idle or least-recently used."""
+
+    _sessions: OrderedDict[str, Session]
+    _max_sessions: int
+    _idle_timeout: Optional[float]
+    _lock: threading.Lock
+
+    def __init__(self, max_sessions: int = 1000, idle_timeout: Optional[float] = 3600):
+        """
+        Args:
+            max_sessions: Maximum number of resident sessions; the least-recently used are evicted beyond this
+            idle_timeout: Seconds after which an unused session is evicted, or None to keep them indefinitely
+        """
+        self._sessions = OrderedDict()
+        self._max_sessions = max_sessions
+        self._idle_timeout = idle_timeout
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> Session:
+        """Gets the session with the given id, creating it if it isn't resident."""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = Session(session_id)
+                self._sessions[session_id] = session
+            else:
+                self._sessions.move_to_end(session_id)
+            session.touch()
+            self._evict()
+            return session
+
+    def drop(self, session_id: str):
+        """Discards a session and all of its state."""
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._sessions
+
+    def _evict(self):
+        # Sessions are ordered by last use, so idle ones are always at the front.
+        if self._idle_timeout is not None:
+            cutoff = time.monotonic() - self._idle_timeout
+            while self._sessions:
+                oldest = next(iter(self._sessions.values()))
+                if oldest.last_used >= cutoff:
+                    break
+                self._sessions.popitem(last=False)
+
+        while len(self._sessions) > self._max_sessions:
+            self._sessions.popitem(last=False)
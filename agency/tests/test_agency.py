@@ -1,11 +1,21 @@
-from dataclasses import dataclass
-from typing import List
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import List, Optional
 
 import pytest
 
 from agency.agency import Agency
+from agency.budget import BudgetExceeded
+from agency.minion import Minion
+from agency.models import Function, FunctionCall, Message, Model, Role, Stream, Usage
 from agency.schema import Schema, Type
+from agency.session import Sessions
 from agency.tool import Tool, ToolCall, ToolDecl, ToolResult
+from agency.trace import Tracer
+from agency.usage import UsageMeter
 
 _str_schema = Schema(typ=Type.String, desc="test string param")
 
@@ -138,3 +148,763 @@ def test_tool_throws_exception():
     with pytest.raises(ValueError) as exc:
         agency.ask("error", {})
     assert "Simulated error" in str(exc.value)
+
+
+@dataclass
+class AsyncMockTool:
+    """An async mock tool that sleeps before returning its predefined responses."""
+
+    decl: ToolDecl
+    responses: List[ToolResult]
+    delay: float = 0.0
+    response_index: int = 0
+
+    async def invoke(self, req: ToolCall) -> ToolResult:
+        await asyncio.sleep(self.delay)
+        result = self.responses[self.response_index % len(self.responses)]
+        self.response_index += 1
+        return result
+
+
+def test_ask_async_nested_execution():
+    """Test that ask_async drives both sync and async tools through the stack."""
+    mock_tool1 = MockTool(
+        decl=ToolDecl(
+            id="mock1", desc="Mock Tool 1", params=_str_schema, returns=_str_schema
+        ),
+        responses=[
+            ToolResult(args={"nested": "test"}, call_tool_id="mock2", call_id="call1"),
+            ToolResult(args={"final": "done"}),
+        ],
+    )
+
+    mock_tool2 = AsyncMockTool(
+        decl=ToolDecl(
+            id="mock2", desc="Mock Tool 2", params=_str_schema, returns=_str_schema
+        ),
+        responses=[ToolResult(args={"nested_result": "success"})],
+    )
+
+    agency = Agency(tools=[mock_tool1, mock_tool2])
+    result = asyncio.run(agency.ask_async("mock1", {"input": "test"}))
+
+    assert result == {"final": "done"}
+
+
+def test_ask_async_concurrent():
+    """Test that concurrent asks overlap their waits rather than running serially."""
+    slow_tool = AsyncMockTool(
+        decl=ToolDecl(
+            id="slow", desc="Slow Tool", params=_str_schema, returns=_str_schema
+        ),
+        responses=[ToolResult(args={"result": "success"})],
+        delay=0.1,
+    )
+    agency = Agency(tools=[slow_tool])
+
+    async def ask_all():
+        return await asyncio.gather(
+            *[agency.ask_async("slow", {"input": str(i)}) for i in range(20)]
+        )
+
+    start = time.monotonic()
+    results = asyncio.run(ask_all())
+    assert time.monotonic() - start < 1.0
+    assert results == [{"result": "success"}] * 20
+
+
+def test_ask_sync_with_async_tool():
+    """Test that the synchronous ask() can still drive an async tool."""
+    tool = AsyncMockTool(
+        decl=ToolDecl(
+            id="async", desc="Async Tool", params=_str_schema, returns=_str_schema
+        ),
+        responses=[ToolResult(args={"result": "success"})],
+    )
+    agency = Agency(tools=[tool])
+    assert agency.ask("async", {}) == {"result": "success"}
+
+
+def test_ask_sync_in_running_loop():
+    """Test that ask() can drive an async tool from a thread already running a loop, as in
+    notebooks."""
+    tool = AsyncMockTool(
+        decl=ToolDecl(
+            id="async", desc="Async Tool", params=_str_schema, returns=_str_schema
+        ),
+        responses=[ToolResult(args={"result": "success"})],
+    )
+    agency = Agency(tools=[tool])
+
+    async def ask_in_loop():
+        return agency.ask("async", {})
+
+    assert asyncio.run(ask_in_loop()) == {"result": "success"}
+
+
+@dataclass
+class AwaitableTool:
+    """A tool whose invoke() isn't async, but returns an awaitable."""
+
+    decl: ToolDecl
+
+    def invoke(self, req: ToolCall):
+        async def respond() -> ToolResult:
+            return ToolResult(args={"result": "awaited"})
+
+        return respond()
+
+
+def test_ask_async_awaitable_tool():
+    """Test that ask_async awaits results returned by non-async tools."""
+    tool = AwaitableTool(
+        decl=ToolDecl(
+            id="awaitable", desc="Awaitable", params=_str_schema, returns=_str_schema
+        )
+    )
+    agency = Agency(tools=[tool])
+    assert asyncio.run(agency.ask_async("awaitable", {})) == {"result": "awaited"}
+
+
+@dataclass
+class BatchTool:
+    """A tool that requests a batch of calls, then returns the results it received."""
+
+    decl: ToolDecl
+    calls: List[FunctionCall]
+
+    def invoke(self, req: ToolCall) -> ToolResult:
+        if not req.results:
+            return ToolResult(args={}, calls=self.calls)
+        return ToolResult(args={r.id: r.arguments for r in req.results})
+
+
+@dataclass
+class SleepTool:
+    """A tool that blocks for a while, then echoes its args."""
+
+    decl: ToolDecl
+    delay: float
+
+    def invoke(self, req: ToolCall) -> ToolResult:
+        time.sleep(self.delay)
+        return ToolResult(args=req.args)
+
+
+def _batch_tools():
+    sleep = SleepTool(
+        decl=ToolDecl(
+            id="sleep", desc="Sleep Tool", params=_str_schema, returns=_str_schema
+        ),
+        delay=0.2,
+    )
+    batch = BatchTool(
+        decl=ToolDecl(
+            id="batch", desc="Batch Tool", params=_str_schema, returns=_str_schema
+        ),
+        calls=[
+            FunctionCall(id=f"call{i}", name="sleep", arguments={"n": i})
+            for i in range(5)
+        ],
+    )
+    return [batch, sleep]
+
+
+def test_parallel_tool_calls():
+    """Test that a batch of calls runs concurrently and returns all results in one turn."""
+    agency = Agency(tools=_batch_tools())
+
+    start = time.monotonic()
+    result = agency.ask("batch", {})
+    assert time.monotonic() - start < 0.6
+    assert result == {f"call{i}": {"n": i} for i in range(5)}
+
+
+def test_parallel_tool_calls_async():
+    """Test batched calls through the async engine."""
+    agency = Agency(tools=_batch_tools())
+
+    start = time.monotonic()
+    result = asyncio.run(agency.ask_async("batch", {}))
+    assert time.monotonic() - start < 0.6
+    assert result == {f"call{i}": {"n": i} for i in range(5)}
+
+
+class EchoModel(Model):
+    """A model that immediately returns the last user prompt as its result."""
+
+    def complete(
+        self,
+        messages: List[Message],
+        functions: Optional[List[Function]] = None,
+        stream: Optional[Stream] = None,
+        timeout: Optional[float] = None,
+    ) -> Message:
+        return Message(
+            role=Role.ASSISTANT,
+            function=FunctionCall(
+                id="result",
+                name="__result__",
+                arguments={"answer": messages[-1].content},
+            ),
+        )
+
+
+def test_minion_session_isolation():
+    """Test that each session gets its own minion history."""
+    minion = Minion(
+        ToolDecl(id="echo", desc="Echo", params=_str_schema, returns=_str_schema),
+        EchoModel(),
+        "{{ question }}",
+        [],
+    )
+    agency = Agency(tools=[minion])
+
+    agency.ask("echo", {"question": "a1"}, session="a")
+    agency.ask("echo", {"question": "b1"}, session="b")
+    agency.ask("echo", {"question": "a2"}, session="a")
+
+    history_a = minion.history(agency.session("a"))
+    history_b = minion.history(agency.session("b"))
+    assert len(history_a) == 5  # System + 2 * (prompt, completion)
+    assert len(history_b) == 3
+    assert all("b1" not in (m.content or "") for m in history_a.messages)
+
+    agency.end_session("a")
+    assert len(minion.history(agency.session("a"))) == 1
+
+
+class SlowEchoModel(EchoModel):
+    """An EchoModel that takes a while, so that concurrent calls overlap."""
+
+    def complete(
+        self,
+        messages: List[Message],
+        functions: Optional[List[Function]] = None,
+        stream: Optional[Stream] = None,
+        timeout: Optional[float] = None,
+    ) -> Message:
+        time.sleep(0.1)
+        return super().complete(messages, functions, stream, timeout)
+
+
+def test_minion_batch_isolation():
+    """Test that parallel calls to the same minion each get their own history."""
+    minion = Minion(
+        ToolDecl(id="echo", desc="Echo", params=_str_schema, returns=_str_schema),
+        SlowEchoModel(),
+        "{{ question }}",
+        [],
+    )
+    batch = BatchTool(
+        decl=ToolDecl(
+            id="batch", desc="Batch Tool", params=_str_schema, returns=_str_schema
+        ),
+        calls=[
+            FunctionCall(id="a", name="echo", arguments={"question": "A"}),
+            FunctionCall(id="b", name="echo", arguments={"question": "B"}),
+        ],
+    )
+    agency = Agency(tools=[batch, minion])
+
+    result = agency.ask("batch", {}, session="s")
+    assert result["a"]["answer"].startswith("A")
+    assert result["b"]["answer"].startswith("B")
+
+    # The calls' histories are discarded once they're done.
+    assert len(minion.history(agency.session("s"))) == 1
+
+
+def test_asks_without_session_are_isolated():
+    """Test that concurrent asks without a session each get a fresh one, discarded after."""
+    minion = Minion(
+        ToolDecl(id="echo", desc="Echo", params=_str_schema, returns=_str_schema),
+        SlowEchoModel(),
+        "{{ question }}",
+        [],
+    )
+    sessions = Sessions(idle_timeout=None)
+    agency = Agency(tools=[minion], sessions=sessions)
+
+    with ThreadPoolExecutor(2) as pool:
+        a = pool.submit(agency.ask, "echo", {"question": "A"})
+        b = pool.submit(agency.ask, "echo", {"question": "B"})
+        assert a.result()["answer"].startswith("A")
+        assert b.result()["answer"].startswith("B")
+    assert len(sessions) == 0
+
+
+class ScriptedModel(Model):
+    """A model that returns a fixed sequence of completions, recording the prompts it saw."""
+
+    def __init__(self, completions: List[Message]):
+        self.completions = completions
+        self.prompts: List[List[Message]] = []
+
+    def complete(
+        self,
+        messages: List[Message],
+        functions: Optional[List[Function]] = None,
+        stream: Optional[Stream] = None,
+        timeout: Optional[float] = None,
+    ) -> Message:
+        self.prompts.append(list(messages))
+        return self.completions[len(self.prompts) - 1]
+
+
+def test_minion_result_in_batch():
+    """Test that __result__ in a batch with other calls is sent back as an error, not run."""
+    model = ScriptedModel(
+        [
+            Message(
+                role=Role.ASSISTANT,
+                calls=[
+                    FunctionCall(id="s", name="sleep", arguments={"n": 1}),
+                    FunctionCall(id="r", name="__result__", arguments={"a": "early"}),
+                ],
+            ),
+            Message(
+                role=Role.ASSISTANT,
+                function=FunctionCall(
+                    id="r2", name="__result__", arguments={"a": "done"}
+                ),
+            ),
+        ]
+    )
+    decl = ToolDecl(id="sleep", desc="Sleep", params=_str_schema, returns=_str_schema)
+    minion = Minion(
+        ToolDecl(id="top", desc="Top", params=_str_schema, returns=_str_schema),
+        model,
+        "go",
+        [decl],
+    )
+    agency = Agency(tools=[minion, SleepTool(decl=decl, delay=0)])
+
+    assert agency.ask("top", {}) == {"a": "done"}
+    responses = {
+        m.function.id: m.function.arguments
+        for m in model.prompts[1]
+        if m.role == Role.TOOL and m.function
+    }
+    assert responses["s"] == {"n": 1}
+    assert "error" in responses["r"]
+
+
+def test_minion_only_pseudo_calls_in_batch():
+    """Test that a batch of nothing but pseudo-tool calls is taken as the first one."""
+    model = ScriptedModel(
+        [
+            Message(
+                role=Role.ASSISTANT,
+                calls=[
+                    FunctionCall(id="r", name="__result__", arguments={"a": "one"}),
+                    FunctionCall(id="e", name="__except__", arguments={"message": "x"}),
+                ],
+            ),
+            Message(
+                role=Role.ASSISTANT,
+                function=FunctionCall(
+                    id="r2", name="__result__", arguments={"a": "two"}
+                ),
+            ),
+        ]
+    )
+    minion = Minion(
+        ToolDecl(id="top", desc="Top", params=_str_schema, returns=_str_schema),
+        model,
+        "go",
+        [],
+    )
+    agency = Agency(tools=[minion])
+
+    assert agency.ask("top", {}, session="s") == {"a": "one"}
+
+    # The ignored call is answered before the next turn, as APIs require.
+    assert agency.ask("top", {}, session="s") == {"a": "two"}
+    responses = {
+        m.function.id: m.function.arguments
+        for m in model.prompts[1]
+        if m.role == Role.TOOL and m.function
+    }
+    assert list(responses) == ["e"] and "error" in responses["e"]
+
+
+def test_session_eviction():
+    """Test that sessions are evicted by count and by idle time."""
+    sessions = Sessions(max_sessions=2, idle_timeout=None)
+    sessions.get("a")
+    sessions.get("b")
+    sessions.get("a")
+    sessions.get("c")
+    assert "b" not in sessions
+    assert "a" in sessions and "c" in sessions
+
+    sessions = Sessions(idle_timeout=0.05)
+    sessions.get("a")
+    time.sleep(0.1)
+    sessions.get("b")
+    assert "a" not in sessions
+    assert len(sessions) == 1
+
+
+def test_tool_result_cache():
+    """Test that cacheable tools are only invoked once per distinct args, until invalidated."""
+    lookup = MockTool(
+        decl=ToolDecl(
+            id="lookup",
+            desc="Lookup Tool",
+            params=_str_schema,
+            returns=_str_schema,
+            cacheable=True,
+        ),
+        responses=[ToolResult(args={"result": i}) for i in range(3)],
+    )
+    record = MockTool(
+        decl=ToolDecl(
+            id="record",
+            desc="Record Tool",
+            params=_str_schema,
+            returns=_str_schema,
+            invalidates=["lookup"],
+        ),
+        responses=[ToolResult(args={})],
+    )
+    agency = Agency(tools=[lookup, record])
+
+    assert agency.ask("lookup", {"q": "x", "n": 1}) == {"result": 0}
+    assert agency.ask("lookup", {"n": 1, "q": "x"}) == {"result": 0}
+    assert agency.ask("lookup", {"q": "y", "n": 1}) == {"result": 1}
+    stats = agency.cache.stats()["lookup"]
+    assert (stats.hits, stats.misses) == (1, 2)
+
+    agency.ask("record", {})
+    assert agency.ask("lookup", {"q": "x", "n": 1}) == {"result": 2}
+
+
+def test_tracing():
+    """Test that frames and invocations are traced with correct nesting."""
+    mock_tool1 = MockTool(
+        decl=ToolDecl(
+            id="mock1", desc="Mock Tool 1", params=_str_schema, returns=_str_schema
+        ),
+        responses=[
+            ToolResult(args={"nested": "test"}, call_tool_id="mock2", call_id="call1"),
+            ToolResult(args={"final": "done"}),
+        ],
+    )
+    mock_tool2 = MockTool(
+        decl=ToolDecl(
+            id="mock2", desc="Mock Tool 2", params=_str_schema, returns=_str_schema
+        ),
+        responses=[ToolResult(args={"nested_result": "success"})],
+    )
+
+    tracer = Tracer()
+    agency = Agency(tools=[mock_tool1, mock_tool2], tracer=tracer)
+    agency.ask("mock1", {"input": "test"})
+
+    spans = {span.name: span for span in tracer.spans()}
+    assert set(spans) == {"frame mock1", "frame mock2", "invoke mock1", "invoke mock2"}
+    assert all(span.end_ns is not None for span in spans.values())
+    assert spans["frame mock1"].parent_id is None
+    assert spans["frame mock2"].parent_id == spans["frame mock1"].id
+    assert spans["invoke mock2"].parent_id == spans["frame mock2"].id
+
+    events = tracer.to_chrome_trace()["traceEvents"]
+    assert len(events) == 5  # Two frames; mock1 is invoked twice
+    assert all(event["ph"] == "X" and event["dur"] >= 0 for event in events)
+
+    records = tracer.to_otel()
+    assert len({record["traceId"] for record in records}) == 1
+    assert sum("parentSpanId" not in record for record in records) == 1
+
+
+def test_max_invocations():
+    """Test that a tool that loops forever is stopped by the invocation budget."""
+    loop_tool = MockTool(
+        decl=ToolDecl(
+            id="loop", desc="Loop Tool", params=_str_schema, returns=_str_schema
+        ),
+        responses=[ToolResult(args={}, call_tool_id="loop", call_id="again")] * 100,
+    )
+    tracer = Tracer()
+    agency = Agency(tools=[loop_tool], tracer=tracer)
+
+    with pytest.raises(BudgetExceeded):
+        agency.ask("loop", {}, max_invocations=10)
+    assert loop_tool.response_index == 10
+
+    # All frames were unwound, closing their spans.
+    assert all(span.end_ns is not None for span in tracer.spans())
+
+
+def test_deadline():
+    """Test that the deadline stops sync asks, and cancels in-flight async ones."""
+    sleep = SleepTool(
+        decl=ToolDecl(
+            id="sleep", desc="Sleep Tool", params=_str_schema, returns=_str_schema
+        ),
+        delay=0.1,
+    )
+    slow = AsyncMockTool(
+        decl=ToolDecl(
+            id="slow", desc="Slow Tool", params=_str_schema, returns=_str_schema
+        ),
+        responses=[ToolResult(args={}, call_tool_id="sleep", call_id="call")],
+        delay=1.0,
+    )
+    agency = Agency(tools=[sleep, slow])
+
+    with pytest.raises(BudgetExceeded):
+        agency.ask("slow", {}, timeout=0.05)
+
+    start = time.monotonic()
+    with pytest.raises(BudgetExceeded):
+        asyncio.run(agency.ask_async("slow", {}, timeout=0.1))
+    assert time.monotonic() - start < 0.5
+
+
+class HangingModel(Model):
+    """A model that never answers, giving up only when its timeout runs out."""
+
+    def __init__(self):
+        self.timeouts: List[Optional[float]] = []
+
+    def complete(
+        self,
+        messages: List[Message],
+        functions: Optional[List[Function]] = None,
+        stream: Optional[Stream] = None,
+        timeout: Optional[float] = None,
+    ) -> Message:
+        self.timeouts.append(timeout)
+        threading.Event().wait(5 if timeout is None else timeout)
+        raise TimeoutError("model request timed out")
+
+
+def test_deadline_bounds_model_requests():
+    """Test that a minion's model request is bounded by the ask's remaining time."""
+    model = HangingModel()
+    minion = Minion(
+        ToolDecl(id="hang", desc="Hang", params=_str_schema, returns=_str_schema),
+        model,
+        "{{ question }}",
+        [],
+    )
+    agency = Agency(tools=[minion])
+
+    start = time.monotonic()
+    result = agency.ask("hang", {"question": "q"}, timeout=0.1)
+    assert time.monotonic() - start < 1
+    assert "timed out" in result["error"]
+    assert model.timeouts[0] is not None and model.timeouts[0] <= 0.1
+
+
+def test_ask_many():
+    """Test bulk asks: bounded concurrency, per-item errors and stats."""
+
+    @dataclass
+    class SquareTool:
+        decl: ToolDecl
+
+        def invoke(self, req: ToolCall) -> ToolResult:
+            time.sleep(0.05)
+            if req.args["n"] == 3:
+                raise ValueError("unlucky")
+            return ToolResult(args={"square": req.args["n"] ** 2})
+
+    tool = SquareTool(
+        decl=ToolDecl(id="sq", desc="Square", params=_str_schema, returns=_str_schema)
+    )
+    agency = Agency(tools=[tool])
+
+    batch = agency.ask_many("sq", ({"n": n} for n in range(20)), concurrency=10)
+    assert batch.stats.elapsed == 0  # The clock starts with the first item.
+    start = time.monotonic()
+    results = sorted(batch, key=lambda r: r.index)
+    assert time.monotonic() - start < 0.5
+
+    assert [r.result["square"] for r in results if r.result] == [
+        n**2 for n in range(20) if n != 3
+    ]
+    assert isinstance(results[3].error, ValueError)
+    assert batch.stats.completed == 19
+    assert batch.stats.failed == 1
+    assert batch.stats.throughput > 0
+    assert batch.stats.start is not None and batch.stats.start >= start
+
+
+class RecordingStream(Stream):
+    def __init__(self):
+        self.events: List = []
+
+    def text(self, delta: str):
+        self.events.append(delta)
+
+    def call(self, call: FunctionCall):
+        self.events.append(call.id)
+
+
+@dataclass
+class MarkTool:
+    """A tool that signals when it's invoked, then echoes its args."""
+
+    decl: ToolDecl
+    started: threading.Event = field(default_factory=threading.Event)
+    invocations: int = 0
+
+    def invoke(self, req: ToolCall) -> ToolResult:
+        self.invocations += 1
+        self.started.set()
+        return ToolResult(args=req.args)
+
+
+@dataclass
+class StreamingTool:
+    """Streams its calls like a model would, and only finishes once the first has started."""
+
+    decl: ToolDecl
+    mark: MarkTool
+    calls: List[FunctionCall]
+    patience: float = 2
+    started_early: bool = False
+
+    def invoke(self, req: ToolCall) -> ToolResult:
+        if req.result_tool_id or req.results:
+            results = req.results or [
+                FunctionCall(
+                    req.result_call_id or "", req.result_tool_id or "", req.args
+                )
+            ]
+            return ToolResult(args={r.id: r.arguments for r in results})
+
+        stream = req.context.stream if req.context else None
+        assert stream is not None
+        stream.text("thinking")
+        for call in self.calls:
+            stream.call(call)
+        self.started_early = self.mark.started.wait(self.patience)
+        if len(self.calls) == 1:
+            call = self.calls[0]
+            return ToolResult(call.arguments, call_tool_id=call.name, call_id=call.id)
+        return ToolResult(args={}, calls=self.calls)
+
+
+def _streaming_tools(n: int):
+    mark = MarkTool(
+        ToolDecl(id="mark", desc="Mark Tool", params=_str_schema, returns=_str_schema)
+    )
+    streaming = StreamingTool(
+        ToolDecl(id="stream", desc="Stream", params=_str_schema, returns=_str_schema),
+        mark,
+        [
+            FunctionCall(id=f"call{i}", name="mark", arguments={"n": i})
+            for i in range(n)
+        ],
+    )
+    return streaming, mark
+
+
+@pytest.mark.parametrize("n", [1, 3])
+def test_early_dispatch(n: int):
+    """Test that streamed calls start before the completion ends, and run only once."""
+    streaming, mark = _streaming_tools(n)
+    agency = Agency(tools=[streaming, mark])
+
+    stream = RecordingStream()
+    result = agency.ask("stream", {}, stream=stream)
+
+    assert streaming.started_early
+    assert mark.invocations == n
+    assert result == {f"call{i}": {"n": i} for i in range(n)}
+    assert stream.events == ["thinking"] + [f"call{i}" for i in range(n)]
+
+
+def test_early_dispatch_async():
+    """Test early dispatch through the async engine."""
+    streaming, mark = _streaming_tools(3)
+    agency = Agency(tools=[streaming, mark])
+
+    result = asyncio.run(agency.ask_async("stream", {}, stream=Stream()))
+
+    assert streaming.started_early
+    assert mark.invocations == 3
+    assert result == {f"call{i}": {"n": i} for i in range(3)}
+
+
+def test_early_dispatch_disabled():
+    """Test that calls wait for the completion when early dispatch is off."""
+    streaming, mark = _streaming_tools(1)
+    streaming.patience = 0.1
+    agency = Agency(tools=[streaming, mark], early_dispatch=False)
+
+    result = agency.ask("stream", {}, stream=Stream())
+
+    assert not streaming.started_early
+    assert mark.invocations == 1
+    assert result == {"call0": {"n": 0}}
+
+
+@pytest.mark.parametrize("early_dispatch", [True, False])
+def test_early_dispatch_keeps_history(early_dispatch: bool):
+    """Test that a single call started early keeps its session state, as if it had been pushed."""
+    minion = Minion(
+        ToolDecl(id="echo", desc="Echo", params=_str_schema, returns=_str_schema),
+        EchoModel(),
+        "{{ question }}",
+        [],
+    )
+    streaming, mark = _streaming_tools(0)
+    streaming.calls = [FunctionCall(id="c", name="echo", arguments={"question": "q"})]
+    streaming.patience = 0
+    agency = Agency(tools=[streaming, mark, minion], early_dispatch=early_dispatch)
+
+    agency.ask("stream", {}, session="s", stream=Stream())
+    agency.ask("stream", {}, session="s", stream=Stream())
+
+    history = minion.history(agency.session("s"))
+    assert len(history) == 5  # System + 2 * (prompt, completion)
+
+
+class MeteredModel(EchoModel):
+    """An EchoModel that reports fixed token usage."""
+
+    def complete(
+        self,
+        messages: List[Message],
+        functions: Optional[List[Function]] = None,
+        stream: Optional[Stream] = None,
+        timeout: Optional[float] = None,
+    ) -> Message:
+        completion = super().complete(messages, functions, stream, timeout)
+        completion.usage = Usage(prompt_tokens=10, completion_tokens=2, total_tokens=12)
+        return completion
+
+
+def test_usage():
+    """Test that usage is accumulated per minion, ask and session, and traced."""
+    minion = Minion(
+        ToolDecl(id="echo", desc="Echo", params=_str_schema, returns=_str_schema),
+        MeteredModel(),
+        "{{ question }}",
+        [],
+    )
+    tracer = Tracer()
+    agency = Agency(tools=[minion], tracer=tracer)
+
+    meter = UsageMeter()
+    agency.ask("echo", {"question": "a"}, session="s", usage=meter)
+    agency.ask("echo", {"question": "b"}, session="s")
+
+    assert meter.total().total_tokens == 12
+    assert agency.session("s").usage.total().total_tokens == 24
+    assert minion.usage().prompt_tokens == 20
+    assert minion.usage().completions == 2
+
+    complete = [s for s in tracer.spans() if s.name == "complete"]
+    assert complete[0].args["prompt_tokens"] == 10
+    assert complete[0].args["completion_tokens"] == 2
+
+    batch = agency.ask_many("echo", ({"question": str(n)} for n in range(3)))
+    assert all(r.usage.total_tokens == 12 for r in batch)
+    assert batch.stats.usage.total_tokens == 36
@@ -0,0 +1,82 @@
+import time
+from dataclasses import dataclass
+from typing import List, Optional
+
+import pytest
+
+from agency.agency import Agency
+from agency.cassette import Cassette, CassetteMiss
+from agency.minion import Minion
+from agency.models import Function, FunctionCall, Message, Model, Role, Stream
+from agency.schema import Schema, Type
+from agency.tool import ToolCall, ToolDecl, ToolResult
+
+_str_schema = Schema(typ=Type.String, desc="test string param")
+
+
+class ScriptedModel(Model):
+    """A model that calls the lookup tool once, then returns its result."""
+
+    calls: int = 0
+
+    def complete(
+        self,
+        messages: List[Message],
+        functions: Optional[List[Function]] = None,
+        stream: Optional[Stream] = None,
+        timeout: Optional[float] = None,
+    ) -> Message:
+        self.calls += 1
+        last = messages[-1]
+        if last.role == Role.TOOL and last.function:
+            return Message(
+                role=Role.ASSISTANT,
+                function=FunctionCall("r", "__result__", last.function.arguments),
+            )
+        return Message(
+            role=Role.ASSISTANT,
+            function=FunctionCall("c", "lookup", {"q": last.content}),
+        )
+
+
+@dataclass
+class LookupTool:
+    decl: ToolDecl
+    calls: int = 0
+
+    def invoke(self, req: ToolCall) -> ToolResult:
+        self.calls += 1
+        return ToolResult({"answer": f"looked up {req.args['q'][:5]}"})
+
+
+def _agency(cassette: Cassette, model: Model, lookup: LookupTool) -> Agency:
+    minion = Minion(
+        ToolDecl("ask", "Asks", _str_schema, _str_schema),
+        cassette.model(model),
+        "{{ question }}",
+        [lookup.decl],
+    )
+    return Agency([minion, cassette.tool(lookup)])
+
+
+def test_record_replay(tmp_path):
+    path = str(tmp_path / "session.jsonl.gz")
+    lookup_decl = ToolDecl("lookup", "Looks things up", _str_schema, _str_schema)
+
+    model, lookup = ScriptedModel(), LookupTool(lookup_decl)
+    with Cassette(path, "record") as cassette:
+        recorded = _agency(cassette, model, lookup).ask("ask", {"question": "hello"})
+    assert model.calls == 2 and lookup.calls == 1
+
+    # Replay serves everything from the cassette, without calling through.
+    model, lookup = ScriptedModel(), LookupTool(lookup_decl)
+    cassette = Cassette(path, "replay", latency=0.01)
+    start = time.monotonic()
+    replayed = _agency(cassette, model, lookup).ask("ask", {"question": "hello"})
+    assert replayed == recorded
+    assert model.calls == 0 and lookup.calls == 0
+    assert time.monotonic() - start >= 0.03
+
+    # Requests that were never recorded can't be served.
+    with pytest.raises(CassetteMiss):
+        Cassette(path, "replay").play("model", "ScriptedModel", {"messages": []})
@@ -0,0 +1,113 @@
+import json
+from typing import List
+
+import numpy
+import pytest
+
+from agency.embedcache import EmbeddingCache
+from agency.embedding import EmbeddingService
+
+
+def vec(x: float) -> numpy.ndarray:
+    return numpy.full(4, x, dtype=numpy.float32)
+
+
+def cached(cache: EmbeddingCache, text: str) -> List[float]:
+    """Gets a cached vector, which must be present, as a list."""
+    got = cache.get("model", text)
+    assert got is not None
+    return got.tolist()
+
+
+def test_get_put(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), dim=4, max_entries=8)
+    assert cache.get("model", "a") is None
+
+    cache.put("model", "a", vec(1))
+    assert cached(cache, "a") == [1] * 4
+    assert cache.get("other-model", "a") is None
+
+    # Returned vectors are copies.
+    got = cache.get("model", "a")
+    assert got is not None
+    got[0] = 5
+    assert cached(cache, "a")[0] == 1
+
+    stats = cache.stats()
+    assert (stats.hits, stats.misses) == (3, 2)
+    with pytest.raises(ValueError):
+        cache.put("model", "b", numpy.zeros(3))
+
+
+def test_lru_eviction(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), dim=4, max_entries=3)
+    for i, text in enumerate(["a", "b", "c"]):
+        cache.put("model", text, vec(i))
+    cache.get("model", "a")
+    cache.put("model", "d", vec(3))
+
+    assert len(cache) == 3
+    assert cache.get("model", "b") is None
+    assert cached(cache, "a") == [0] * 4
+    assert cached(cache, "d") == [3] * 4
+
+
+def test_persists(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), dim=4, max_entries=3)
+    for i, text in enumerate(["a", "b", "c"]):
+        cache.put("model", text, vec(i))
+    cache.get("model", "a")
+    cache.flush()
+
+    reopened = EmbeddingCache(str(tmp_path), dim=4, max_entries=3)
+    assert len(reopened) == 3
+    assert cached(reopened, "c") == [2] * 4
+
+    # Recency survives too: b is now least recently used.
+    reopened.put("model", "d", vec(3))
+    assert reopened.get("model", "b") is None
+    assert reopened.get("model", "a") is not None
+
+    # A cache of another shape is discarded.
+    resized = EmbeddingCache(str(tmp_path), dim=4, max_entries=10)
+    assert len(resized) == 0
+
+
+def test_discards_other_types(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), dim=4, max_entries=3)
+    cache.put("model", "a", vec(1))
+    cache.flush()
+
+    # Vectors of another type are discarded, whatever their shape.
+    numpy.save(tmp_path / "vectors.npy", numpy.zeros((3, 4), dtype=numpy.float64))
+    assert len(EmbeddingCache(str(tmp_path), dim=4, max_entries=3)) == 0
+
+    # As are those the last flush says were of another type.
+    cache = EmbeddingCache(str(tmp_path), dim=4, max_entries=3)
+    cache.put("model", "a", vec(1))
+    cache.flush()
+    meta = json.loads((tmp_path / "order.json").read_text())
+    assert (meta["dtype"], meta["dim"]) == ("float32", 4)
+    (tmp_path / "order.json").write_text(json.dumps({**meta, "dtype": "float16"}))
+    assert len(EmbeddingCache(str(tmp_path), dim=4, max_entries=3)) == 0
+
+    # Having reset, the cache reopens as it was left.
+    EmbeddingCache(str(tmp_path), dim=4, max_entries=3).put("model", "b", vec(2))
+    assert len(EmbeddingCache(str(tmp_path), dim=4, max_entries=3)) == 1
+
+
+def test_service_uses_cache(tmp_path):
+    encoded: List[str] = []
+
+    def encode(texts: List[str]) -> numpy.ndarray:
+        encoded.extend(texts)
+        return numpy.stack([vec(len(text)) for text in texts])
+
+    cache = EmbeddingCache(str(tmp_path), dim=4)
+    service = EmbeddingService(encode, model="fake", cache=cache)
+    service.embed_many(["a", "bb"])
+    vecs = service.embed_many(["bb", "ccc", "a"])
+
+    assert vecs[:, 0].tolist() == [2, 3, 1]
+    assert encoded == ["a", "bb", "ccc"]
+    assert cache.get("fake", "ccc") is not None
@@ -0,0 +1,97 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+import numpy
+import pytest
+
+from agency.embedding import EmbeddingService
+
+
+class FakeEncoder:
+    """Embeds each text as [len(text)], recording batch sizes. Blocks until released, so that
+    requests made meanwhile queue up."""
+
+    def __init__(self, blocked: bool = False):
+        self.batches: List[int] = []
+        self.release = threading.Event()
+        if not blocked:
+            self.release.set()
+
+    def __call__(self, texts: List[str]) -> numpy.ndarray:
+        self.release.wait(timeout=5)
+        self.batches.append(len(texts))
+        return numpy.array([[len(text)] for text in texts], dtype=numpy.float32)
+
+
+def test_coalesces_concurrent_requests():
+    encoder = FakeEncoder(blocked=True)
+    service = EmbeddingService(encoder, max_batch=8)
+    texts = ["x" * i for i in range(1, 18)]
+
+    with ThreadPoolExecutor(len(texts)) as pool:
+        futures = [pool.submit(service.embed, text) for text in texts]
+        # Let the first batch through once everything else has queued behind it.
+        while service.stats().requests < len(texts):
+            pass
+        encoder.release.set()
+        results = [future.result() for future in futures]
+
+    assert [int(r[0]) for r in results] == [len(t) for t in texts]
+    assert max(encoder.batches) == 8
+    assert len(encoder.batches) < len(texts)
+    assert service.stats().texts == len(texts)
+
+
+def test_embed_many():
+    encoder = FakeEncoder()
+    service = EmbeddingService(encoder, max_batch=4)
+    vecs = service.embed_many(["a", "bb", "ccc", "dddd", "eeeee"])
+
+    assert vecs.shape == (5, 1)
+    assert vecs[:, 0].tolist() == [1, 2, 3, 4, 5]
+    assert all(size <= 4 for size in encoder.batches)
+    assert service.embed_many([]).shape[0] == 0
+
+
+def test_encoder_errors():
+    calls = []
+
+    def encode(texts: List[str]) -> numpy.ndarray:
+        calls.append(texts)
+        if len(calls) == 1:
+            raise ValueError("model failed")
+        return numpy.zeros((len(texts), 2))
+
+    service = EmbeddingService(encode)
+    with pytest.raises(ValueError, match="model failed"):
+        service.embed("a")
+
+    # The worker survives to serve later requests.
+    assert service.embed("b").tolist() == [0, 0]
+
+
+@pytest.mark.filterwarnings("ignore::pytest.PytestUnhandledThreadExceptionWarning")
+def test_worker_dies():
+    def encode(texts: List[str]) -> numpy.ndarray:
+        raise SystemExit()
+
+    service = EmbeddingService(encode)
+    with pytest.raises(RuntimeError, match="stopped"):
+        service.submit(["a"])[0].result(timeout=2)
+
+    # Later requests fail rather than wait on a worker that's gone.
+    with pytest.raises(RuntimeError, match="stopped"):
+        service.embed("b")
+    assert service._worker is not None
+    service._worker.join()
+
+
+def test_embed_async():
+    service = EmbeddingService(FakeEncoder())
+
+    async def embed_all():
+        return await asyncio.gather(*[service.embed_async("ab") for _ in range(3)])
+
+    assert [v.tolist() for v in asyncio.run(embed_all())] == [[2]] * 3
@@ -0,0 +1,77 @@
+from agency.history import History, HistoryPolicy
+from agency.models import FunctionCall, Message, Role
+
+
+def _history(turns: int) -> History:
+    history = History([Message(Role.SYSTEM, "system prompt")])
+    for i in range(turns):
+        history.append(Message(Role.USER, f"question {i}"))
+        call = FunctionCall(f"call{i}", "browse-url", {"url": f"https://x/{i}"})
+        history.append(Message(Role.ASSISTANT, function=call))
+        history.append(
+            Message(
+                Role.TOOL,
+                function=FunctionCall(call.id, call.name, {"text": "x" * 4000}),
+            )
+        )
+    return history
+
+
+def test_no_compaction_within_budget():
+    history = _history(2)
+    assert history.compact(HistoryPolicy(token_budget=10_000)) is None
+
+
+def test_compaction_elides_old_tool_results():
+    history = _history(10)
+    before = list(history.messages)
+    policy = HistoryPolicy(token_budget=4_000, keep_recent=3)
+
+    compaction = history.compact(policy)
+    assert compaction is not None
+    assert compaction.tokens_after <= policy.token_budget
+    assert compaction.saved == compaction.tokens_before - compaction.tokens_after
+    assert compaction.saved > 0
+    assert history.saved_tokens == compaction.saved
+
+    # The system prompt and recent messages are untouched; elided results keep their call ids.
+    assert history.messages[0] is before[0]
+    assert history.messages[-3:] == before[-3:]
+    for old, new in zip(before, history.messages):
+        assert old.role == new.role
+        if new is not old:
+            assert new.function and old.function
+            assert new.function.id == old.function.id
+            assert "elided" in new.function.arguments
+
+
+def test_compaction_with_summarizer():
+    history = _history(5)
+    policy = HistoryPolicy(
+        token_budget=1_000,
+        keep_recent=0,
+        summarize=lambda call: {"summary": f"{call.name} output"},
+    )
+    compaction = history.compact(policy)
+    assert compaction is not None and compaction.elided == 5
+    tool_results = [m for m in history.messages if m.role == Role.TOOL]
+    assert all(m.function and "summary" in m.function.arguments for m in tool_results)
+
+
+def test_compaction_elides_once():
+    summarized = []
+
+    def summarize(call: FunctionCall):
+        summarized.append(call.id)
+        return {"summary": "x" * 2000}
+
+    history = _history(2)
+    policy = HistoryPolicy(token_budget=500, keep_recent=0, summarize=summarize)
+    assert history.compact(policy) is not None
+    assert summarized == ["call0", "call1"]
+
+    # Already-elided results aren't summarized again, however far over budget.
+    history.append(Message(Role.USER, "more"))
+    compaction = history.compact(policy)
+    assert compaction is not None and compaction.elided == 0
+    assert summarized == ["call0", "call1"]
@@ -0,0 +1,67 @@
+import time
+from typing import Dict, Optional
+from unittest.mock import MagicMock, patch
+
+import pytest
+import requests
+
+from agency.httpclient import HttpClient
+
+
+def response(status: int, headers: Optional[Dict[str, str]] = None) -> MagicMock:
+    rsp = MagicMock()
+    rsp.status_code = status
+    rsp.headers = headers or {}
+    return rsp
+
+
+def test_retries_transient_failures():
+    """Test that 5xx responses and connection errors are retried until one succeeds."""
+    client = HttpClient(retries=3, backoff=0.01)
+    ok = response(200)
+    with patch("requests.Session.request") as mock_request:
+        mock_request.side_effect = [response(503), requests.ConnectionError(), ok]
+        assert client.post("https://example.com", json={}) is ok
+
+    assert mock_request.call_count == 3
+    stats = client.stats()
+    assert stats.requests == 1 and stats.retries == 2 and stats.failures == 0
+
+
+def test_gives_up_after_retries():
+    """Test that the last error response is returned once retries are used up."""
+    client = HttpClient(retries=2, backoff=0.01)
+    with patch("requests.Session.request") as mock_request:
+        mock_request.side_effect = [response(500), response(502), response(504)]
+        assert client.post("https://example.com").status_code == 504
+
+        # Client errors other than 429 are returned as-is.
+        mock_request.side_effect = [response(400)]
+        assert client.post("https://example.com").status_code == 400
+
+    assert client.stats().failures == 1
+
+
+def test_retry_after():
+    """Test that Retry-After is honoured, and that retries stop at the request's deadline."""
+    client = HttpClient(retries=3, backoff=0.0)
+    with patch("requests.Session.request") as mock_request:
+        mock_request.side_effect = [
+            response(429, {"retry-after": "0.2"}),
+            response(200),
+        ]
+        start = time.monotonic()
+        assert client.post("https://example.com").status_code == 200
+        assert time.monotonic() - start >= 0.2
+
+        # Waiting as asked would overrun the deadline, so the 429 is returned instead.
+        mock_request.side_effect = [response(429, {"retry-after": "5"})]
+        assert client.post("https://example.com", timeout=1).status_code == 429
+
+        mock_request.side_effect = requests.Timeout()
+        with pytest.raises(requests.Timeout):
+            client.post("https://example.com", timeout=0.01)
+
+    # Each attempt's timeouts are bounded by what's left of the deadline.
+    _, kwargs = mock_request.call_args
+    assert kwargs["timeout"][1] <= 0.01
@@ -0,0 +1,52 @@
+import threading
+import time
+
+from agency.ratelimit import RateLimit, RateLimits, tool_key
+
+
+def test_requests_per_sec():
+    limit = RateLimit(requests_per_sec=20, burst=1)
+
+    start = time.monotonic()
+    for _ in range(5):
+        limit.acquire()
+    assert 0.15 < time.monotonic() - start < 0.5
+
+    stats = limit.stats()
+    assert stats.acquired == 5
+    assert stats.delayed == 4
+    assert stats.queue_depth == 0
+
+
+def test_tokens_per_min():
+    # 600 tokens/min = 10 tokens/sec, with a full minute's burst available up front.
+    limit = RateLimit(tokens_per_min=600)
+    assert limit.acquire(600) == 0
+    waited = limit.acquire(2)
+    assert 0.1 < waited < 0.5
+
+
+def test_concurrent_callers_queue():
+    limits = RateLimits()
+    limits.configure(tool_key("search"), requests_per_sec=50, burst=1)
+    depths = []
+
+    def call():
+        limits.acquire(tool_key("search"))
+        depths.append(limits.stats()[tool_key("search")].queue_depth)
+
+    threads = [threading.Thread(target=call) for _ in range(10)]
+    start = time.monotonic()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert time.monotonic() - start > 0.15
+    stats = limits.stats()[tool_key("search")]
+    assert stats.acquired == 10
+    assert stats.max_queue_depth >= 5
+    assert stats.queue_depth == 0
+
+    # Unconfigured resources are unlimited.
+    assert limits.acquire(tool_key("other")) == 0
@@ -1,7 +1,19 @@
+import json
 from enum import Enum
-from typing import List
-
-from agency.schema import Schema, Type, parse_val, prop
+from typing import Dict, List
+
+import pytest
+
+from agency import fastjson
+from agency.schema import (
+    Schema,
+    SchemaError,
+    Type,
+    encode_json,
+    encode_val,
+    parse_val,
+    prop,
+)
 from agency.schema import schema as schema_decorator
 from agency.schema import schema_for
 from agency.utils import timestamp
@@ -133,6 +145,77 @@ def test_parse_dict():
     assert result == data
 
 
+def test_parser_compiled_once():
+    @schema_decorator("A result")
+    class Result:
+        url: str = prop("The url")
+
+    schema = schema_for(Result)
+    parser = schema._parser
+    assert parser is not None
+
+    parse_val({"url": "a"}, schema)
+    assert schema._parser is parser
+
+
+def test_slots():
+    @schema_decorator("A slotted result", slots=True)
+    class Result:
+        url: str = prop("The url")
+        rank: int = prop("The rank", default=1)
+
+    schema = schema_for(Result)
+    assert schema.cls is Result
+    result = parse_val({"url": "a"}, schema)
+    assert result == Result("a", 1)
+    assert not hasattr(result, "__dict__")
+    assert encode_val(result, schema) == {"url": "a", "rank": 1}
+
+
+def test_parse_partial():
+    @schema_decorator("A result")
+    class Result:
+        url: str = prop("The url")
+        rank: int = prop("The rank")
+        note: str = prop("A note", default="none")
+
+    schema = schema_for(Result)
+    assert parse_val({"url": "a", "rank": "2.0", "note": "n"}, schema) == Result(
+        "a", 2, "n"
+    )
+    assert parse_val({"url": "a", "rank": 3}, schema) == Result("a", 3, "none")
+
+
+def test_parse_error_paths():
+    @schema_decorator("A result")
+    class Result:
+        url: str = prop("The url")
+        score: float = prop("The score")
+
+    @schema_decorator("Search results")
+    class Results:
+        results: List[Result] = prop("The results")
+
+    schema = schema_for(Results)
+    results = [{"url": "a", "score": 1}, {"url": "b", "score": "high"}]
+    with pytest.raises(SchemaError) as e:
+        parse_val({"results": results}, schema)
+    assert e.value.path == ["results", 1, "score"]
+    assert str(e.value).startswith("$.results[1].score: expected real")
+
+    with pytest.raises(SchemaError) as e:
+        parse_val({"results": [{"url": "a", "score": 1, "rank": 2}]}, schema)
+    assert str(e.value) == "$.results[0]: unexpected property 'rank' for Result"
+
+    with pytest.raises(SchemaError) as e:
+        parse_val({"results": [{"url": "a"}]}, schema)
+    assert e.value.path == ["results", 0]
+
+    with pytest.raises(SchemaError) as e:
+        parse_val({"results": "a"}, schema)
+    assert str(e.value) == "$.results: expected array, got 'a'"
+
+
 def test_openapi_schema():
     @schema_decorator("A test class")
     class TestClass:
@@ -153,3 +236,59 @@ def test_openapi_schema():
     assert props["items"]["type"] == "array"
     assert "items" in props["items"]
     assert props["items"]["items"]["type"] == "string"
+
+
+def test_encode_round_trip():
+    class Color(Enum):
+        RED = "red"
+        GREEN = "green"
+
+    @schema_decorator("An item")
+    class Item:
+        name: str = prop("The name")
+        color: Color = prop("The color")
+        when: timestamp = prop("The time")
+
+    @schema_decorator("Items")
+    class Items:
+        items: List[Item] = prop("The items")
+        tags: Dict[str, str] = prop("Tags", default_factory=dict)
+
+    schema = schema_for(Items)
+    when = timestamp(2024, 1, 2, 3, 4, 5)
+    items = Items([Item("a", Color.RED, when)], {"k": "v"})
+
+    encoded = encode_val(items, schema)
+    assert encoded == {
+        "items": [{"name": "a", "color": "red", "when": when.isoformat()}],
+        "tags": {"k": "v"},
+    }
+    assert json.loads(encode_json(items, schema)) == encoded
+
+    parsed = parse_val(encoded, schema)
+    assert parsed.items[0].when == when
+    assert parsed.items[0].color == "red"
+
+
+def test_encode_dicts():
+    @schema_decorator("An item")
+    class Item:
+        name: str = prop("The name")
+        when: timestamp = prop("The time")
+
+    schema = Schema(typ=Type.Array, desc="", item_schema=schema_for(Item))
+    when = timestamp(2024, 1, 2)
+    assert encode_val([{"name": "a", "when": when}], schema) == [
+        {"name": "a", "when": when.isoformat()}
+    ]
+
+    with pytest.raises(SchemaError):
+        encode_val(["a"], schema)
+
+
+def test_encode_json_fallback(monkeypatch):
+    val = {"text": "caf\u00e9", "items": [1, 2.5, True, None]}
+    fast = fastjson.dumpb(val)
+    monkeypatch.setattr(fastjson, "orjson", None)
+    assert fastjson.dumpb(val) == fast
+    assert fastjson.dumps(val) == fast.decode()
@@ -0,0 +1,56 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from agency import keys
+from agency.warmup import warm_up
+
+
+def imported_after(code: str) -> set:
+    """Runs code in a fresh interpreter without API keys, returning the modules it imported."""
+    env = {
+        k: v
+        for k, v in os.environ.items()
+        if k not in ("OPENROUTER_API_KEY", "TAVILY_API_KEY")
+    }
+    proc = subprocess.run(
+        [sys.executable, "-c", f"{code}\nimport sys; print(' '.join(sys.modules))"],
+        capture_output=True,
+        text=True,
+        env=env,
+        check=True,
+    )
+    return set(proc.stdout.split())
+
+
+def test_imports_are_lazy():
+    """Test that importing the core and tools defers keys and heavy dependencies."""
+    modules = imported_after(
+        "import agency.minion, agency.models.openrouter, agency.tools\n"
+        "from agency.tools import Search, docstore, logstore"
+    )
+    for heavy in ("chromadb", "sentence_transformers", "torch", "playwright"):
+        assert heavy not in modules
+    assert "IPython" not in modules
+    assert "jinja2" not in modules
+
+
+def test_keys_read_on_use(monkeypatch):
+    monkeypatch.setenv("OPENROUTER_API_KEY", "first")
+    assert keys.OPENROUTER_API_KEY == "first"
+    monkeypatch.setenv("OPENROUTER_API_KEY", "second")
+    assert keys.OPENROUTER_API_KEY == "second"
+
+    monkeypatch.delenv("OPENROUTER_API_KEY")
+    with pytest.raises(KeyError):
+        keys.OPENROUTER_API_KEY
+    with pytest.raises(AttributeError):
+        keys.NOT_A_KEY
+
+
+def test_warm_up_skips_missing_modules():
+    thread = warm_up(["json", "agency.no_such_module"], embeddings=False)
+    thread.join(timeout=5)
+    assert not thread.is_alive()
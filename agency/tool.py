@@ -1,8 +1,12 @@
 from dataclasses import dataclass, field
-from typing import Any, Dict, Optional, Protocol
+from typing import Any, Dict, List, Optional, Protocol, Tuple, Union
 
-from agency.models import Function
+from agency.budget import Budget
+from agency.models import Function, FunctionCall, Stream, Usage
 from agency.schema import Schema
+from agency.session import Session
+from agency.trace import Tracer
+from agency.usage import UsageMeter
 
 ResultToolId = "__result__"
 ExceptToolId = "__except__"
@@ -14,12 +18,36 @@ class ToolContext:
 
     This context is provided to every tool invocation and contains resources
     that are shared across the entire tool execution chain.
+
+    Attributes:
+        session: The session on whose behalf the tool is invoked. Tools keep any
+            per-conversation state here rather than on themselves.
+        tracer: Tracer recording spans for this request, if tracing is enabled.
+        budget: Time and invocation limits for the request, if any.
+        stream: Receives model output incrementally, if the request is streamed. Tools that
+            call models should pass it through to Model.complete().
+        usage: Accumulates the usage of all completions made for the request, if metered.
+        scope: Ids of the concurrent calls this tool runs within, outermost first. Tools keep
+            per-conversation state in this scope of the session, so that parallel calls to the
+            same tool each get their own.
     """
 
-    pass
+    session: Optional[Session] = None
+    tracer: Optional[Tracer] = None
+    budget: Optional[Budget] = None
+    stream: Optional[Stream] = None
+    usage: Optional[UsageMeter] = None
+    scope: Tuple[str, ...] = ()
 
+    def record_usage(self, usage: Optional[Usage]):
+        """Records a completion's usage against the request and its session."""
+        if self.usage:
+            self.usage.add(usage)
+        if self.session:
+            self.session.usage.add(usage)
 
-@dataclass
+
+@dataclass(slots=True)
 class ToolCall:
     """Represents a request to invoke a tool with specific arguments.
 
@@ -33,6 +61,7 @@ class ToolCall:
         context: The shared context for this tool execution (optional)
         result_tool_id: ID of the tool that produced this call's input
         result_call_id: ID of the specific call that produced this call's input
+        results: Results of a batch of calls requested via ToolResult.calls, one per call
     """
 
     name: str
@@ -40,9 +69,16 @@ class ToolCall:
     context: Optional[ToolContext] = None
     result_tool_id: Optional[str] = None
     result_call_id: Optional[str] = None
+    results: List[FunctionCall] = field(default_factory=list)
 
+    def timeout(self, default: Optional[float]) -> Optional[float]:
+        """Gets a timeout for I/O performed by this call: default, bounded by the request's remaining budget."""
+        if self.context and self.context.budget:
+            return self.context.budget.timeout(default)
+        return default
 
-@dataclass
+
+@dataclass(slots=True)
 class ToolResult:
     """Represents the result of a tool invocation.
 
@@ -53,23 +89,37 @@ class ToolResult:
         args: Dictionary containing the tool's output
         call_tool_id: ID of another tool to call with these args
         call_id: ID to associate with the tool result
+        calls: A batch of tool calls to run concurrently, instead of call_tool_id. The results
+            are delivered together to this tool's next invocation via ToolCall.results.
     """
 
     args: Dict[str, Any]
     call_tool_id: str = field(default=ResultToolId)
     call_id: Optional[str] = field(default=None)
+    calls: List[FunctionCall] = field(default_factory=list)
 
 
 @dataclass
 class ToolDecl:
     """Declaration for a tool that can be used by a language model (via a Minion).
-    Their ids must be unique within the context of a single Minion."""
+    Their ids must be unique within the context of a single Minion.
+
+    Attributes:
+        cacheable: Whether results may be served from the agency's ToolCache. Only set this for
+            tools whose results depend solely on their args (and on the tools that invalidate them).
+        cache_ttl: Seconds to keep cached results, or None to keep them until evicted or invalidated
+        invalidates: Ids of cacheable tools whose cached results are stale after this tool runs
+    """
 
     id: str
     desc: str
     params: Schema
     returns: Schema
 
+    cacheable: bool = field(default=False, kw_only=True)
+    cache_ttl: Optional[float] = field(default=None, kw_only=True)
+    invalidates: List[str] = field(default_factory=list, kw_only=True)
+
     def to_func(self) -> Function:
         return Function(
             name=self.id,
@@ -91,3 +141,18 @@ class Tool(Protocol):
     decl: ToolDecl
 
     def invoke(self, req: ToolCall) -> ToolResult: ...
+
+
+class AsyncTool(Protocol):
+    """Protocol for tools whose invoke method is a coroutine.
+
+    Agency.ask_async() awaits these directly on the event loop, rather than handing them
+    off to a worker thread as it does for synchronous tools.
+    """
+
+    decl: ToolDecl
+
+    async def invoke(self, req: ToolCall) -> ToolResult: ...
+
+
+AnyTool = Union[Tool, AsyncTool]
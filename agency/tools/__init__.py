@@ -1,7 +1,23 @@
-from .browse import Browse
-from .feedback import GetFeedback, SubmitFeedback
-from .notebook import LookupNotes, RecordNote, RemoveNote, UpdateNote
-from .search import Search
+# Tools are imported on first access, so that using one doesn't import the dependencies of all.
+import importlib
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from .browse import Browse
+    from .feedback import GetFeedback, SubmitFeedback
+    from .notebook import LookupNotes, RecordNote, RemoveNote, UpdateNote
+    from .search import Search
+
+_modules = {
+    "Browse": "browse",
+    "Search": "search",
+    "GetFeedback": "feedback",
+    "SubmitFeedback": "feedback",
+    "RecordNote": "notebook",
+    "UpdateNote": "notebook",
+    "RemoveNote": "notebook",
+    "LookupNotes": "notebook",
+}
 
 __all__ = [
     "Browse",
@@ -13,3 +29,10 @@ __all__ = [
     "RemoveNote",
     "LookupNotes",
 ]
+
+
+def __getattr__(name: str) -> Any:
+    if name not in _modules:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module = importlib.import_module(f".{_modules[name]}", __name__)
+    return getattr(module, name)
@@ -1,13 +1,18 @@
+from __future__ import annotations
+
 import io
-from typing import List, Optional
+from typing import TYPE_CHECKING, List, Optional
 from urllib.parse import urljoin
 
-from playwright.sync_api import Response, sync_playwright
-from unstructured.partition.auto import partition
-
 from agency.schema import parse_val, prop, schema, schema_for
 from agency.tool import Tool, ToolCall, ToolDecl, ToolResult
 
+if TYPE_CHECKING:
+    from playwright.sync_api import Response
+
+# Default page load timeout, in seconds.
+_TIMEOUT = 30.0
+
 
 # NOTE: The unstructured partition() function is skipping some elements for HTML,
 # including the use of <figure>, which is quite common on Wikipedia and other sources.
@@ -26,9 +31,14 @@ class Browse(Tool):
         "Returns the contents at the specified URL.",
         schema_for(Params),
         schema_for(Returns),
+        cacheable=True,
+        cache_ttl=600,
     )
 
     def invoke(self, req: ToolCall) -> ToolResult:
+        from playwright.sync_api import sync_playwright
+        from unstructured.partition.auto import partition
+
         args = parse_val(req.args, Browse.decl.params)
 
         with sync_playwright() as p:
@@ -41,7 +51,8 @@ class Browse(Tool):
                 # Malenia.apply_stealth(context)
 
                 page = context.new_page()
-                rsp = page.goto(args.url)
+                timeout = req.timeout(_TIMEOUT) or _TIMEOUT
+                rsp = page.goto(args.url, timeout=timeout * 1000)
                 content_type = _content_type(rsp)
                 file = io.BytesIO(bytes(page.content(), "UTF-8"))
                 browser.close()
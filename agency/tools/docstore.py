@@ -1,13 +1,19 @@
+from __future__ import annotations
+
 import os
 from glob import glob
 from hashlib import md5
-from typing import Dict, List, Tuple, TypedDict
+from typing import TYPE_CHECKING, Dict, List, Tuple, TypedDict
+
+from agency.embedding import embed_text, embed_texts
 
-import chromadb.api
-from chromadb import Metadata
-from chromadb.api.types import IncludeEnum
+if TYPE_CHECKING:
+    import chromadb.api
+    from chromadb import Metadata
 
-from agency.embedding import embed_text
+
+# Documents embedded and written to the collection at a time, when loading a directory.
+_INDEX_BATCH = 256
 
 
 class Doc(TypedDict):
@@ -41,6 +47,8 @@ class Docstore:
         self._load_dir(self._work_dir)
 
     def exists(self, id: str) -> Tuple[bool, Dict[str, str]]:
+        from chromadb.api.types import IncludeEnum
+
         result = self._coll.get(ids=id, include=[IncludeEnum.metadatas])
         meta = result["metadatas"]
         if meta is not None and len(meta) > 0:
@@ -70,6 +78,8 @@ class Docstore:
         self.create(new_id, text, labels)
 
     def find(self, query: str, number: int) -> List[Doc]:
+        from chromadb.api.types import IncludeEnum
+
         vec = self._embed(query)
         rsp = self._coll.query(
             query_embeddings=[vec],
@@ -101,13 +111,16 @@ class Docstore:
         return name
 
     def _load_dir(self, dir: str):
-        # TODO: Group embed calls for efficiency.
         pattern = os.path.join(dir, f"*.md")
-        for file_path in glob(pattern):
-            id = file_id(file_path)
-            self._load_doc(id, file_path)
-
-    def _load_doc(self, id: str, file_path: str):
+        paths = glob(pattern)
+        for start in range(0, len(paths), _INDEX_BATCH):
+            docs = [
+                (file_id(path), *self._read_doc(path))
+                for path in paths[start : start + _INDEX_BATCH]
+            ]
+            self._index_docs(docs)
+
+    def _read_doc(self, file_path: str) -> Tuple[str, Dict[str, str]]:
         with open(file_path, "r") as file:
             content = file.read()
 
@@ -125,25 +138,48 @@ class Docstore:
                 )
             }
             text = parts[2].strip()
-
-        self._index_doc(id, text, labels)
+        return text, labels
 
     def _index_doc(self, id: str, text: str, labels: Dict[str, str]):
-        # Already extant?
-        text_hash = md5((f"{id} : {text}").encode(), usedforsecurity=False).hexdigest()
-        exists, old_labels = self.exists(id)
-        if exists and ("hash" in old_labels) and (text_hash == old_labels["hash"]):
+        self._index_docs([(id, text, labels)])
+
+    def _index_docs(self, docs: List[Tuple[str, str, Dict[str, str]]]):
+        """Embeds and indexes docs, skipping those already indexed with the same text."""
+        from chromadb.api.types import IncludeEnum
+
+        if not docs:
+            return
+
+        # Look up all the docs' hashes at once.
+        rsp = self._coll.get(
+            ids=[id for id, _, _ in docs], include=[IncludeEnum.metadatas]
+        )
+        old: Dict[str, Dict[str, str]] = {
+            id: meta_labels(meta)
+            for id, meta in zip(rsp["ids"], rsp["metadatas"] or [])
+        }
+
+        stale = []
+        for id, text, labels in docs:
+            text_hash = md5(
+                (f"{id} : {text}").encode(), usedforsecurity=False
+            ).hexdigest()
+            old_labels = old.get(id, {})
+            if old_labels.get("hash") == text_hash:
+                continue
+            print(f"--- [re-]embedding {id}\n    {text_hash} : {old_labels}")
+            labels["hash"] = text_hash
+            stale.append((id, text, labels))
+        if not stale:
             return
 
-        # Nope. Embed and add it.
-        print(f"--- [re-]embedding {id}\n    {text_hash} : {old_labels}")
-        labels["hash"] = text_hash
-        embedding = self._embed(text)
-        self._coll.add(
-            ids=id,
-            documents=text,
-            embeddings=embedding,
-            metadatas=labels,
+        # Embed in one batch, and upsert, as changed docs are already in the collection.
+        embeddings = embed_texts([text for _, text, _ in stale])
+        self._coll.upsert(
+            ids=[id for id, _, _ in stale],
+            documents=[text for _, text, _ in stale],
+            embeddings=embeddings.tolist(),
+            metadatas=[labels for _, _, labels in stale],
         )
 
     def _embed(self, text: str) -> List[float]:
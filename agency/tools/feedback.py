@@ -1,7 +1,15 @@
 from dataclasses import dataclass
 from typing import List
 
-from agency.schema import Schema, Type, parse_val, prop, schema, schema_for
+from agency.schema import (
+    Schema,
+    Type,
+    encode_val,
+    parse_val,
+    prop,
+    schema,
+    schema_for,
+)
 from agency.tool import Tool, ToolCall, ToolDecl, ToolResult
 from agency.tools.logstore import LogStore
 from agency.utils import timestamp
@@ -22,6 +30,7 @@ class SubmitFeedback(Tool):
         "Submits feedback on an interaction",
         schema_for(Params),
         Schema(Type.Object, ""),
+        invalidates=["get-feedback"],
     )
 
     _store: LogStore
@@ -49,6 +58,7 @@ class GetFeedback(Tool):
         "Gets user feedback within a specified time range",
         schema_for(Params),
         schema_for(Returns),
+        cacheable=True,
     )
 
     _store: LogStore
@@ -56,4 +66,6 @@ class GetFeedback(Tool):
     def invoke(self, req: ToolCall) -> ToolResult:
         args = parse_val(req.args, GetFeedback.decl.params)
         result = self._store.query(args.query, args.begin, args.end)
-        return ToolResult(dict(GetFeedback.Returns(result)))
+        return ToolResult(
+            encode_val(GetFeedback.Returns(result), GetFeedback.decl.returns)
+        )
@@ -22,6 +22,10 @@ class ReadFile(Tool):
         "reads a file from disk",
         schema_for(Params),
         schema_for(Returns),
+        cacheable=True,
+        # Files may change outside the agency (which only invalidates on edit-file), so only
+        # repeated reads in quick succession are served from the cache.
+        cache_ttl=10,
     )
 
     root_path: str
@@ -53,6 +57,7 @@ class EditFile(Tool):
         "edits a file's contents",
         schema_for(Params),
         Schema(Type.Object, ""),
+        invalidates=["read-file"],
     )
 
     root_path: str
@@ -1,12 +1,15 @@
-import os
-from typing import List
+from __future__ import annotations
 
-import chromadb
-import chromadb.api
+import os
+from typing import TYPE_CHECKING, List
 
 from agency.embedding import embed_text
 from agency.utils import timestamp
 
+if TYPE_CHECKING:
+    import chromadb
+    import chromadb.api
+
 
 class LogStore:
     _coll: chromadb.Collection
@@ -26,6 +26,7 @@ class RecordNote(Tool):
         "Records a note in the notebook for later research. Use simple semantic ids.",
         schema_for(Params),
         Schema(Type.Object, ""),
+        invalidates=["lookup-notes"],
     )
 
     store: Docstore
@@ -52,6 +53,7 @@ class UpdateNote(Tool):
         "Updates a note from the notebook.",
         schema_for(Params),
         Schema(Type.Object, ""),
+        invalidates=["lookup-notes"],
     )
 
     store: Docstore
@@ -75,6 +77,7 @@ class RemoveNote(Tool):
         "Removes a note from the notebook.",
         schema_for(Params),
         Schema(Type.Object, ""),
+        invalidates=["lookup-notes"],
     )
 
     store: Docstore
@@ -101,6 +104,7 @@ class LookupNotes(Tool):
         "Looks up notes in the notebook.",
         schema_for(Params),
         schema_for(Returns),
+        cacheable=True,
     )
 
     store: Docstore
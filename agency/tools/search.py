@@ -2,16 +2,18 @@ from __future__ import annotations
 
 from typing import Dict, List, Optional
 
-import requests
-
-from agency.schema import parse_val, prop, schema, schema_for
+from agency.httpclient import HttpClient, http_client
+from agency.schema import encode_val, parse_val, prop, schema, schema_for
 from agency.tool import Tool, ToolCall, ToolDecl, ToolResult
 
 # Just use Tavily for now.
 _TAVILY_API_URL = "https://api.tavily.com"
 
+# Default request timeout, in seconds.
+_TIMEOUT = 30.0
+
 
-@schema()
+@schema(slots=True)
 class SearchResult:
     url: str = prop("result url")
     content: str = prop("result content")
@@ -34,18 +36,24 @@ class Search(Tool):
         "Performs a web search",
         schema_for(Params),
         schema_for(Returns),
+        cacheable=True,
+        cache_ttl=3600,
     )
 
     _api_key: str
+    _http: HttpClient
 
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, http: Optional[HttpClient] = None):
         self._api_key = api_key
+        self._http = http if http is not None else http_client
 
     def invoke(self, req: ToolCall) -> ToolResult:
         args = parse_val(req.args, Search.decl.params)
-        raw_json = self._raw_results(args.query, args.max_results)
+        raw_json = self._raw_results(
+            args.query, args.max_results, timeout=req.timeout(_TIMEOUT)
+        )
         cleaned = self._clean_results(raw_json)
-        return ToolResult(dict(Search.Returns(results=cleaned)))
+        return ToolResult(encode_val(cleaned, Search.decl.returns))
 
     def _raw_results(
         self,
@@ -57,6 +65,7 @@ class Search(Tool):
         include_answer: Optional[bool] = False,
         include_raw_content: Optional[bool] = False,
         include_images: Optional[bool] = False,
+        timeout: Optional[float] = _TIMEOUT,
     ) -> Dict:
         params = {
             "api_key": self._api_key,
@@ -69,10 +78,10 @@ class Search(Tool):
             "include_raw_content": include_raw_content,
             "include_images": include_images,
         }
-        rsp = requests.post(
-            # type: ignore
+        rsp = self._http.post(
             f"{_TAVILY_API_URL}/search",
             json=params,
+            timeout=timeout,
         )
         # Return the response json directly, even if it's an error.
         # TODO: We may want to settle on a standard format for errors, so we can control behavior better.
@@ -104,7 +113,7 @@ class Search(Tool):
 
         # Error details.
         elif "details" in results:
-            return Search.Returns(error=results["details"])
+            return Search.Returns(results=[], error=results["details"])
 
         # Unknown output.
-        return Search.Returns(error="unknown api error")
+        return Search.Returns(results=[], error="unknown api error")
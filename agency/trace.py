@@ -0,0 +1,176 @@
+"""Structured tracing of agency execution.
+
+Spans record the wall time, nesting and selected attributes of frames, tool invocations and
+model completions. A Tracer's spans can be exported as Chrome trace-event JSON (viewable in
+chrome://tracing or Perfetto) or as OpenTelemetry (OTLP/JSON) span records.
+"""
+
+from __future__ import annotations
+
+import itertools
+import json
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, ContextManager, Dict, Iterator, List, Optional
+
+# The innermost open span on the current thread or task.
+_current: ContextVar[Optional[Span]] = ContextVar("agency_span", default=None)
+
+
+@dataclass
+class Span:
+    name: str
+    cat: str
+    id: int
+    trace_id: int
+    parent_id: Optional[int]
+    thread_id: int
+    start_ns: int
+    end_ns: Optional[int] = None
+    args: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def duration_ns(self) -> int:
+        return (self.end_ns or time.perf_counter_ns()) - self.start_ns
+
+
+class Tracer:
+    """Collects spans from any number of threads and tasks."""
+
+    _spans: List[Span]
+    _ids: Iterator[int]
+    _lock: threading.Lock
+    _epoch_ns: int
+
+    def __init__(self):
+        self._spans = []
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+        # Offset from perf_counter_ns() to wall-clock time, for exporting absolute timestamps.
+        self._epoch_ns = time.time_ns() - time.perf_counter_ns()
+
+    def begin(
+        self, name: str, cat: str, parent: Optional[Span] = None, **args: Any
+    ) -> Span:
+        """Opens a span, nested within parent or else the current span (if any).
+
+        Spans opened this way must be closed with end(); they don't become the current span.
+        """
+        if parent is None:
+            parent = _current.get()
+        with self._lock:
+            span_id = next(self._ids)
+        span = Span(
+            name=name,
+            cat=cat,
+            id=span_id,
+            trace_id=parent.trace_id if parent else random.getrandbits(128),
+            parent_id=parent.id if parent else None,
+            thread_id=threading.get_ident(),
+            start_ns=time.perf_counter_ns(),
+            args=args,
+        )
+        with self._lock:
+            self._spans.append(span)
+        return span
+
+    def end(self, span: Span, **args: Any):
+        """Closes a span, adding any extra args to it."""
+        span.end_ns = time.perf_counter_ns()
+        span.args.update(args)
+
+    @contextmanager
+    def span(
+        self, name: str, cat: str, parent: Optional[Span] = None, **args: Any
+    ) -> Iterator[Span]:
+        """Opens a span that is current for the duration of the with block."""
+        span = self.begin(name, cat, parent, **args)
+        token = _current.set(span)
+        try:
+            yield span
+        finally:
+            _current.reset(token)
+            self.end(span)
+
+    def spans(self) -> List[Span]:
+        with self._lock:
+            return list(self._spans)
+
+    def clear(self):
+        with self._lock:
+            self._spans = []
+
+    def to_chrome_trace(self) -> Dict[str, Any]:
+        """Exports all spans in the Chrome trace-event format."""
+        pid = os.getpid()
+        events = [
+            {
+                "name": span.name,
+                "cat": span.cat,
+                "ph": "X",
+                "ts": (self._epoch_ns + span.start_ns) / 1000,
+                "dur": span.duration_ns / 1000,
+                "pid": pid,
+                "tid": span.thread_id,
+                "args": dict(span.args, span_id=span.id, parent_id=span.parent_id),
+            }
+            for span in self.spans()
+        ]
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write_chrome_trace(self, path: str):
+        with open(path, "w") as file:
+            json.dump(self.to_chrome_trace(), file, default=str)
+
+    def to_otel(self) -> List[Dict[str, Any]]:
+        """Exports all spans as OpenTelemetry span records, in the OTLP/JSON encoding."""
+        records: List[Dict[str, Any]] = []
+        for span in self.spans():
+            record: Dict[str, Any] = {
+                "traceId": f"{span.trace_id:032x}",
+                "spanId": f"{span.id:016x}",
+                "name": span.name,
+                "kind": "SPAN_KIND_INTERNAL",
+                "startTimeUnixNano": str(self._epoch_ns + span.start_ns),
+                "endTimeUnixNano": str(
+                    self._epoch_ns + span.start_ns + span.duration_ns
+                ),
+                "attributes": [
+                    {"key": k, "value": _otel_value(v)}
+                    for k, v in dict(span.args, category=span.cat).items()
+                ],
+            }
+            if span.parent_id is not None:
+                record["parentSpanId"] = f"{span.parent_id:016x}"
+            records.append(record)
+        return records
+
+
+def traced(
+    tracer: Optional[Tracer], name: str, cat: str, **args: Any
+) -> ContextManager[Optional[Span]]:
+    """Equivalent to tracer.span(), or a no-op when there's no tracer."""
+    if tracer is None:
+        return nullcontext()
+    return tracer.span(name, cat, **args)
+
+
+def json_size(val: Any) -> int:
+    """Approximate serialized size of a value, for recording in span args."""
+    return len(json.dumps(val, default=str))
+
+
+def _otel_value(val: Any) -> Dict[str, Any]:
+    if isinstance(val, bool):
+        return {"boolValue": val}
+    elif isinstance(val, int):
+        return {"intValue": str(val)}
+    elif isinstance(val, float):
+        return {"doubleValue": val}
+    return {"stringValue": str(val)}
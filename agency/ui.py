@@ -1,21 +1,50 @@
 # Seemingly unused, but imported for the side-effect of using readline()
 # for input on Unix-like systems.
 import readline
+import uuid
 
 from rich.console import Console
 
 from agency.agency import Agency
+from agency.models import FunctionCall, Stream
 
 readline.redisplay
 
 
+class ConsoleStream(Stream):
+    """Renders streamed model output to the console as it arrives."""
+
+    _console: Console
+    _midline: bool
+
+    def __init__(self, console: Console):
+        self._console = console
+        self._midline = False
+
+    def text(self, delta: str):
+        self._console.print(delta, end="", markup=False, highlight=False)
+        self._midline = not delta.endswith("\n")
+
+    def call(self, call: FunctionCall):
+        self.finish()
+        self._console.print(f"-> {call.name}", style="dim", markup=False)
+
+    def finish(self):
+        if self._midline:
+            self._console.print()
+            self._midline = False
+
+
 class AgencyUI:
     _agency: Agency
     _tool_id: str
+    _session: str
 
     def __init__(self, agency: Agency, tool_id: str):
         self._agency = agency
         self._tool_id = tool_id
+        # Each prompt continues the same conversation.
+        self._session = f"ui-{uuid.uuid4().hex}"
 
     def run(self):
         console = Console()
@@ -29,9 +58,14 @@ class AgencyUI:
                     case "":
                         continue
                     case _:
+                        stream = ConsoleStream(console)
                         response = self._agency.ask(
-                            self._tool_id, {"question": user_input}
+                            self._tool_id,
+                            {"question": user_input},
+                            session=self._session,
+                            stream=stream,
                         )
+                        stream.finish()
                         # md = Markdown(response + "\n")
                         console.print(response)
             except (EOFError, KeyboardInterrupt):
@@ -0,0 +1,37 @@
+from __future__ import annotations
+
+import threading
+import time
+from typing import Optional
+
+from agency.models import Usage
+
+
+class UsageMeter:
+    """Accumulates the usage of many completions, e.g. for a minion, session or ask.
+
+    Safe to share across threads, as completions for one ask may run concurrently.
+    """
+
+    started: float
+    _total: Usage
+    _lock: threading.Lock
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self._total = Usage(completions=0)
+        self._lock = threading.Lock()
+
+    def add(self, usage: Optional[Usage]):
+        if usage is not None:
+            with self._lock:
+                self._total = self._total + usage
+
+    def total(self) -> Usage:
+        with self._lock:
+            return self._total
+
+    def tokens_per_min(self) -> float:
+        """Average token throughput since the meter was created."""
+        elapsed = time.monotonic() - self.started
+        return self.total().total_tokens * 60 / elapsed if elapsed > 0 else 0.0
@@ -1,13 +1,16 @@
 from __future__ import annotations
 
+import sys
 from datetime import datetime
 
 import pytz
-from IPython.display import Markdown, display
 
 
 def markdown(md: str):
     if running_in_notebook():
+        # IPython is slow to import, and only needed in notebooks.
+        from IPython.display import Markdown, display
+
         display(Markdown(md))
     else:
         print(md)
@@ -20,6 +23,9 @@ def trunc(text: str, l: int = 80) -> str:
 def running_in_notebook():
     # Note: This import doesn't type-check, but it's actually there in practice.
     # This whole thing is a mess, but there doesn't appear to be a better way.
+    # A notebook kernel will have imported IPython already; don't pay to import it otherwise.
+    if "IPython" not in sys.modules:
+        return False
     try:
         from IPython import get_ipython  # pyright: ignore
 
@@ -0,0 +1,57 @@
+"""Loads heavy dependencies ahead of their first use, on a background thread.
+
+Tools import their heavy dependencies (browsers, document parsers, vector stores and the
+embedding model) when first used, keeping startup fast. Interactive applications can call
+warm_up() at startup, so those are ready by the time the user's first request needs them.
+"""
+
+from __future__ import annotations
+
+import importlib
+import threading
+from typing import Iterable
+
+from agency import embedding
+
+# Slow imports deferred by agency's modules, in rough order of likely need. The stores only
+# import chromadb for type checking, as their callers import it to create the client.
+HEAVY_MODULES = (
+    "chromadb",
+    "sentence_transformers",
+    "playwright.sync_api",
+    "unstructured.partition.auto",
+)
+
+
+def warm_up(
+    modules: Iterable[str] = HEAVY_MODULES, embeddings: bool = True
+) -> threading.Thread:
+    """Starts importing modules, and loading the embedding model, on a daemon thread.
+
+    Missing modules are skipped, as not every application uses every tool. Code that needs a
+    module before it's loaded simply waits on Python's import lock.
+
+    Args:
+        modules: Modules to import
+        embeddings: Whether to load the embedding model
+
+    Returns:
+        The warm-up thread, e.g. to join() it
+    """
+    modules = list(modules)
+
+    def run():
+        for name in modules:
+            try:
+                importlib.import_module(name)
+            except ImportError as e:
+                print(f"--> warm-up: skipping {name}: {e}")
+        if embeddings:
+            try:
+                embedding.warm_up()
+            except Exception as e:
+                print(f"--> warm-up: couldn't load embedding model: {e}")
+
+    thread = threading.Thread(target=run, name="agency-warmup", daemon=True)
+    thread.start()
+    return thread
@@ -5,6 +5,8 @@ import os
 import chromadb
 
 from agency import Agency
+from agency.embedding import enable_cache
+from agency.history import HistoryPolicy
 from agency.keys import TAVILY_API_KEY
 from agency.minion import Minion
 from agency.models.openrouter import OpenRouter
@@ -17,8 +19,13 @@ from agency.tools.files import EditFile, ReadFile
 from agency.tools.notebook import LookupNotes, RecordNote, RemoveNote, UpdateNote
 from agency.tools.search import Search
 from agency.ui import AgencyUI
+from agency.warmup import warm_up
+
+# Load the embedding model and browser while the stores are opened.
+warm_up()
 
 tool_name = "research"
+enable_cache(os.path.join(tool_name, "embeddings"))
 dbclient = chromadb.PersistentClient(os.path.join(tool_name, "chroma"))
 feedback = LogStore(dbclient, tool_name, "feedback")
 notebook = Docstore(dbclient, tool_name, "notebook")
@@ -81,6 +88,8 @@ ResearchAssistant = Minion(
         ReadFile.decl,
         EditFile.decl,
     ],
+    # Browse results are large; keep them from swamping the prompt over long sessions.
+    history_policy=HistoryPolicy(token_budget=60_000),
 )
 
 
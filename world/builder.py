@@ -3,6 +3,7 @@ import os
 import chromadb
 
 from agency import Agency
+from agency.embedding import enable_cache
 from agency.minion import MinionDecl
 from agency.schema import schema, schema_for
 from agency.tools.docstore import Docstore
@@ -11,6 +12,7 @@ from agency.tools.notebook import LookupNotes, RecordNote, RemoveNote, UpdateNot
 from agency.ui import AgencyUI
 
 tool_name = "world"
+enable_cache(os.path.join(tool_name, "embeddings"))
 dbclient = chromadb.PersistentClient(os.path.join(tool_name, "chroma"))
 knowledge = Docstore(dbclient, tool_name, "knowledge")
 feedback = LogStore(dbclient, tool_name, "feedback")